@@ -1,8 +1,33 @@
 from setuptools import setup, find_packages
+from setuptools.command.build_py import build_py
 import os
+import sys
 
 version = '0.0.1.dev0'
 
+
+# These modules use syntax that older versions of Python can't compile
+PY35_MODULES = [
+    ('touchdown.core', 'asyncrunner'),
+]
+
+
+class BuildPy(build_py):
+
+    def find_package_modules(self, package, package_dir):
+        modules = build_py.find_package_modules(self, package, package_dir)
+        if sys.version_info < (3, 5):
+            modules = [m for m in modules if m[:2] not in PY35_MODULES]
+        return modules
+
+    def find_data_files(self, package, src_dir):
+        files = build_py.find_data_files(self, package, src_dir)
+        if sys.version_info < (3, 5):
+            excluded = [os.path.join(src_dir, name + '.py') for (p, name) in PY35_MODULES if p == package]
+            files = [f for f in files if f not in excluded]
+        return files
+
+
 setup(
     name='touchdown',
     version=version,
@@ -21,12 +46,16 @@ setup(
         "Programming Language :: Python :: 3",
         "Programming Language :: Python :: 3.3",
         "Programming Language :: Python :: 3.4",
+        "Programming Language :: Python :: 3.5",
         "Programming Language :: Python :: Implementation :: CPython",
         "Programming Language :: Python :: Implementation :: PyPy",
     ],
     packages=find_packages(exclude=['ez_setup']),
     include_package_data=True,
     zip_safe=False,
+    cmdclass={
+        'build_py': BuildPy,
+    },
     install_requires=[
         'six',
         'click',
@@ -13,10 +13,12 @@
 # limitations under the License.
 
 import touchdown.aws  # noqa
-import touchdown.fuselage  # noqa
-import touchdown.ssh  # noqa
 
 from touchdown.core import Runner, Workspace
+from touchdown.core.resource import ResourceType
+
+ResourceType.add_lazy_factory("ssh_connection", "touchdown.ssh")
+ResourceType.add_lazy_factory("fuselage_bundle", "touchdown.fuselage")
 
 __all__ = [
     "Runner",
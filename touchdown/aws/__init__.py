@@ -12,20 +12,49 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from . import (
-    account,
-    vpc,
-    ec2,
-    cloudfront,
-    elasticache,
-    elastictranscoder,
-    elb,
-    iam,
-    rds,
-    route53,
-    s3,
-    external_account,
-)
+from touchdown.core.resource import ResourceType
+
+
+# The factories each module provides. The modules (and botocore along with
+# them) are only imported when one of these is first used.
+factories = {
+    'account': ['aws'],
+    'vpc': [
+        'vpc',
+        'customer_gateway',
+        'internet_gateway',
+        'network_acl',
+        'vpn_gateway',
+        'route_table',
+        'route',
+        'subnet',
+        'security_group',
+        'rule',
+        'vpn_connection',
+    ],
+    'ec2': ['keypair', 'launch_configuration', 'auto_scaling_group'],
+    'cloudfront': [
+        'distribution',
+        'default_cache_behaviour',
+        'cache_behaviour',
+        's3_origin',
+        'logging_config',
+        'viewer_certificate',
+    ],
+    'elasticache': ['cache_subnet_group', 'replication_group'],
+    'elastictranscoder': ['pipeline'],
+    'elb': ['load_balancer', 'listener', 'attributes'],
+    'iam': ['role', 'instance_profile', 'server_certificate'],
+    'rds': ['db_subnet_group', 'database'],
+    'route53': ['hosted_zone', 'record'],
+    's3': ['bucket'],
+    'external_account': ['external_role'],
+}
+
+for module, resource_names in factories.items():
+    for resource_name in resource_names:
+        ResourceType.add_lazy_factory(resource_name, '.'.join((__name__, module)))
+
 
 __all__ = [
     'account',
@@ -13,19 +13,72 @@
 # limitations under the License.
 
 import os
+import threading
 
 from botocore import session
 
 from touchdown.core.resource import Resource
 from touchdown.core.plan import Plan
 from touchdown.core import argument
+from touchdown.core.profiling import profiler
+from touchdown.core.tracing import tracer
 
 from touchdown.core.workspace import Workspace
 
 
+class ClientPool(object):
+
+    """ Shares botocore clients between every plan that uses a session.
+
+    Creating a client loads the service model and builds an endpoint, which
+    is expensive. Clients are thread safe so one per service and region is
+    enough.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.clients = {}
+        self.lock = threading.Lock()
+        tracer.instrument(session)
+
+    def get_client(self, service_name, region_name=None):
+        key = (service_name, region_name or self.session.region)
+        with self.lock:
+            if key not in self.clients:
+                with profiler.timed("model", service_name):
+                    self.clients[key] = self.session.create_client(
+                        service_name=service_name,
+                        region_name=key[1],
+                        aws_access_key_id=self.session.access_key_id,
+                        aws_secret_access_key=self.session.secret_access_key,
+                        aws_session_token=self.session.session_token,
+                    )
+            return self.clients[key]
+
+
+def create_session(runner, data_path=None):
+    """ Returns a new botocore session. Loading service models is slow, so
+    every session created for goals with the same ``Shared`` uses the same
+    loader (and its cache of models). """
+    if data_path:
+        new_session = session.get_session({
+            "data_path": ('data_path', 'BOTO_DATA_PATH', data_path),
+        })
+    else:
+        new_session = session.get_session()
+
+    loader = runner.get_shared(
+        ("botocore-loader", new_session.get_config_variable('data_path') or ''),
+        lambda: new_session.get_component('data_loader'),
+    )
+    new_session.register_component('data_loader', loader)
+    return new_session
+
+
 class BaseAccount(Resource):
 
     dot_ignore = True
+    state_scope = ("region", "access_key_id")
 
     region = argument.String()
     access_key_id = argument.String()
@@ -45,17 +98,32 @@ class Describe(Plan):
     default = True
     name = "describe"
     _session = None
+    _lock = threading.Lock()
+
+    def create_session(self):
+        data_path = os.path.join(os.path.dirname(__file__), "data")
+        new_session = create_session(self.runner, data_path)
+        new_session.access_key_id = self.resource.access_key_id or None
+        new_session.secret_access_key = self.resource.secret_access_key or None
+        new_session.session_token = None
+        new_session.region = self.resource.region
+        new_session.clients = ClientPool(new_session)
+        return new_session
 
     @property
     def session(self):
-        if not self._session:
-            data_path = os.path.join(os.path.dirname(__file__), "data")
-            self._session = session.get_session({
-                "data_path": ('data_path', 'BOTO_DATA_PATH', data_path),
-            })
-            self._session.access_key_id = self.resource.access_key_id or None
-            self._session.secret_access_key = self.resource.secret_access_key or None
-            self._session.session_token = None
-            self._session.region = self.resource.region
+        with self._lock:
+            if not self._session:
+                # Accounts with the same credentials (for example in other
+                # workspaces of a batch) share a session and its clients
+                self._session = self.runner.get_shared(
+                    (
+                        "aws-account",
+                        self.resource.access_key_id,
+                        self.resource.secret_access_key,
+                        self.resource.region,
+                    ),
+                    self.create_session,
+                )
 
         return self._session
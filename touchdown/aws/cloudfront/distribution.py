@@ -251,14 +251,17 @@ class Describe(SimpleDescribe, Plan):
         return {"Id": self.object['Id']}
 
     def describe_object(self):
-        paginator = self.client.get_paginator("list_distributions")
-        for page in paginator.paginate():
-            for distribution in page['DistributionList'].get('Items', []):
-                if self.resource.name in distribution['Aliases'].get('Items', []):
-                    result = self.client.get_distribution(Id=distribution['Id'])
-                    distribution = {"ETag": result["ETag"], "Id": distribution["Id"]}
-                    distribution.update(result['Distribution'])
-                    return distribution
+        distribution = self.find_listed_object(
+            "list_distributions",
+            self.resource.name,
+            lambda page: page['DistributionList'].get('Items', []),
+            lambda distribution: distribution['Aliases'].get('Items', []),
+        )
+        if distribution:
+            result = self.client.get_distribution(Id=distribution['Id'])
+            distribution = {"ETag": result["ETag"], "Id": distribution["Id"]}
+            distribution.update(result['Distribution'])
+            return distribution
 
 
 class Apply(SimpleApply, Describe):
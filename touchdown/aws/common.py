@@ -12,13 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import heapq
+import itertools
 import logging
+import random
+import sys
+import threading
+import time
 
+import six
+from botocore import xform_name
 from botocore.exceptions import ClientError
 
 from touchdown.core import errors, serializers, resource
 from touchdown.core.action import Action
 from touchdown.core.plan import Present
+from touchdown.core.tracing import tracer
 
 
 logger = logging.getLogger(__name__)
@@ -28,29 +37,218 @@ class Resource(resource.Resource):
 
     def matches(self, runner, remote):
         for name, field in self.fields:
-            arg = field.argument
-            if not field.present(self):
-                continue
-            if not getattr(arg, "field", ""):
+            if not field.aws_field or not field.update:
                 continue
-            if not getattr(arg, "update", True):
+            if not field.present(self):
                 continue
-            if arg.field not in remote:
+            if field.aws_field not in remote:
                 return False
-            rendered = arg.serializer.render(runner, getattr(self, name))
-            if rendered != remote[arg.field]:
+            rendered = field.argument.serializer.render(runner, field.get_value(self))
+            if rendered != remote[field.aws_field]:
                 return False
         return True
 
 
+class Wait(object):
+
+    """ An outstanding call to ``Poller.submit``. """
+
+    def __init__(self, check, description, timeout, initial_delay, max_delay):
+        self.check = check
+        self.description = description
+        self.deadline = time.time() + timeout if timeout else None
+        self.delay = initial_delay
+        self.max_delay = max_delay
+        self.cancelled = False
+        self.result = None
+        self.exc_info = None
+        self.callbacks = []
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+
+    def next_delay(self):
+        """ Returns how long to wait before the next check. The delay doubles
+        each time, and a random jitter stops many waits polling in lockstep """
+        delay = self.delay
+        self.delay = min(self.delay * 2, self.max_delay)
+        return random.uniform(delay / 2.0, delay)
+
+    def finish(self, result=None, exc_info=None):
+        with self.lock:
+            self.result = result
+            self.exc_info = exc_info
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            self._call(callback)
+
+    def _call(self, callback):
+        # Callbacks run on the poller thread, so one that fails mustn't stop
+        # every other wait from being checked
+        try:
+            callback(self)
+        except Exception:
+            logger.exception("Error in callback for {}".format(self.description))
+
+    def add_done_callback(self, callback):
+        """ Calls ``callback`` once the wait has finished, straight away if it
+        already has """
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        self._call(callback)
+
+    def cancel(self):
+        self.cancelled = True
+
+    def wait(self):
+        # Wait with a timeout so that the main thread can still be interrupted
+        while not self.event.is_set():
+            self.event.wait(1)
+        if self.exc_info:
+            six.reraise(*self.exc_info)
+        return self.result
+
+
+class Poller(object):
+
+    """ Runs the checks for any number of outstanding waits from a single
+    thread.
+
+    Each check is called until it returns a true value, raises an exception,
+    its deadline passes or it is cancelled. Checks are retried with
+    exponential backoff, so long waits make far fewer API calls than polling
+    at a fixed interval.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.queue = []
+        self.counter = itertools.count()
+        self.thread = None
+
+    def _schedule(self, when, wait):
+        with self.condition:
+            heapq.heappush(self.queue, (when, next(self.counter), wait))
+            if not self.thread:
+                self._start()
+            self.condition.notify()
+
+    def _start(self):
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _next(self):
+        with self.condition:
+            while True:
+                if not self.queue:
+                    self.condition.wait()
+                    continue
+                delay = self.queue[0][0] - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                return heapq.heappop(self.queue)[2]
+
+    def _run(self):
+        try:
+            self._poll()
+        finally:
+            # If the thread dies then start another for any outstanding waits,
+            # or leave it to the next submit
+            with self.condition:
+                self.thread = None
+                if self.queue:
+                    self._start()
+
+    def _poll(self):
+        while True:
+            wait = self._next()
+
+            if wait.cancelled:
+                wait.finish(exc_info=(errors.Error, errors.Error("{} was cancelled".format(wait.description)), None))
+                continue
+
+            try:
+                result = wait.check()
+            except Exception:
+                wait.finish(exc_info=sys.exc_info())
+                continue
+
+            if result:
+                wait.finish(result)
+                continue
+
+            if wait.deadline and time.time() > wait.deadline:
+                wait.finish(exc_info=(errors.Timeout, errors.Timeout("Timed out: {}".format(wait.description)), None))
+                continue
+
+            self._schedule(time.time() + wait.next_delay(), wait)
+
+    def submit(self, check, description, timeout=None, initial_delay=1, max_delay=30):
+        """ Starts polling ``check`` and returns a ``Wait`` """
+        wait = Wait(check, description, timeout, initial_delay, max_delay)
+        self._schedule(time.time(), wait)
+        return wait
+
+    def wait(self, check, description, timeout=None, initial_delay=1, max_delay=30):
+        """ Blocks until ``check`` returns a true value and returns it """
+        return self.submit(check, description, timeout, initial_delay, max_delay).wait()
+
+
+poller = Poller()
+
+
+# Waiters back off to polling this often (in seconds), unless the waiter's
+# own delay is longer
+MAX_WAITER_DELAY = 60
+
+
 class Waiter(Action):
 
     def run(self):
+        # This still blocks the calling thread until the wait is over. Only
+        # AsyncRunner frees up its worker while a wait is outstanding.
+        with tracer.span("waiter", self.waiter):
+            self.submit().wait()
+        self.finish()
+
+    def submit(self):
+        """ Starts checking for the waiter's success state with the shared
+        poller, backing off from the waiter's delay. Returns the ``Wait``,
+        and ``finish`` should be called once it has succeeded. """
         filters = self.plan.get_describe_filters()
-        logger.debug("Waiting with waiter {} and filters {}".format(self.waiter, filters))
-        waiter = self.plan.client.get_waiter(self.waiter)
-        waiter.wait(**filters)
-        self.plan.object = self.plan.describe_object()
+        config = self.plan.client.get_waiter(self.waiter).config
+        operation = getattr(self.plan.client, xform_name(config.operation))
+        acceptors = list(config.acceptors)
+
+        def check():
+            try:
+                response = operation(**filters)
+            except ClientError as e:
+                response = e.response
+            for acceptor in acceptors:
+                if acceptor.matcher_func(response):
+                    if acceptor.state == "failure":
+                        raise errors.Error("Waiter {} encountered a terminal failure state".format(self.waiter))
+                    return acceptor.state == "success"
+            if "Error" in response:
+                raise errors.Error("Waiter {} encountered an unexpected error".format(self.waiter))
+            return False
+
+        logger.debug("Polling for waiter {} with filters {}".format(self.waiter, filters))
+        return poller.submit(
+            check,
+            "Waiting for {}".format(self.resource),
+            timeout=config.delay * config.max_attempts,
+            initial_delay=config.delay,
+            max_delay=max(config.delay, MAX_WAITER_DELAY),
+        )
+
+    def finish(self):
+        self.plan.refresh_object()
 
     def __init__(self, plan, description, waiter):
         super(Waiter, self).__init__(plan)
@@ -73,7 +271,11 @@ class GenericAction(Action):
 
     @property
     def description(self):
-        yield self._description
+        if isinstance(self._description, (list, tuple)):
+            for line in self._description:
+                yield line
+        else:
+            yield self._description
 
     def run(self):
         logger.debug("Calling {}".format(self.func))
@@ -91,7 +293,7 @@ class GenericAction(Action):
                     self.plan.object = {
                         self.plan.key: object[self.plan.key]
                     }
-                self.plan.object = self.plan.describe_object()
+                self.plan.refresh_object()
 
 
 class PostCreation(Action):
@@ -99,7 +301,7 @@ class PostCreation(Action):
     description = ["Sanity check created resource"]
 
     def run(self):
-        self.plan.object = self.plan.describe_object()
+        self.plan.refresh_object()
         if not self.plan.object:
             raise errors.Error("Object creation failed")
 
@@ -123,6 +325,120 @@ class SetTags(Action):
         )
 
 
+class DescribeCache(object):
+
+    """ Answers filtered ``describe_*`` calls from a single unfiltered listing
+    of every object of that type, turning one API call per resource into one
+    API call per resource type.
+
+    Only EC2 style ``Filters`` listed in ``filters`` (and ``tag:`` filters) can
+    be evaluated locally. ``describe`` returns ``None`` for anything else and
+    the caller should fall back to calling the API.
+    """
+
+    filters = {
+        "association.subnet-id": lambda o: [a.get("SubnetId") for a in o.get("Associations", [])],
+        "cidrBlock": lambda o: [o.get("CidrBlock")],
+        "group-id": lambda o: [o.get("GroupId")],
+        "group-name": lambda o: [o.get("GroupName")],
+        "internet-gateway-id": lambda o: [o.get("InternetGatewayId")],
+        "route-table-id": lambda o: [o.get("RouteTableId")],
+        "subnet-id": lambda o: [o.get("SubnetId")],
+        "vpc-id": lambda o: [o.get("VpcId")],
+        "vpn-gateway-id": lambda o: [o.get("VpnGatewayId")],
+    }
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.RLock()
+        self.objects = {}
+        self.indexes = {}
+
+    def get_values(self, object, name):
+        if name.startswith("tag:"):
+            return [t["Value"] for t in object.get("Tags", []) if t["Key"] == name[4:]]
+        return self.filters[name](object)
+
+    def can_filter(self, filters):
+        if list(filters.keys()) != ["Filters"]:
+            return False
+        for f in filters["Filters"]:
+            if not f["Name"].startswith("tag:") and f["Name"] not in self.filters:
+                return False
+            for value in f["Values"]:
+                if "*" in value or "?" in value:
+                    return False
+        return True
+
+    def get_objects(self, action, list_key):
+        with self.lock:
+            if action not in self.objects:
+                logger.debug("Prefetching all objects with {}".format(action))
+                objects = []
+                if self.client.can_paginate(action):
+                    for page in self.client.get_paginator(action).paginate():
+                        objects.extend(page.get(list_key, []))
+                else:
+                    objects.extend(getattr(self.client, action)().get(list_key, []))
+                self.objects[action] = objects
+            return self.objects[action]
+
+    def get_index(self, action, list_key, name):
+        with self.lock:
+            if (action, name) not in self.indexes:
+                index = {}
+                for object in self.get_objects(action, list_key):
+                    for value in self.get_values(object, name):
+                        index.setdefault(value, []).append(object)
+                self.indexes[(action, name)] = index
+            return self.indexes[(action, name)]
+
+    def describe(self, action, list_key, filters):
+        if not self.can_filter(filters):
+            return None
+
+        matches = self.get_objects(action, list_key)
+        for f in filters["Filters"]:
+            index = self.get_index(action, list_key, f["Name"])
+            found = set()
+            for value in f["Values"]:
+                found.update(id(o) for o in index.get(value, []))
+            matches = [o for o in matches if id(o) in found]
+
+        return [dict(o) for o in matches]
+
+
+class ListIndex(object):
+
+    """ A name to object index built from one paginated ``list_*`` call.
+
+    Some resources can only be found by paging through every object of that
+    type in the account. Rather than each plan doing that, the first lookup
+    builds an index that is shared by every other plan of that type.
+    """
+
+    def __init__(self, client, action, items, keys):
+        self.client = client
+        self.action = action
+        self.items = items
+        self.keys = keys
+        self.lock = threading.Lock()
+        self.index = None
+
+    def get(self, name):
+        with self.lock:
+            if self.index is None:
+                logger.debug("Building index of all objects returned by {}".format(self.action))
+                self.index = {}
+                for page in self.client.get_paginator(self.action).paginate():
+                    for object in self.items(page):
+                        for key in self.keys(object):
+                            self.index.setdefault(key, object)
+        object = self.index.get(name)
+        if object is not None:
+            return dict(object)
+
+
 class SimpleDescribe(object):
 
     name = "describe"
@@ -139,32 +455,41 @@ class SimpleDescribe(object):
         Present('name'),
     )
 
+    # Set to True if every filter returned by get_describe_filters can be
+    # evaluated by a DescribeCache
+    prefetch = False
+
     _client = None
 
     def __init__(self, runner, resource):
         super(SimpleDescribe, self).__init__(runner, resource)
-        self.object = {}
+        self._object = {}
         if not self.singular:
             if self.get_key:
                 self.singular = self.get_key
             else:
                 self.singular = self.describe_list_key[:-1]
 
+    @property
+    def object(self):
+        return self._object
+
+    @object.setter
+    def object(self, object):
+        self._object = object
+        self.runner.render_cache.invalidate(self.resource)
+        state = getattr(self.runner, "state", None)
+        if state:
+            state.set(self.resource, object)
+
     @property
     def session(self):
         return self.parent.session
 
     @property
     def client(self):
-        session = self.session
         if not self._client:
-            self._client = session.create_client(
-                service_name=self.service_name,
-                region_name=session.region,
-                aws_access_key_id=session.access_key_id,
-                aws_secret_access_key=session.secret_access_key,
-                aws_session_token=session.session_token,
-            )
+            self._client = self.session.clients.get_client(self.service_name)
         return self._client
 
     def get_describe_filters(self):
@@ -172,6 +497,36 @@ class SimpleDescribe(object):
             self.key: self.resource.name
         }
 
+    def get_cached_objects(self, action, list_key, filters):
+        if not self.prefetch:
+            return None
+        cache = self.runner.get_cache(
+            ("describe", self.session, self.session.region, self.service_name),
+            lambda: DescribeCache(self.client),
+        )
+        if not cache:
+            return None
+        return cache.describe(action, list_key, filters)
+
+    def find_listed_object(self, action, name, items, keys):
+        index = self.runner.get_cache(
+            ("list", self.session, self.service_name, action),
+            lambda: ListIndex(self.client, action, items, keys),
+        )
+        if index:
+            return index.get(name)
+
+        for page in self.client.get_paginator(action).paginate():
+            for object in items(page):
+                if name in keys(object):
+                    return object
+
+    def describe_objects(self, action, list_key, **filters):
+        objects = self.get_cached_objects(action, list_key, filters)
+        if objects is None:
+            objects = getattr(self.client, action)(**filters)[list_key]
+        return objects
+
     def describe_object(self):
         if self.get_action:
             logger.debug("Trying to find AWS object for resource {} using {}".format(self.resource, self.get_action))
@@ -193,14 +548,12 @@ class SimpleDescribe(object):
         logger.debug("Filters are: {}".format(filters))
 
         try:
-            results = getattr(self.client, self.describe_action)(**filters)
+            objects = self.describe_objects(self.describe_action, self.describe_list_key, **filters)
         except ClientError as e:
             if e.response['Error']['Code'] == self.describe_notfound_exception:
                 return {}
             raise
 
-        objects = results[self.describe_list_key]
-
         if len(objects) > 1:
             raise errors.Error("Expecting to find one {}, but found {}".format(self.resource, len(objects)))
 
@@ -210,6 +563,24 @@ class SimpleDescribe(object):
 
         return {}
 
+    def load_object(self):
+        """ Sets ``object`` to the remote state of the resource. If the runner
+        has a state cache with a usable entry then no API calls are made. """
+        state = getattr(self.runner, "state", None)
+        if state:
+            object = state.get(self.resource)
+            if object is not None:
+                logger.debug("Using cached state for {}".format(self.resource))
+                self._object = object
+                self.runner.render_cache.invalidate(self.resource)
+                return
+        self.refresh_object()
+
+    def refresh_object(self):
+        """ Sets ``object`` to a fresh description of the remote resource """
+        with tracer.span("describe", str(self.resource), resource=self.resource):
+            self.object = self.describe_object()
+
     def generic_action(self, description, callable, serializer=None, **kwargs):
         return GenericAction(
             self,
@@ -223,7 +594,7 @@ class SimpleDescribe(object):
         return Waiter(self, description, waiter)
 
     def get_actions(self):
-        self.object = self.describe_object()
+        self.load_object()
 
         if not self.object:
             raise errors.NotFound("Object '{}' could not be found, and is not scheduled to be created")
@@ -297,7 +668,7 @@ class SimpleApply(SimpleDescribe):
                 )
 
     def get_actions(self):
-        self.object = self.describe_object()
+        self.load_object()
 
         created = False
 
@@ -348,7 +719,7 @@ class SimpleDestroy(SimpleDescribe):
             )
 
     def get_actions(self):
-        self.object = self.describe_object()
+        self.load_object()
 
         if not self.object:
             logger.debug("Resource '{}' not found - assuming already destroyed".format(self.resource))
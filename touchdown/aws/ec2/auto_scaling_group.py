@@ -12,7 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
+import math
 
 from touchdown.core.action import Action
 from touchdown.core.resource import Resource
@@ -24,7 +24,7 @@ from touchdown import ssh
 from ..account import BaseAccount
 from ..elb import LoadBalancer
 from ..vpc import Subnet
-from ..common import SimpleDescribe, SimpleApply, SimpleDestroy
+from ..common import SimpleDescribe, SimpleApply, SimpleDestroy, poller
 from .launch_configuration import LaunchConfiguration
 
 
@@ -57,11 +57,38 @@ class AutoScalingGroup(Resource):
     placement_group = argument.String(max=255, field="PlacementGroup")
     termination_policies = argument.List(default=lambda i: ["Default"], field="TerminationPolicies")
     replacement_policy = argument.String(choices=['singleton', 'graceful'], default='graceful')
+    replacement_batch_size = argument.String(default="1")
+    replacement_max_unavailable = argument.Integer(default=0, min=0)
 
     account = argument.Resource(BaseAccount)
 
+    def clean_replacement_batch_size(self, batch_size):
+        number = batch_size[:-1] if batch_size.endswith("%") else batch_size
+        try:
+            number = int(number)
+        except ValueError:
+            raise errors.InvalidParameter("{} is not a number of instances or a percentage".format(batch_size))
+        if number < 1 or (batch_size.endswith("%") and number > 100):
+            raise errors.InvalidParameter("{} is not a valid batch size".format(batch_size))
+        return batch_size
+
+    def clean_replacement_max_unavailable(self, max_unavailable):
+        # argument.Integer doesn't enforce its min
+        if max_unavailable < 0:
+            raise errors.InvalidParameter("replacement_max_unavailable can't be negative")
+        return max_unavailable
+
 
-class ReplaceInstance(Action):
+class ReplaceInstances(Action):
+
+    """ Replaces instances that are using an old launch configuration, a batch
+    at a time.
+
+    For each batch the group is scaled up by ``get_surge`` instances and, once
+    they are healthy, every instance in the batch is terminated. The group has
+    to return to full health before the next batch is started, and is scaled
+    back down afterwards.
+    """
 
     scaling_processes = [
         "AlarmNotification",
@@ -70,9 +97,37 @@ class ReplaceInstance(Action):
         "ScheduledActions",
     ]
 
-    def __init__(self, plan, instance_id):
-        super(ReplaceInstance, self).__init__(plan)
-        self.instance_id = instance_id
+    def __init__(self, plan, instance_ids):
+        super(ReplaceInstances, self).__init__(plan)
+        self.instance_ids = instance_ids
+
+    @property
+    def batch_size(self):
+        batch_size = self.resource.replacement_batch_size
+        if batch_size.endswith("%"):
+            capacity = self.plan.object.get('DesiredCapacity') or len(self.instance_ids)
+            return max(1, int(math.ceil(capacity * int(batch_size[:-1]) / 100.0)))
+        return int(batch_size)
+
+    def get_batches(self):
+        """ Yields ``(asg, batch)`` until every instance has been replaced.
+        Instances that have gone away in the meantime (perhaps because the
+        group was scaled down after the last batch) are skipped. """
+        remaining = list(self.instance_ids)
+        while remaining:
+            asg = self.plan.describe_object()
+            current = set(
+                i['InstanceId'] for i in asg.get('Instances', [])
+                if not i['LifecycleState'].startswith('Terminat')
+            )
+            remaining = [i for i in remaining if i in current]
+            batch, remaining = remaining[:self.batch_size], remaining[self.batch_size:]
+            if batch:
+                yield asg, batch
+
+    def get_surge(self, batch):
+        """ Returns how many extra instances to start for ``batch`` """
+        raise NotImplementedError(self.get_surge)
 
     def suspend_processes(self):
         self.plan.client.suspend_processes(
@@ -80,37 +135,42 @@ class ReplaceInstance(Action):
             ScalingProcesses=self.scaling_processes,
         )
 
-    def scale(self):
-        raise NotImplementedError(self.scale)
-
-    # FIXME: If TerminateInstanceInAutoScalingGroup is graceful then we don't
-    # need to detach from the ASG.
-    """
-    def remove_from_balancer(self):
-        self.client.detach_instances(
+    def scale(self, desired_capacity):
+        self.plan.client.update_auto_scaling_group(
             AutoScalingGroupName=self.resource.name,
-            InstanceIds=[self.instance_id],
-            ShouldDecrementDesiredCapacity=False,
-        )
-    """
-
-    def terminate_instance(self):
-        self.plan.client.terminate_instance_in_auto_scaling_group(
-            InstanceId=self.instance_id,
-            ShouldDecrementDesiredCapacity=False,
+            MaxSize=max(self.resource.max_size, desired_capacity),
+            DesiredCapacity=desired_capacity,
         )
 
-    def wait_for_healthy_asg(self):
-        # FIXME: Consider the grace period of the ASG + few minutes for booting
-        # and use that as a timeout for the release process.
-        while True:
-            asg = self.plan.describe_object()
-            if asg['DesiredCapacity'] == len([i for i in asg['Instances'] if i['HealthStatus'] == 'Healthy']):
-                return True
-            time.sleep(5)
-
-    def unscale(self):
-        raise NotImplementedError(self.unscale)
+    def terminate_instances(self, batch):
+        # FIXME: If TerminateInstanceInAutoScalingGroup is graceful then we
+        # don't need to detach from the ASG first.
+        for instance_id in batch:
+            self.plan.client.terminate_instance_in_auto_scaling_group(
+                InstanceId=instance_id,
+                ShouldDecrementDesiredCapacity=False,
+            )
+
+    def check_healthy_asg(self, desired_capacity, exclude):
+        asg = self.plan.describe_object()
+        healthy = [
+            i for i in asg.get('Instances', [])
+            if i['HealthStatus'] == 'Healthy' and i['LifecycleState'] == 'InService' and i['InstanceId'] not in exclude
+        ]
+        return len(healthy) >= desired_capacity
+
+    def wait_for_healthy_asg(self, desired_capacity, exclude=()):
+        # Allow for the grace period of the ASG plus a few minutes for booting
+        timeout = (self.resource.health_check_grace_period or 0) + 600
+        try:
+            return poller.wait(
+                lambda: self.check_healthy_asg(desired_capacity, exclude),
+                "Waiting for {} to become healthy".format(self.resource),
+                timeout=timeout,
+                initial_delay=5,
+            )
+        except errors.Timeout:
+            return False
 
     def resume_processes(self):
         self.plan.client.resume_processes(
@@ -118,60 +178,62 @@ class ReplaceInstance(Action):
             ScalingProcesses=self.scaling_processes,
         )
 
+    def replace_batch(self, asg, batch):
+        desired_capacity = asg['DesiredCapacity']
+        surge = self.get_surge(len(batch))
+
+        if surge:
+            self.scale(desired_capacity + surge)
+        try:
+            if surge and not self.wait_for_healthy_asg(desired_capacity + surge):
+                raise errors.Error("Auto scaling group {} did not start new instances".format(self.resource.name))
+            self.terminate_instances(batch)
+            if not self.wait_for_healthy_asg(desired_capacity + surge, batch):
+                raise errors.Error("Auto scaling group {} is not returning to a healthy state".format(self.resource.name))
+        finally:
+            if surge:
+                self.scale(desired_capacity)
+
     def run(self):
         self.suspend_processes()
         try:
-            self.scale()
-            try:
-                # self.remove_from_balancer()
-                self.terminate_instance()
-                if not self.wait_for_healthy_asg():
-                    raise errors.Error("Auto scaling group {} is not returning to a healthy state".format(self.resource.name))
-            finally:
-                self.unscale()
+            for asg, batch in self.get_batches():
+                self.replace_batch(asg, batch)
         finally:
             self.resume_processes()
 
 
-class GracefulReplacement(ReplaceInstance):
+class GracefulReplacement(ReplaceInstances):
+
+    """ Starts a new instance for every instance in a batch before it is
+    terminated, less ``replacement_max_unavailable`` """
 
     @property
     def description(self):
-        yield "Gracefully replace instance {} (by increasing ASG pool and then terminating)".format(self.instance_id)
-
-    def scale(self):
-        desired_capacity = self.plan.object['DesiredCapacity']
-        desired_capacity += 1
-
-        max = self.resource.max_size
-        if desired_capacity > max:
-            max = desired_capacity
-
-        self.plan.client.update_auto_scaling_group(
-            AutoScalingGroupName=self.resource.name,
-            MaxSize=max,
-            DesiredCapacity=desired_capacity,
+        yield "Gracefully replace {} instances in batches of {} (by increasing ASG pool and then terminating)".format(
+            len(self.instance_ids),
+            self.batch_size,
         )
+        for instance_id in self.instance_ids:
+            yield instance_id
+
+    def get_surge(self, batch):
+        return max(0, batch - self.resource.replacement_max_unavailable)
 
-    def unscale(self):
-        self.plan.client.update_auto_scaling_group(
-            AutoScalingGroupName=self.resource.name,
-            MaxSize=self.resource.max_size,
-            DesiredCapacity=min(self.resource.max_size, self.plan.object['DesiredCapacity']),
-        )
 
+class SingletonReplacement(ReplaceInstances):
 
-class SingletonReplacement(Action):
+    """ Terminates instances without starting any new ones first, for groups
+    where only one instance can be running at a time """
 
     @property
     def description(self):
-        yield "Replace singleton instance {}".format(self.instance_id)
-
-    def scale(self):
-        pass
+        yield "Replace singleton instances in batches of {}".format(self.batch_size)
+        for instance_id in self.instance_ids:
+            yield instance_id
 
-    def unscale(self):
-        pass
+    def get_surge(self, batch):
+        return 0
 
 
 class Describe(SimpleDescribe, Plan):
@@ -197,16 +259,20 @@ class Apply(SimpleApply, Describe):
             yield change
 
         launch_config_name = self.runner.get_plan(self.resource.launch_configuration).resource_id
+        outdated = []
         for instance in self.object.get("Instances", []):
-            if instance['LifecycleState'] in ('Terminating', ):
+            if instance['LifecycleState'].startswith('Terminat'):
                 continue
             if instance.get('LaunchConfigurationName', '') != launch_config_name:
-                klass = {
-                    'graceful': GracefulReplacement,
-                    'singleton': SingletonReplacement,
-                }[self.resource.replacement_policy]
+                outdated.append(instance['InstanceId'])
 
-                yield klass(self, instance['InstanceId'])
+        if outdated:
+            klass = {
+                'graceful': GracefulReplacement,
+                'singleton': SingletonReplacement,
+            }[self.resource.replacement_policy]
+
+            yield klass(self, outdated)
 
 
 class TerminateASGInstances(Action):
@@ -229,18 +295,28 @@ class TerminateASGInstances(Action):
         )
 
         # Wait until all the ASG instances have gone away
-        while True:
-            asg = self.plan.describe_object()
-            if len(asg.get("Instances", [])) == 0:
-                break
-            time.sleep(10)
+        poller.wait(
+            self.check_instances_terminated,
+            "Waiting for instances in {} to terminate".format(self.resource),
+            timeout=3600,
+            initial_delay=10,
+        )
 
         # Wait until any ASG activies have stopped
-        while True:
-            activities = self.plan.client.describe_scaling_activities(AutoScalingGroupName=self.resource.name)['Activities']
-            if len(tuple(a for a in activities if a['StatusCode'] == 'InProgress')) == 0:
-                break
-            time.sleep(10)
+        poller.wait(
+            self.check_activities_stopped,
+            "Waiting for scaling activities in {} to stop".format(self.resource),
+            timeout=3600,
+            initial_delay=10,
+        )
+
+    def check_instances_terminated(self):
+        asg = self.plan.describe_object()
+        return len(asg.get("Instances", [])) == 0
+
+    def check_activities_stopped(self):
+        activities = self.plan.client.describe_scaling_activities(AutoScalingGroupName=self.resource.name)['Activities']
+        return len(tuple(a for a in activities if a['StatusCode'] == 'InProgress')) == 0
 
 
 class Destroy(SimpleDestroy, Describe):
@@ -263,13 +339,7 @@ class Instance(ssh.Instance):
 
         # Annoyingly we have to get antother client (different API) to get info
         # on teh EC2 instances in our asg
-        client = plan.session.create_client(
-            service_name="ec2",
-            region_name=plan.session.region,
-            aws_access_key_id=plan.session.access_key_id,
-            aws_secret_access_key=plan.session.secret_access_key,
-            aws_session_token=plan.session.session_token,
-        )
+        client = plan.session.clients.get_client("ec2")
 
         reservations = client.describe_instances(
             InstanceIds=[
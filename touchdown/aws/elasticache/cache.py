@@ -25,6 +25,8 @@ from .subnet_group import SubnetGroup
 
 class BaseCacheCluster(object):
 
+    __slots__ = ()
+
     instance_class = argument.String(field="CacheNodeType")
     engine = argument.String(field='Engine', aws_update=False)
     engine_version = argument.String(field='EngineVersion')
@@ -12,17 +12,26 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from botocore import session
+import calendar
+import logging
+import threading
 
+from botocore.credentials import CredentialProvider, RefreshableCredentials
+
+from touchdown.core.credentials import credential_cache, get_key
 from touchdown.core.plan import Plan
-from touchdown.core import argument, serializers
+from touchdown.core import argument, errors, serializers
+
+from .account import BaseAccount, Account, ClientPool, create_session
+
 
-from .account import BaseAccount, Account
+logger = logging.getLogger(__name__)
 
 
 class ExternalRole(BaseAccount):
 
     resource_name = "external_role"
+    state_scope = ("region", "arn", "external_id")
 
     name = argument.String(field="RoleSessionName")
     arn = argument.String(field="RoleArn")
@@ -37,6 +46,27 @@ class ExternalRole(BaseAccount):
     account = argument.Resource(Account)
 
 
+# Assumed role credentials are renewed when they have less than this many
+# seconds left, both when reusing cached credentials and during a long apply
+REFRESH_MARGIN = 300
+
+
+class AssumedRoleCredentials(RefreshableCredentials):
+
+    refresh_timeout = REFRESH_MARGIN
+
+
+class AssumedRoleProvider(CredentialProvider):
+
+    METHOD = "touchdown-assume-role"
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+    def load(self):
+        return self.credentials
+
+
 class Describe(Plan):
 
     resource = ExternalRole
@@ -45,34 +75,94 @@ class Describe(Plan):
     _session = None
     _client = None
 
-    @property
-    def session(self):
-        if not self._session:
+    def __init__(self, runner, resource):
+        super(Describe, self).__init__(runner, resource)
+        self.lock = threading.Lock()
+
+    def get_credential_key(self):
+        params = serializers.Resource().render(self.runner, self.resource)
+        # An MFA token can only be used once, so it isn't part of the key
+        params.pop("TokenCode", None)
+        return get_key("sts", params)
+
+    def get_credentials(self):
+        """ Returns credentials for the role in the form that botocore's
+        ``RefreshableCredentials`` uses. Credentials are reused, even between
+        runs, until they are about to expire. """
+        with self.lock:
+            key = self.get_credential_key()
+            credentials = credential_cache.get(key, margin=REFRESH_MARGIN)
+            if credentials:
+                logger.debug("Using cached credentials for {}".format(self.resource))
+                return credentials
+
+            logger.debug("Assuming role for {}".format(self.resource))
             self.object = self.client.assume_role(
                 **serializers.Resource().render(self.runner, self.resource)
             )
 
-            self._session = session.get_session()
-
             c = self.object['Credentials']
-            self._session.access_key_id = c['AccessKeyId']
-            self._session.secret_access_key = c['SecretAccessKey']
-            self._session.session_token = c['SessionToken']
-            self._session.expiration = c['Expiration']
-
-            self._session.region = self.resource.account.region
+            credentials = {
+                "access_key": c['AccessKeyId'],
+                "secret_key": c['SecretAccessKey'],
+                "token": c['SessionToken'],
+                "expiry_time": c['Expiration'].isoformat(),
+            }
+            credential_cache.set(key, credentials, calendar.timegm(c['Expiration'].utctimetuple()))
+            return credentials
+
+    def refresh_credentials(self):
+        """ Called by the session's credentials when they are about to
+        expire """
+        if not self.resource.mfa_token:
+            return self.get_credentials()
+
+        # An MFA token can only be used once, so the role can't be assumed
+        # again. Carry on with the current credentials for as long as they
+        # last.
+        credentials = credential_cache.get(self.get_credential_key())
+        if credentials:
+            return credentials
+        raise errors.Error(
+            "The credentials for {} have expired. They can't be renewed without a new MFA token.".format(self.resource)
+        )
+
+    def create_session(self):
+        new_session = create_session(self.runner)
+
+        # The clients don't get explicit keys, so they sign requests with
+        # these credentials, which renew themselves before they expire
+        credentials = AssumedRoleCredentials.create_from_metadata(
+            self.get_credentials(),
+            refresh_using=self.refresh_credentials,
+            method=AssumedRoleProvider.METHOD,
+        )
+        new_session.get_component('credential_provider').insert_before(
+            'env',
+            AssumedRoleProvider(credentials),
+        )
+        new_session.access_key_id = None
+        new_session.secret_access_key = None
+        new_session.session_token = None
+
+        new_session.region = self.resource.account.region
+        new_session.clients = ClientPool(new_session)
+        return new_session
 
+    @property
+    def session(self):
+        if not self._session:
+            # Roles assumed in the same way (for example in other workspaces
+            # of a batch) share a session and its clients
+            self._session = self.runner.get_shared(
+                ("aws-external-role", self.get_credential_key(), self.resource.account.region),
+                self.create_session,
+            )
         return self._session
 
     @property
     def client(self):
-        session = self.runner.get_plan(self.resource.account).session
         if not self._client:
-            self._client = session.create_client(
-                service_name="sts",
-                region_name=self.resource.account.region,
-                aws_access_key_id=session.access_key_id,
-                aws_secret_access_key=session.secret_access_key,
-                aws_session_token=session.session_token,
-            )
+            session = self.runner.get_plan(self.resource.account).session
+            self._client = session.clients.get_client("sts", self.resource.account.region)
         return self._client
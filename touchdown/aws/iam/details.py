@@ -0,0 +1,95 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class AuthorizationDetails(object):
+
+    """ Everything IAM knows about the roles in an account, fetched with one
+    paginated ``get_account_authorization_details`` call.
+
+    Looking at a role normally takes a ``list_role_policies`` call and a
+    ``get_role_policy`` call for each of its policies. The details for every
+    role include their inline policies and instance profiles, so after the
+    first lookup every other role and instance profile plan can be answered
+    from memory.
+    """
+
+    action = "get_account_authorization_details"
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+        self.roles = None
+        self.instance_profiles = None
+
+    def get_pages(self):
+        if self.client.can_paginate(self.action):
+            for page in self.client.get_paginator(self.action).paginate(Filter=["Role"]):
+                yield page
+            return
+
+        kwargs = {"Filter": ["Role"]}
+        while True:
+            page = getattr(self.client, self.action)(**kwargs)
+            yield page
+            if not page.get("IsTruncated", False):
+                return
+            kwargs["Marker"] = page["Marker"]
+
+    def load(self):
+        with self.lock:
+            if self.roles is not None:
+                return
+            logger.debug("Prefetching all roles with {}".format(self.action))
+            roles = {}
+            instance_profiles = {}
+            for page in self.get_pages():
+                for role in page.get("RoleDetailList", []):
+                    roles[role["RoleName"]] = role
+                    for profile in role.get("InstanceProfileList", []):
+                        instance_profiles[profile["InstanceProfileName"]] = profile
+            self.roles = roles
+            self.instance_profiles = instance_profiles
+
+    def get_role(self, name):
+        """ Returns the details of a role, including a ``RolePolicyList`` of
+        its inline policies, or ``{}`` if it doesn't exist """
+        self.load()
+        return dict(self.roles.get(name, {}))
+
+    def get_instance_profile(self, name):
+        """ Returns an instance profile, or ``None`` if it isn't attached to
+        any role. Empty instance profiles aren't included in the details so
+        the caller will have to look for them some other way. """
+        self.load()
+        profile = self.instance_profiles.get(name)
+        if profile is not None:
+            return dict(profile)
+
+
+def get_authorization_details(plan):
+    """ Returns the ``AuthorizationDetails`` shared by every IAM plan for the
+    account that ``plan`` uses, or ``None`` once caching has been turned off
+    by an apply """
+    return plan.runner.get_cache(
+        ("iam-details", plan.session),
+        lambda: AuthorizationDetails(plan.client),
+    )
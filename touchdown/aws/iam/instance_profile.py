@@ -18,6 +18,7 @@ from touchdown.core import argument
 
 from ..account import Account
 from ..common import SimpleDescribe, SimpleApply, SimpleDestroy
+from .details import get_authorization_details
 from .role import Role
 
 
@@ -40,11 +41,18 @@ class Describe(SimpleDescribe, Plan):
     key = 'InstanceProfileName'
 
     def describe_object(self):
-        paginator = self.client.get_paginator("list_instance_profiles")
-        for page in paginator.paginate():
-            for ip in page['InstanceProfiles']:
-                if ip['InstanceProfileName'] == self.resource.name:
-                    return ip
+        details = get_authorization_details(self)
+        if details:
+            profile = details.get_instance_profile(self.resource.name)
+            if profile is not None:
+                return profile
+
+        return self.find_listed_object(
+            "list_instance_profiles",
+            self.resource.name,
+            lambda page: page['InstanceProfiles'],
+            lambda ip: [ip['InstanceProfileName']],
+        )
 
 
 class Apply(SimpleApply, Describe):
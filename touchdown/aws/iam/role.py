@@ -20,6 +20,7 @@ from touchdown.core import argument, errors, serializers
 
 from ..account import Account
 from ..common import SimpleDescribe, SimpleApply, SimpleDestroy
+from .details import get_authorization_details
 
 
 class Role(Resource):
@@ -60,11 +61,42 @@ class Describe(SimpleDescribe, Plan):
     key = 'RoleName'
 
     def describe_object(self):
-        paginator = self.client.get_paginator("list_roles")
-        for page in paginator.paginate():
-            for role in page['Roles']:
-                if role['RoleName'] == self.resource.name:
-                    return role
+        details = get_authorization_details(self)
+        if details:
+            return details.get_role(self.resource.name)
+
+        return self.find_listed_object(
+            "list_roles",
+            self.resource.name,
+            lambda page: page['Roles'],
+            lambda role: [role['RoleName']],
+        )
+
+    def get_remote_policies(self):
+        """ Returns a dict of the inline policy documents of the remote role,
+        keyed by policy name. Policies that were prefetched along with the role
+        are used if possible, otherwise they are fetched one by one. """
+        if not self.object:
+            return {}
+
+        if "RolePolicyList" in self.object:
+            return dict(
+                (p['PolicyName'], p['PolicyDocument']) for p in self.object['RolePolicyList']
+            )
+
+        policies = {}
+        result = self.client.list_role_policies(RoleName=self.resource.name)
+        for name in result.get('PolicyNames', []):
+            policies[name] = None
+        return policies
+
+    def get_remote_policy(self, policies, name):
+        if policies[name] is None:
+            policies[name] = self.client.get_role_policy(
+                RoleName=self.resource.name,
+                PolicyName=name,
+            )['PolicyDocument']
+        return policies[name]
 
 
 class Apply(SimpleApply, Describe):
@@ -72,8 +104,6 @@ class Apply(SimpleApply, Describe):
     create_action = "create_role"
 
     def update_object(self):
-        policy_names = []
-
         for change in super(Apply, self).update_object():
             yield change
 
@@ -86,33 +116,20 @@ class Apply(SimpleApply, Describe):
                 PolicyDocument=serializers.Json(serializers.Argument("assume_role_policy")),
             )
 
-        # If the object exists then we can look at the roles it has
+        # If the object exists then we can look at the policies it has.
         # Otherwise we assume its a new role and it will have no policies
-        if self.object:
-            policy_names = self.client.list_role_policies(
-                RoleName=self.resource.name,
-            )['PolicyNames']
+        remote_policies = self.get_remote_policies()
 
         for name, document in self.resource.policies.items():
             document = json.loads(document)
 
+            # Documents that weren't prefetched are only fetched for policies
+            # that definitely exist
             changed = False
-            if name not in policy_names:
+            if name not in remote_policies:
+                changed = True
+            elif self.get_remote_policy(remote_policies, name) != document:
                 changed = True
-
-            # We can't do a single API to get all names and documents for all
-            # policies, so for each policy that *might* have changed we have to
-            # call teh API and check.
-            # Save an API call by only doing it for policies that definitely
-            # exist
-            if not changed:
-                policy = self.client.get_role_policy(
-                    RoleName=self.resource.name,
-                    PolicyName=name,
-                )
-
-                if policy['PolicyDocument'] != document:
-                    changed = True
 
             if changed:
                 yield self.generic_action(
@@ -123,7 +140,7 @@ class Apply(SimpleApply, Describe):
                     PolicyDocument=json.dumps(document),
                 )
 
-        for name in policy_names:
+        for name in remote_policies:
             if name not in self.resource.policies:
                 yield self.generic_action(
                     "Delete policy {}".format(name),
@@ -138,8 +155,7 @@ class Destroy(SimpleDestroy, Describe):
     destroy_action = "delete_role"
 
     def destroy_object(self):
-        result = self.client.list_role_policies(RoleName=self.resource.name)
-        for name in result.get('PolicyNames', []):
+        for name in self.get_remote_policies():
             yield self.generic_action(
                 "Delete policy {}".format(name),
                 self.client.delete_role_policy,
@@ -32,6 +32,16 @@ def _normalize(dns_name):
     return dns_name.rstrip('.') + "."
 
 
+def _record_key(name, type, set_identifier):
+    """
+    Records are unique within a zone by their name, type and set identifier.
+    The API returns set identifiers as strings.
+    """
+    if set_identifier is not None:
+        set_identifier = str(set_identifier)
+    return (name, type, set_identifier)
+
+
 class Record(Resource):
 
     resource_name = "record"
@@ -105,12 +115,12 @@ class Describe(SimpleDescribe, Plan):
     key = 'Id'
 
     def describe_object(self):
-        zone_name = self.resource.name.rstrip(".") + "."
-        paginator = self.client.get_paginator("list_hosted_zones")
-        for page in paginator.paginate():
-            for zone in page['HostedZones']:
-                if zone['Name'] == zone_name:
-                    return zone
+        return self.find_listed_object(
+            "list_hosted_zones",
+            self.resource.name.rstrip(".") + ".",
+            lambda page: page['HostedZones'],
+            lambda zone: [zone['Name']],
+        )
 
 
 class Apply(SimpleApply, Describe):
@@ -119,45 +129,61 @@ class Apply(SimpleApply, Describe):
     create_response = "not-that-useful"
     # update_action = "update_hosted_zone_comment"
 
-    def update_object(self):
-        changes = []
-        description = ["Update hosted zone records"]
+    # The maximum number of changes to send in a single ChangeBatch
+    max_changes = 100
 
-        # Retrieve all DNS records associated with this hosted zone
-        # Ignore SOA and NS records for the top level domain
-        remote_records = []
+    def get_remote_records(self):
+        """ Returns all DNS records associated with this hosted zone, indexed
+        by name, type and set identifier. SOA and NS records for the top level
+        domain are ignored. """
+        remote_records = {}
         if self.resource_id:
-            for record in self.client.list_resource_record_sets(HostedZoneId=self.resource_id)['ResourceRecordSets']:
-                if record['Type'] in ('SOA', 'NS') and record['Name'] == self.resource.name:
-                    continue
-                remote_records.append(record)
+            paginator = self.client.get_paginator("list_resource_record_sets")
+            for page in paginator.paginate(HostedZoneId=self.resource_id):
+                for record in page['ResourceRecordSets']:
+                    if record['Type'] in ('SOA', 'NS') and record['Name'] == self.resource.name:
+                        continue
+                    remote_records[_record_key(record['Name'], record['Type'], record.get('SetIdentifier', None))] = record
+        return remote_records
+
+    def get_changes(self):
+        remote_records = self.get_remote_records()
+        local_keys = set()
 
         for local in self.resource.records:
-            for remote in remote_records:
-                if local.matches(self.runner, remote):
-                    break
-            else:
-                changes.append(serializers.Dict(
+            key = _record_key(local.name, local.type, local.set_identifier)
+            local_keys.add(key)
+
+            remote = remote_records.get(key, None)
+            if remote and local.matches(self.runner, remote):
+                continue
+
+            yield (
+                serializers.Dict(
                     Action="UPSERT",
                     ResourceRecordSet=serializers.Context(serializers.Const(local), serializers.Resource()),
-                ))
-                description.append("Name => {}, Type={}, Action=UPSERT".format(local.name, local.type))
+                ),
+                "Name => {}, Type={}, Action=UPSERT".format(local.name, local.type),
+            )
 
         if not self.resource.shared:
-            for remote in remote_records:
-                for local in self.resource.records:
-                    if remote["Name"] != local.name:
-                        continue
-                    if remote["Type"] != local.type:
-                        continue
-                    if remote.get("SetIdentifier", None) != local.set_identifier:
-                        continue
-                    break
-                else:
-                    changes.append(serializers.Const({"Action": "DELETE", "ResourceRecordSet": record}))
-                    description.append("Name => {}, Type={}, Action=DELETE".format(record["Name"], record["Type"]))
+            for key, remote in remote_records.items():
+                if key in local_keys:
+                    continue
+                yield (
+                    serializers.Const({"Action": "DELETE", "ResourceRecordSet": remote}),
+                    "Name => {}, Type={}, Action=DELETE".format(remote["Name"], remote["Type"]),
+                )
+
+    def update_object(self):
+        changes = list(self.get_changes())
+
+        for i in range(0, len(changes), self.max_changes):
+            batch = changes[i:i + self.max_changes]
+
+            description = ["Update hosted zone records"]
+            description.extend(d for (c, d) in batch)
 
-        if changes:
             yield self.generic_action(
                 description,
                 self.client.change_resource_record_sets,
@@ -165,7 +191,10 @@ class Apply(SimpleApply, Describe):
                     HostedZoneId=serializers.Identifier(),
                     ChangeBatch=serializers.Dict(
                         #Comment="",
-                        Changes=serializers.Context(serializers.Const(changes), serializers.List(serializers.SubSerializer())),
+                        Changes=serializers.Context(
+                            serializers.Const([c for (c, d) in batch]),
+                            serializers.List(serializers.SubSerializer()),
+                        ),
                     )
                 ),
             )
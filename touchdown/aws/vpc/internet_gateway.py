@@ -36,6 +36,7 @@ class Describe(SimpleDescribe, Plan):
     describe_action = "describe_internet_gateways"
     describe_list_key = "InternetGateways"
     key = "InternetGatewayId"
+    prefetch = True
 
     def get_describe_filters(self):
         vpc = self.runner.get_plan(self.resource.vpc)
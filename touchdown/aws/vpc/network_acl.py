@@ -12,22 +12,129 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import logging
+
 from touchdown.core.resource import Resource
 from touchdown.core.plan import Plan
-from touchdown.core import argument
+from touchdown.core import argument, errors, workers
+from touchdown.core.action import Action
+from touchdown.core.cidr import CidrIndex
+from touchdown.core.workspace import Workspace
 
 from .vpc import VPC
 from touchdown.core import serializers
 from ..common import SimpleDescribe, SimpleApply, SimpleDestroy
 
 
+logger = logging.getLogger(__name__)
+
+# Network ACL entries use protocol numbers
+# see https://github.com/aws/aws-cli/pull/532/files
+PROTOCOLS = {"tcp": "6", "udp": "17", "icmp": "1", "all": "-1"}
+
+# Rule numbers above this are reserved for the default rules
+MAX_RULE_NUMBER = 32766
+
+# New rules are numbered this far apart (where there is room) so that rules
+# can be inserted later without renumbering the ones around them
+RULE_SPACING = 100
+
+
+def get_entry_key(egress, protocol, action, network, from_port, to_port):
+    """ Returns a hashable key for the contents of an entry """
+    protocol = PROTOCOLS.get(str(protocol), str(protocol))
+    if protocol == "-1":
+        from_port = to_port = None
+    return (egress, protocol, action, str(network), from_port, to_port)
+
+
+def get_longest_common_subsequence(local, remote):
+    """ Returns a dict of local index to remote index for the longest run of
+    keys that appear in the same order in both lists """
+    lengths = [[0] * (len(remote) + 1) for i in range(len(local) + 1)]
+    for i in range(len(local) - 1, -1, -1):
+        for j in range(len(remote) - 1, -1, -1):
+            if local[i] == remote[j]:
+                lengths[i][j] = lengths[i + 1][j + 1] + 1
+            else:
+                lengths[i][j] = max(lengths[i + 1][j], lengths[i][j + 1])
+
+    matches = {}
+    i = j = 0
+    while i < len(local) and j < len(remote):
+        if local[i] == remote[j]:
+            matches[i] = j
+            i += 1
+            j += 1
+        elif lengths[i + 1][j] >= lengths[i][j + 1]:
+            i += 1
+        else:
+            j += 1
+    return matches
+
+
+def allocate_numbers(count, low, high, reusable):
+    """ Returns ``count`` increasing rule numbers between ``low`` and
+    ``high``, preferring numbers in ``reusable``, or ``None`` if they won't
+    fit """
+    if len(reusable) >= count:
+        return reusable[:count]
+    start = reusable[-1] if reusable else low
+    rest = count - len(reusable)
+    if high - start - 1 < rest:
+        if high - low - 1 < count:
+            return None
+        reusable, start, rest = [], low, count
+    step = min(RULE_SPACING, (high - start) // (rest + 1))
+    return reusable + [start + step * (i + 1) for i in range(rest)]
+
+
+def number_entries(local, remote):
+    """ Works out a rule number for every key in ``local`` with as few
+    changes to ``remote`` (a sorted list of ``(number, key)``) as possible.
+
+    The longest run of entries that are already in the right order keep
+    their numbers. The rest are numbered in the gaps between them, reusing
+    the numbers of entries that are going away so they can be replaced in
+    place. If a gap is too small the entry after it is renumbered too.
+    """
+    kept = dict(
+        (i, remote[j][0])
+        for (i, j) in get_longest_common_subsequence(local, [key for (number, key) in remote]).items()
+    )
+    kept_numbers = set(kept.values())
+    unused = [number for (number, key) in remote if number not in kept_numbers]
+
+    while True:
+        numbers = {}
+        previous_index, previous_number = -1, 0
+        for index, number in sorted(kept.items()) + [(len(local), MAX_RULE_NUMBER + 1)]:
+            pending = list(range(previous_index + 1, index))
+            if pending:
+                reusable = [n for n in unused if previous_number < n < number]
+                allocated = allocate_numbers(len(pending), previous_number, number, reusable)
+                if allocated is None:
+                    if index == len(local):
+                        raise errors.Error("Too many network ACL entries")
+                    unused.append(kept.pop(index))
+                    unused.sort()
+                    break
+                numbers.update(zip(pending, allocated))
+            numbers[index] = number
+            previous_index, previous_number = index, number
+        else:
+            del numbers[len(local)]
+            return numbers
+
+
 class Rule(Resource):
 
     resource_name = "rule"
     dot_ignore = True
 
     network = argument.IPNetwork(field="CidrBlock")
-    protocol = argument.String(default='tcp', choices=['tcp', 'udp', 'icmp'], field="Protocol")
+    protocol = argument.String(default='tcp', choices=['tcp', 'udp', 'icmp', 'all'], field="Protocol")
     port = argument.Integer(min=-1, max=65535)
     from_port = argument.Integer(default=lambda r: r.port if r.port != -1 else 1, min=-1, max=65535)
     to_port = argument.Integer(default=lambda r: r.port if r.port != -1 else 65535, min=-1, max=65535)
@@ -40,6 +147,9 @@ class Rule(Resource):
         ),
     }
 
+    def get_key(self, egress):
+        return get_entry_key(egress, self.protocol, self.action, self.network, self.from_port, self.to_port)
+
     def __str__(self):
         name = super(Rule, self).__str__()
         if self.from_port == self.to_port:
@@ -61,6 +171,50 @@ class NetworkACL(Resource):
     vpc = argument.Resource(VPC, field="VpcId")
 
 
+def port_range(rule):
+    """ Returns the ports a rule matches. A rule without ports (such as an
+    icmp rule) matches all of them. """
+    from_port = 1 if rule.from_port is None else rule.from_port
+    to_port = 65535 if rule.to_port is None else rule.to_port
+    return from_port, to_port
+
+
+def shadows(earlier, rule):
+    """ Returns True if ``earlier`` does the opposite of ``rule`` for all of
+    the traffic that ``rule`` matches. The networks are checked by the
+    caller. """
+    if earlier.action == rule.action:
+        return False
+    # A rule for all protocols matches every port of every protocol
+    if earlier.protocol == "all":
+        return True
+    if earlier.protocol != rule.protocol:
+        return False
+    first, last = port_range(earlier)
+    from_port, to_port = port_range(rule)
+    return first <= from_port and to_port <= last
+
+
+def validate_rules(network_acls):
+    """ Warns about rules that are hidden by an earlier rule that does the
+    opposite. Rules are evaluated in order, so a deny that comes after an
+    allow for the same traffic can never take effect. """
+    for network_acl in network_acls:
+        for rules in (network_acl.inbound, network_acl.outbound):
+            index = CidrIndex()
+            for rule in rules:
+                if rule.network is None:
+                    continue
+                for earlier in index.containing(rule.network):
+                    if shadows(earlier, rule):
+                        logger.warning("{}: {} can never match because of {}".format(network_acl, rule, earlier))
+                        break
+                index.add(rule.network, rule)
+
+
+Workspace.add_validator("network_acl", validate_rules)
+
+
 class Describe(SimpleDescribe, Plan):
 
     resource = NetworkACL
@@ -68,6 +222,7 @@ class Describe(SimpleDescribe, Plan):
     describe_action = "describe_network_acls"
     describe_list_key = "NetworkAcls"
     key = 'NetworkAclId'
+    prefetch = True
 
     def get_describe_filters(self):
         vpc = self.runner.get_plan(self.resource.vpc)
@@ -89,76 +244,123 @@ class Describe(SimpleDescribe, Plan):
         }
 
 
+def describe_entry(number, key):
+    egress, protocol, action, network, from_port, to_port = key
+    description = "{} {} {} {} from {}".format(
+        number,
+        action,
+        "egress" if egress else "ingress",
+        "protocol {}".format(protocol),
+        network,
+    )
+    if from_port is not None:
+        description += ", ports {} to {}".format(from_port, to_port)
+    return description
+
+
+class UpdateEntries(Action):
+
+    """ Creates, replaces and deletes network ACL entries.
+
+    Entries are created and replaced first, and only then are old entries
+    deleted, so a rule is never missing while another takes its place. The
+    calls in each step don't depend on each other and are made a few at a
+    time.
+    """
+
+    workers = 4
+
+    def __init__(self, plan, creates, replaces, deletes):
+        super(UpdateEntries, self).__init__(plan)
+        self.creates = creates
+        self.replaces = replaces
+        self.deletes = deletes
+
+    @property
+    def description(self):
+        yield "Update network ACL entries"
+        for number, key in self.creates:
+            yield "Add rule {}".format(describe_entry(number, key))
+        for number, key in self.replaces:
+            yield "Replace rule {}".format(describe_entry(number, key))
+        for egress, number in self.deletes:
+            yield "Remove {} rule {}".format("egress" if egress else "ingress", number)
+
+    def get_entry(self, number, key):
+        egress, protocol, action, network, from_port, to_port = key
+        entry = {
+            "RuleNumber": number,
+            "Egress": egress,
+            "Protocol": protocol,
+            "RuleAction": action,
+            "CidrBlock": network,
+        }
+        if from_port is not None:
+            entry["PortRange"] = {"From": from_port, "To": to_port}
+        return entry
+
+    def run(self):
+        network_acl_id = self.plan.resource_id
+        client = self.plan.client
+
+        workers.run_all([
+            functools.partial(client.create_network_acl_entry, NetworkAclId=network_acl_id, **self.get_entry(number, key))
+            for (number, key) in self.creates
+        ] + [
+            functools.partial(client.replace_network_acl_entry, NetworkAclId=network_acl_id, **self.get_entry(number, key))
+            for (number, key) in self.replaces
+        ], self.workers)
+
+        workers.run_all([
+            functools.partial(client.delete_network_acl_entry, NetworkAclId=network_acl_id, Egress=egress, RuleNumber=number)
+            for (egress, number) in self.deletes
+        ], self.workers)
+
+
 class Apply(SimpleApply, Describe):
 
     create_action = "create_network_acl"
 
-    def _fix_protocol(self, protocol):
-        # see https://github.com/aws/aws-cli/pull/532/files
-        if protocol == 'tcp':
-            return '6'
-        elif protocol == 'udp':
-            return '17'
-        elif protocol == 'icmp':
-            return '1'
-        elif protocol == 'all':
-            return '-1'
-
-    def _get_local_rules(self):
-        local_rules = {}
-        for i, rule in enumerate(self.resource.inbound, start=1):
-            rule = serializers.Resource().render(self.runner, rule)
-            rule['Protocol'] = self._fix_protocol(rule['Protocol'])
-            rule['RuleNumber'] = i
-            rule['Egress'] = False
-            local_rules[(False, i)] = rule
-
-        for i, rule in enumerate(self.resource.outbound, start=1):
-            rule = serializers.Resource().render(self.runner, rule)
-            rule['RuleNumber'] = i
-            rule['Protocol'] = self._fix_protocol(rule['Protocol'])
-            rule['Egress'] = True
-            local_rules[(True, i)] = rule
-        return local_rules
-
-    def _get_remote_rules(self):
-        remote_rules = {}
-        for rule in self.object.get("Entries", []):
-            if rule['RuleNumber'] > 32766:
+    def get_remote_entries(self, egress):
+        entries = []
+        for entry in self.object.get("Entries", []):
+            if entry['Egress'] != egress or entry['RuleNumber'] > MAX_RULE_NUMBER:
                 continue
-            remote_rules[(rule['Egress'], rule['RuleNumber'])] = rule
-        return remote_rules
+            port_range = entry.get("PortRange", {})
+            entries.append((entry["RuleNumber"], get_entry_key(
+                egress,
+                entry["Protocol"],
+                entry["RuleAction"],
+                entry["CidrBlock"],
+                port_range.get("From"),
+                port_range.get("To"),
+            )))
+        return sorted(entries)
 
     def update_object(self):
         for action in super(Apply, self).update_object():
             yield action
 
-        local_rules = self._get_local_rules()
-        remote_rules = self._get_remote_rules()
-
-        for key, rule in remote_rules.items():
-            if key not in local_rules or local_rules[key] != rule:
-                yield self.generic_action(
-                    "Remove rule {} ({})".format(rule['RuleNumber'], 'egrees' if rule['Egress'] else 'ingress'),
-                    self.client.delete_network_acl_entry,
-                    NetworkAclId=serializers.Identifier(),
-                    RuleNumber=rule['RuleNumber'],
-                    Egress=rule['Egress'],
-                )
-
-        for key, rule in local_rules.items():
-            if key not in remote_rules or remote_rules[key] != rule:
-                if rule['Egress']:
-                    description = "Add rule: {0[RuleAction]} egress from {0[CidrBlock]}, port {0[PortRange][From]} to {0[PortRange][To]}".format(rule)
-                else:
-                    description = "Add rule: {0[RuleAction]} ingress from {0[CidrBlock]}, port {0[PortRange][From]} to {0[PortRange][To]}".format(rule)
-
-                yield self.generic_action(
-                    description,
-                    self.client.create_network_acl_entry,
-                    NetworkAclId=serializers.Identifier(),
-                    **rule
-                )
+        creates, replaces, deletes = [], [], []
+
+        for egress, rules in ((False, self.resource.inbound), (True, self.resource.outbound)):
+            local = [rule.get_key(egress) for rule in rules]
+            remote = self.get_remote_entries(egress)
+            remote_keys = dict(remote)
+
+            numbers = number_entries(local, remote)
+            for index, key in enumerate(local):
+                number = numbers[index]
+                if number not in remote_keys:
+                    creates.append((number, key))
+                elif remote_keys[number] != key:
+                    replaces.append((number, key))
+
+            used = set(numbers.values())
+            deletes.extend((egress, number) for (number, key) in remote if number not in used)
+
+        if creates or replaces or deletes:
+            yield UpdateEntries(self, creates, replaces, deletes)
 
 
 class Destroy(SimpleDestroy, Describe):
@@ -13,7 +13,9 @@
 # limitations under the License.
 
 from touchdown.core.plan import Plan
-from touchdown.core import argument, serializers
+from touchdown.core import argument, errors, serializers
+from touchdown.core.cidr import CidrIndex
+from touchdown.core.workspace import Workspace
 
 from .vpc import VPC
 from .internet_gateway import InternetGateway
@@ -44,6 +46,27 @@ class RouteTable(Resource):
     vpc = argument.Resource(VPC, field='VpcId')
 
 
+def validate_routes(route_tables):
+    """ Checks that no route table has two routes for the same destination,
+    or a route to somewhere inside its own VPC (that is what the local route
+    is for). """
+    for route_table in route_tables:
+        index = CidrIndex()
+        vpc = route_table.vpc.cidr_block if route_table.vpc else None
+        for route in route_table.routes:
+            destination = route.destination_cidr
+            if destination is None:
+                continue
+            if index.get(destination):
+                raise errors.InvalidParameter("{} has more than one route for {}".format(route_table, destination))
+            if vpc is not None and destination in vpc:
+                raise errors.InvalidParameter("{} has a route for {}, which is inside its VPC ({})".format(route_table, destination, vpc))
+            index.add(destination, route)
+
+
+Workspace.add_validator("route_table", validate_routes)
+
+
 class Describe(SimpleDescribe, Plan):
 
     resource = RouteTable
@@ -51,6 +74,7 @@ class Describe(SimpleDescribe, Plan):
     describe_action = "describe_route_tables"
     describe_list_key = "RouteTables"
     key = "RouteTableId"
+    prefetch = True
 
     def get_describe_filters(self):
         vpc = self.runner.get_plan(self.resource.vpc)
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+
 from touchdown.core.resource import Resource
 from touchdown.core.plan import Plan
 from touchdown.core import argument
@@ -21,6 +23,37 @@ from touchdown.core import serializers
 from ..common import SimpleDescribe, SimpleApply, SimpleDestroy
 
 
+# EC2 reports some protocols by number rather than name
+PROTOCOLS = {"6": "tcp", "17": "udp", "1": "icmp"}
+
+# New groups are created with this egress rule
+DEFAULT_EGRESS = [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}]
+
+
+def get_permission_key(protocol, from_port, to_port, source):
+    protocol = PROTOCOLS.get(str(protocol), str(protocol))
+    if protocol == "-1":
+        # Rules for all traffic don't have ports
+        from_port = to_port = None
+    return (protocol, from_port, to_port, source)
+
+
+def get_permissions(permissions):
+    """ Yields a ``(key, permission)`` for every source of every permission
+    in an EC2 ``IpPermissions`` list. A permission can list many networks and
+    groups, so each one is split out into a permission of its own. """
+    for permission in permissions:
+        base = dict((k, permission[k]) for k in ("IpProtocol", "FromPort", "ToPort") if k in permission)
+        ports = (permission["IpProtocol"], permission.get("FromPort"), permission.get("ToPort"))
+        for ip_range in permission.get("IpRanges", []):
+            key = get_permission_key(*ports, source=("cidr", ip_range["CidrIp"]))
+            yield key, dict(base, IpRanges=[{"CidrIp": ip_range["CidrIp"]}])
+        for pair in permission.get("UserIdGroupPairs", []):
+            key = get_permission_key(*ports, source=("group", pair["GroupId"]))
+            pair = dict((k, pair[k]) for k in ("UserId", "GroupId") if k in pair)
+            yield key, dict(base, UserIdGroupPairs=[pair])
+
+
 class Rule(Resource):
 
     resource_name = "rule"
@@ -29,7 +62,7 @@ class Rule(Resource):
     def dot_ignore(self):
         return self.security_group is None
 
-    protocol = argument.String(default='tcp', choices=['tcp', 'udp', 'icmp'], field="IpProtocol")
+    protocol = argument.String(default='tcp', choices=['tcp', 'udp', 'icmp', '-1'], field="IpProtocol")
     port = argument.Integer(min=-1, max=32768)
     from_port = argument.Integer(default=lambda r: r.port, min=-1, max=32768, field="FromPort")
     to_port = argument.Integer(default=lambda r: r.port, min=-1, max=32768, field="ToPort")
@@ -50,33 +83,14 @@ class Rule(Resource):
         )),
     )
 
-    def matches(self, runner, rule):
-        sg = None
+    def get_key(self, runner):
+        """ Returns a key that is equal to the key of the remote permission
+        that matches this rule (see ``get_permissions``) """
         if self.security_group:
-            sg = runner.get_plan(self.security_group)
-            # If the SecurityGroup doesn't exist yet then this rule can't exist
-            # yet - so we can bail early!
-            if not sg.resource_id:
-                return False
-
-        if self.protocol != rule['IpProtocol']:
-            return False
-        if self.from_port != rule.get('FromPort', None):
-            return False
-        if self.to_port != rule.get('ToPort', None):
-            return False
-
-        if sg and sg.object:
-            for group in rule.get('UserIdGroupPairs', []):
-                if group['GroupId'] == sg.resource_id and group['UserId'] == sg.object['OwnerId']:
-                    return True
-
-        if self.network:
-            for network in rule.get('IpRanges', []):
-                if network['CidrIp'] == str(self.network):
-                    return True
-
-        return False
+            source = ("group", runner.get_plan(self.security_group).resource_id)
+        else:
+            source = ("cidr", str(self.network))
+        return get_permission_key(self.protocol, self.from_port, self.to_port, source)
 
     def __str__(self):
         name = super(Rule, self).__str__()
@@ -97,7 +111,7 @@ class SecurityGroup(Resource):
     ingress = argument.ResourceList(Rule)
     egress = argument.ResourceList(
         Rule,
-        default=lambda instance: [dict(protocol=-1, network=['0.0.0.0/0'])],
+        default=lambda instance: [Rule(instance, protocol="-1", network="0.0.0.0/0")],
     )
 
     tags = argument.Dict()
@@ -111,6 +125,7 @@ class Describe(SimpleDescribe, Plan):
     describe_action = "describe_security_groups"
     describe_list_key = "SecurityGroups"
     key = 'GroupId'
+    prefetch = True
 
     def get_describe_filters(self):
         vpc = self.runner.get_plan(self.resource.vpc)
@@ -138,32 +153,45 @@ class Apply(SimpleApply, Describe):
     create_action = "create_security_group"
     create_response = "id-only"
 
+    def update_rules(self, direction, local_rules, remote_permissions):
+        """ Revokes every remote permission that has no matching local rule
+        and then authorizes every local rule that is missing. Each is done
+        with a single API call. """
+        local = collections.OrderedDict()
+        for rule in local_rules:
+            local.setdefault(rule.get_key(self.runner), rule)
+        remote = collections.OrderedDict(get_permissions(remote_permissions))
+
+        revoke = [permission for (key, permission) in remote.items() if key not in local]
+        if revoke:
+            yield self.generic_action(
+                ["Revoke {} rules".format(direction)] + [
+                    "{0[0]} ports {0[1]} to {0[2]} from {0[3][1]}".format(key)
+                    for key in remote if key not in local
+                ],
+                getattr(self.client, "revoke_security_group_{}".format(direction)),
+                GroupId=serializers.Identifier(),
+                IpPermissions=revoke,
+            )
+
+        authorize = [rule for (key, rule) in local.items() if key not in remote]
+        if authorize:
+            yield self.generic_action(
+                ["Authorize {} rules".format(direction)] + [str(rule) for rule in authorize],
+                getattr(self.client, "authorize_security_group_{}".format(direction)),
+                GroupId=serializers.Identifier(),
+                IpPermissions=serializers.Context(
+                    serializers.Const(authorize),
+                    serializers.List(serializers.Resource()),
+                ),
+            )
+
     def update_object(self):
-        for local_rule in self.resource.ingress:
-            for remote_rule in self.object.get("IpPermissions", []):
-                if local_rule.matches(self.runner, remote_rule):
-                    break
-            else:
-                yield self.generic_action(
-                    "Authorize ingress {}".format(local_rule),
-                    self.client.authorize_security_group_ingress,
-                    GroupId=serializers.Identifier(),
-                    IpPermissions=serializers.ListOfOne(serializers.Context(serializers.Const(local_rule), serializers.Resource())),
-                )
-
-        return
-
-        for local_rule in self.resource.egress:
-            for remote_rule in self.object.get("IpPermissionsEgress", []):
-                if local_rule.matches(self.runner, remote_rule):
-                    break
-            else:
-                yield self.generic_action(
-                    "Authorize egress {}".format(local_rule),
-                    self.client.authorize_security_group_egress,
-                    GroupId=serializers.Identifier(),
-                    IpPermissions=serializers.ListOfOne(serializers.Context(serializers.Const(local_rule), serializers.Resource())),
-                )
+        for action in self.update_rules("ingress", self.resource.ingress, self.object.get("IpPermissions", [])):
+            yield action
+        egress = self.object.get("IpPermissionsEgress", []) if self.object else DEFAULT_EGRESS
+        for action in self.update_rules("egress", self.resource.egress, egress):
+            yield action
 
 
 class Destroy(SimpleDestroy, Describe):
@@ -12,17 +12,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import time
+import logging
 
 from touchdown.core.resource import Resource
 from touchdown.core.plan import Plan, Present
 from touchdown.core import argument, serializers, errors
 from touchdown.core.action import Action
+from touchdown.core.cidr import CidrIndex
+from touchdown.core.workspace import Workspace
 
 from .vpc import VPC
 from .route_table import RouteTable
 from .network_acl import NetworkACL
-from ..common import SimpleDescribe, SimpleApply, SimpleDestroy
+from ..common import SimpleDescribe, SimpleApply, SimpleDestroy, poller
+
+
+logger = logging.getLogger(__name__)
 
 
 class Subnet(Resource):
@@ -45,6 +50,23 @@ class Subnet(Resource):
         return cidr_block
 
 
+def validate_subnets(subnets):
+    """ Checks that no two subnets in the same VPC overlap """
+    indexes = {}
+    for subnet in subnets:
+        if subnet.cidr_block is not None:
+            indexes.setdefault(subnet.vpc, CidrIndex()).add(subnet.cidr_block, subnet)
+
+    for index in indexes.values():
+        for outer, inner in index.overlaps():
+            raise errors.InvalidParameter("{} ({}) overlaps {} ({})".format(
+                inner, inner.cidr_block, outer, outer.cidr_block,
+            ))
+
+
+Workspace.add_validator("subnet", validate_subnets)
+
+
 class Describe(SimpleDescribe, Plan):
 
     resource = Subnet
@@ -52,6 +74,7 @@ class Describe(SimpleDescribe, Plan):
     describe_action = "describe_subnets"
     describe_list_key = "Subnets"
     key = 'SubnetId'
+    prefetch = True
 
     def get_describe_filters(self):
         vpc = self.runner.get_plan(self.resource.vpc)
@@ -78,11 +101,13 @@ class Describe(SimpleDescribe, Plan):
 
         subnet_id = object[self.key]
 
-        network_acl = self.client.describe_network_acls(
+        network_acl = self.describe_objects(
+            "describe_network_acls",
+            "NetworkAcls",
             Filters=[
                 {'Name': 'association.subnet-id', 'Values': [subnet_id]},
             ],
-        )['NetworkAcls']
+        )
 
         if network_acl:
             for assoc in network_acl[0].get('Associations', []):
@@ -91,11 +116,13 @@ class Describe(SimpleDescribe, Plan):
                     object['NetworkAclAssociationId'] = assoc['NetworkAclAssociationId']
                     break
 
-        route_tables = self.client.describe_route_tables(
+        route_tables = self.describe_objects(
+            "describe_route_tables",
+            "RouteTables",
             Filters=[
                 {'Name': 'association.subnet-id', 'Values': [subnet_id]},
             ],
-        )['RouteTables']
+        )
 
         if route_tables:
             for assoc in route_tables[0].get('Associations', []):
@@ -180,34 +207,45 @@ class WaitForNetworkInterfaces(Action):
         # Abort! There are interfaces resent that aren't pending removal
         return False
 
+    def check_interfaces(self, vpc):
+        interfaces = self.plan.client.describe_network_interfaces(
+            Filters=[
+                {"Name": "vpc-id", "Values": [vpc.resource_id]},
+                {"Name": "subnet-id", "Values": [self.plan.resource_id]},
+            ]
+        ).get('NetworkInterfaces', [])
+
+        if not interfaces:
+            return True
+
+        for interface in interfaces:
+            if not self.check_interface(interface):
+                raise errors.Error(
+                    "Subnet {} cannot be deleted until network interface {} ({}) is removed\n{}".format(
+                        self.plan.resource_id,
+                        interface["NetworkInterfaceId"],
+                        interface.get("Description", "No description available"),
+                        interface
+                    )
+                )
+
+        return False
+
     def run(self):
         vpc = self.runner.get_plan(self.resource.vpc)
         if not vpc:
             return
 
-        for i in range(120):
-            interfaces = self.plan.client.describe_network_interfaces(
-                Filters=[
-                    {"Name": "vpc-id", "Values": [vpc.resource_id]},
-                    {"Name": "subnet-id", "Values": [self.plan.resource_id]},
-                ]
-            ).get('NetworkInterfaces', [])
-
-            if not interfaces:
-                return
-
-            for interface in interfaces:
-                if not self.check_interface(interface):
-                    raise errors.Error(
-                        "Subnet {} cannot be deleted until network interface {} ({}) is removed\n{}".format(
-                            self.plan.resource_id,
-                            interface["NetworkInterfaceId"],
-                            interface.get("Description", "No description available"),
-                            interface
-                        )
-                    )
-
-            time.sleep(1)
+        try:
+            poller.wait(
+                lambda: self.check_interfaces(vpc),
+                "Waiting for network interfaces in {} to be released".format(self.resource),
+                timeout=120,
+                max_delay=10,
+            )
+        except errors.Timeout:
+            # Try the delete anyway - the API will report anything still in use
+            logger.debug("Network interfaces in {} still haven't been released".format(self.resource))
 
 
 class Destroy(SimpleDestroy, Describe):
@@ -40,6 +40,7 @@ class Describe(SimpleDescribe, Plan):
     describe_action = "describe_vpcs"
     describe_list_key = "Vpcs"
     key = 'VpcId'
+    prefetch = True
 
     def get_describe_filters(self):
         if self.key in self.object:
@@ -38,6 +38,7 @@ class Describe(SimpleDescribe, Plan):
     describe_action = "describe_vpn_gateways"
     describe_list_key = "VpnGateways"
     key = "VpnGatewayId"
+    prefetch = True
 
     def get_describe_filters(self):
         vpc = self.runner.get_plan(self.resource.vpc)
@@ -0,0 +1,48 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+import click
+
+from .suite import Benchmark
+
+
+@click.command()
+@click.option("--vpcs", default=1, help="Number of VPCs")
+@click.option("--subnets", default=1, help="Number of subnets in each VPC")
+@click.option("--rules", default=1, help="Number of ingress rules in each security group")
+@click.option("--records", default=0, help="Number of records in the hosted zone")
+@click.option("--roles", default=0, help="Number of IAM roles")
+@click.option("--latency", default=0.0, help="Simulated seconds per API call")
+@click.option("--parallel", default=1, help="Number of resources to plan and apply at once")
+@click.option("--trace-memory/--no-trace-memory", default=False, help="Record peak memory (slow)")
+@click.option("--output", type=click.File("w"), default="-", help="Where to write the JSON results")
+def main(vpcs, subnets, rules, records, roles, latency, parallel, trace_memory, output):
+    benchmark = Benchmark(
+        vpcs=vpcs,
+        subnets=subnets,
+        rules=rules,
+        records=records,
+        roles=roles,
+        latency=latency,
+        parallel=parallel,
+        trace_memory=trace_memory,
+    )
+    json.dump(benchmark.run(), output, indent=4, sort_keys=True)
+    output.write("\n")
+
+
+if __name__ == "__main__":
+    main()
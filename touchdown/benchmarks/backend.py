@@ -0,0 +1,572 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import contextlib
+import re
+import threading
+import time
+from xml.etree import ElementTree
+
+import six
+from six.moves.urllib.parse import parse_qsl, quote, unquote, urlparse
+
+from botocore import endpoint, session
+from botocore.vendored.requests.adapters import HTTPAdapter
+try:
+    from botocore.vendored.requests.packages.urllib3.response import HTTPResponse
+except ImportError:
+    from urllib3.response import HTTPResponse
+
+from touchdown.core.utils import force_bytes
+
+from touchdown.aws.common import DescribeCache
+from touchdown.aws.vpc.security_group import get_permissions
+
+
+OWNER_ID = "123456789012"
+
+
+class FakeError(Exception):
+
+    def __init__(self, code, message, status=400):
+        super(FakeError, self).__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+def _strip_namespace(tag):
+    return tag.split("}", 1)[-1]
+
+
+def _member_key_name(shape, member_name):
+    # Mirrors how botocore finds the XML element for a structure member
+    if shape.type_name == "list" and shape.serialization.get("flattened"):
+        name = shape.member.serialization.get("name")
+        if name is not None:
+            return name
+    return shape.serialization.get("name", member_name)
+
+
+class Service(object):
+
+    """ Turns botocore requests for one service into calls to ``handle_*``
+    methods and turns their return values back into XML responses.
+
+    Requests are decoded and responses encoded using the botocore service
+    model, so handlers deal with the same dicts that touchdown does.
+    """
+
+    name = None
+    endpoint = None
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.model = session.get_session().get_service_model(self.name)
+        self.protocol = self.model.protocol
+
+        self.routes = []
+        for operation_name in self.model.operation_names:
+            operation = self.model.operation_model(operation_name)
+            uri = operation.http.get("requestUri", "/").split("?")[0]
+            pattern = re.sub(r"\{(\w+)\+?\}", r"(?P<\1>[^/]+)", uri.rstrip("/") or "/")
+            self.routes.append((operation.http.get("method", "POST"), re.compile("^" + pattern + "/?$"), operation))
+
+    def matches(self, request):
+        return urlparse(request.url).netloc.split(".")[0] == self.endpoint
+
+    # Query and EC2 protocols
+
+    def _query_name(self, shape, default):
+        if self.protocol == "ec2":
+            if "queryName" in shape.serialization:
+                return shape.serialization["queryName"]
+            if "name" in shape.serialization:
+                name = shape.serialization["name"]
+                return name[0].upper() + name[1:]
+            return default
+        return shape.serialization.get("name", default)
+
+    def decode_query(self, shape, params, prefixes, prefix=""):
+        if prefix and prefix not in prefixes:
+            return None
+
+        if shape.type_name == "structure":
+            result = {}
+            for member_name, member_shape in shape.members.items():
+                key = self._query_name(member_shape, member_name)
+                if prefix:
+                    key = "{}.{}".format(prefix, key)
+                value = self.decode_query(member_shape, params, prefixes, key)
+                if value is not None:
+                    result[member_name] = value
+            return result
+
+        if shape.type_name == "list":
+            if self.protocol != "ec2" and not shape.serialization.get("flattened"):
+                prefix = "{}.member".format(prefix)
+            result = []
+            while True:
+                value = self.decode_query(shape.member, params, prefixes, "{}.{}".format(prefix, len(result) + 1))
+                if value is None:
+                    return result
+                result.append(value)
+
+        return self.decode_scalar(shape, params.get(prefix, None))
+
+    def decode_scalar(self, shape, value):
+        if value is None:
+            return None
+        if shape.type_name in ("integer", "long"):
+            return int(value)
+        if shape.type_name == "boolean":
+            return value == "true"
+        return value
+
+    # XML (used by every protocol for responses and by rest-xml for requests)
+
+    def decode_xml(self, shape, node):
+        if shape.type_name == "structure":
+            children = collections.defaultdict(list)
+            for child in node:
+                children[_strip_namespace(child.tag)].append(child)
+            result = {}
+            for member_name, member_shape in shape.members.items():
+                if "location" in member_shape.serialization:
+                    continue
+                found = children.get(_member_key_name(member_shape, member_name), None)
+                if not found:
+                    continue
+                if member_shape.type_name == "list" and member_shape.serialization.get("flattened"):
+                    result[member_name] = [self.decode_xml(member_shape.member, n) for n in found]
+                else:
+                    result[member_name] = self.decode_xml(member_shape, found[0])
+            return result
+
+        if shape.type_name == "list":
+            return [self.decode_xml(shape.member, child) for child in node]
+
+        return self.decode_scalar(shape, node.text or "")
+
+    def encode_xml(self, shape, value, name):
+        element = ElementTree.Element(name)
+
+        if shape.type_name == "structure":
+            for member_name, member_shape in shape.members.items():
+                if member_name not in value or "location" in member_shape.serialization:
+                    continue
+                key = _member_key_name(member_shape, member_name)
+                if member_shape.type_name == "list" and member_shape.serialization.get("flattened"):
+                    for item in value[member_name]:
+                        element.append(self.encode_xml(member_shape.member, item, key))
+                else:
+                    element.append(self.encode_xml(member_shape, value[member_name], key))
+
+        elif shape.type_name == "list":
+            member_name = shape.member.serialization.get("name", "member")
+            for item in value:
+                element.append(self.encode_xml(shape.member, item, member_name))
+
+        elif shape.type_name == "boolean":
+            element.text = "true" if value else "false"
+
+        else:
+            element.text = six.text_type(value)
+
+        return element
+
+    # Dispatch
+
+    def parse_request(self, request):
+        body = request.body or ""
+        if isinstance(body, six.binary_type):
+            body = body.decode("utf-8")
+
+        if self.protocol in ("query", "ec2"):
+            params = dict(parse_qsl(body, keep_blank_values=True))
+            operation = self.model.operation_model(params["Action"])
+            prefixes = set()
+            for key in params:
+                parts = key.split(".")
+                for i in range(1, len(parts) + 1):
+                    prefixes.add(".".join(parts[:i]))
+            return operation, self.decode_query(operation.input_shape, params, prefixes) if operation.input_shape else {}
+
+        path = urlparse(request.url).path
+        for method, pattern, operation in self.routes:
+            match = pattern.match(path)
+            if method != request.method or not match:
+                continue
+            params = {}
+            if body and operation.input_shape:
+                params = self.decode_xml(operation.input_shape, ElementTree.fromstring(body))
+            if operation.input_shape:
+                for member_name, member_shape in operation.input_shape.members.items():
+                    if member_shape.serialization.get("location") == "uri":
+                        params[member_name] = unquote(match.group(member_shape.serialization["name"]))
+            return operation, params
+
+        raise FakeError("UnknownOperation", "No operation for {} {}".format(request.method, path), status=404)
+
+    def encode_response(self, operation, result):
+        shape = operation.output_shape
+        if self.protocol == "ec2":
+            root = self.encode_xml(shape, result, operation.name + "Response") if shape else ElementTree.Element(operation.name + "Response")
+            ElementTree.SubElement(root, "requestId").text = "benchmark"
+        elif self.protocol == "query":
+            root = ElementTree.Element(operation.name + "Response")
+            if shape:
+                root.append(self.encode_xml(shape, result, shape.serialization.get("resultWrapper", operation.name + "Result")))
+            metadata = ElementTree.SubElement(root, "ResponseMetadata")
+            ElementTree.SubElement(metadata, "RequestId").text = "benchmark"
+        else:
+            root = self.encode_xml(shape, result, operation.name + "Response") if shape else ElementTree.Element(operation.name + "Response")
+        return ElementTree.tostring(root)
+
+    def encode_error(self, error):
+        if self.protocol == "ec2":
+            root = ElementTree.Element("Response")
+            parent = ElementTree.SubElement(root, "Errors")
+            ElementTree.SubElement(root, "RequestID").text = "benchmark"
+        else:
+            root = parent = ElementTree.Element("ErrorResponse")
+            ElementTree.SubElement(root, "RequestId").text = "benchmark"
+        e = ElementTree.SubElement(parent, "Error")
+        ElementTree.SubElement(e, "Code").text = error.code
+        ElementTree.SubElement(e, "Message").text = error.message
+        return ElementTree.tostring(root)
+
+    def handle(self, request):
+        """ Returns the name of the operation that was called, the HTTP status
+        and the response body """
+        operation = None
+        try:
+            operation, params = self.parse_request(request)
+            handler = getattr(self, "handle_{}".format(operation.name), None)
+            if not handler:
+                raise FakeError("NotImplemented", "{} is not simulated".format(operation.name))
+            with self.backend.lock:
+                result = handler(**params)
+            status = operation.http.get("responseCode", 200)
+            return operation.name, status, self.encode_response(operation, result or {})
+        except FakeError as e:
+            return operation.name if operation else "Unknown", e.status, self.encode_error(e)
+
+
+def _tag_getter(key):
+    def get_values(object):
+        return [t["Value"] for t in object.get("Tags", []) if t["Key"] == key]
+    return get_values
+
+
+def _filter(objects, filters):
+    for f in filters or []:
+        if f["Name"].startswith("tag:"):
+            get_values = _tag_getter(f["Name"][4:])
+        elif f["Name"] in DescribeCache.filters:
+            get_values = DescribeCache.filters[f["Name"]]
+        else:
+            raise FakeError("InvalidParameterValue", "Unsupported filter {}".format(f["Name"]))
+        values = set(f["Values"])
+        objects = [o for o in objects if values.intersection(get_values(o))]
+    return objects
+
+
+class EC2(Service):
+
+    name = "ec2"
+    endpoint = "ec2"
+
+    def __init__(self, backend):
+        super(EC2, self).__init__(backend)
+        self.vpcs = collections.OrderedDict()
+        self.subnets = collections.OrderedDict()
+        self.security_groups = collections.OrderedDict()
+
+    def handle_DescribeVpcs(self, Filters=None, VpcIds=None, **kwargs):
+        return {"Vpcs": _filter(list(self.vpcs.values()), Filters)}
+
+    def handle_CreateVpc(self, CidrBlock, InstanceTenancy="default", **kwargs):
+        vpc = {
+            "VpcId": self.backend.new_id("vpc-"),
+            "State": "available",
+            "CidrBlock": CidrBlock,
+            "InstanceTenancy": InstanceTenancy,
+            "IsDefault": False,
+        }
+        self.vpcs[vpc["VpcId"]] = vpc
+        return {"Vpc": vpc}
+
+    def handle_DescribeSubnets(self, Filters=None, **kwargs):
+        return {"Subnets": _filter(list(self.subnets.values()), Filters)}
+
+    def handle_CreateSubnet(self, VpcId, CidrBlock, AvailabilityZone="eu-west-1a", **kwargs):
+        if VpcId not in self.vpcs:
+            raise FakeError("InvalidVpcID.NotFound", "The vpc ID '{}' does not exist".format(VpcId))
+        subnet = {
+            "SubnetId": self.backend.new_id("subnet-"),
+            "State": "available",
+            "VpcId": VpcId,
+            "CidrBlock": CidrBlock,
+            "AvailabilityZone": AvailabilityZone,
+        }
+        self.subnets[subnet["SubnetId"]] = subnet
+        return {"Subnet": subnet}
+
+    def handle_DescribeNetworkAcls(self, **kwargs):
+        return {"NetworkAcls": []}
+
+    def handle_DescribeRouteTables(self, **kwargs):
+        return {"RouteTables": []}
+
+    def handle_DescribeSecurityGroups(self, Filters=None, **kwargs):
+        return {"SecurityGroups": _filter(list(self.security_groups.values()), Filters)}
+
+    def handle_CreateSecurityGroup(self, GroupName, Description, VpcId=None, **kwargs):
+        group = {
+            "GroupId": self.backend.new_id("sg-"),
+            "GroupName": GroupName,
+            "Description": Description,
+            "VpcId": VpcId,
+            "OwnerId": OWNER_ID,
+            "IpPermissions": [],
+            "IpPermissionsEgress": [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}],
+        }
+        self.security_groups[group["GroupId"]] = group
+        return {"GroupId": group["GroupId"]}
+
+    def _get_group(self, group_id):
+        if group_id not in self.security_groups:
+            raise FakeError("InvalidGroup.NotFound", "The security group '{}' does not exist".format(group_id))
+        return self.security_groups[group_id]
+
+    def handle_AuthorizeSecurityGroupIngress(self, GroupId, IpPermissions=(), **kwargs):
+        self._get_group(GroupId)["IpPermissions"].extend(IpPermissions)
+
+    def handle_AuthorizeSecurityGroupEgress(self, GroupId, IpPermissions=(), **kwargs):
+        self._get_group(GroupId)["IpPermissionsEgress"].extend(IpPermissions)
+
+    def _revoke(self, group, key, IpPermissions):
+        revoked = set(k for (k, permission) in get_permissions(IpPermissions))
+        group[key] = [p for (k, p) in get_permissions(group[key]) if k not in revoked]
+
+    def handle_RevokeSecurityGroupIngress(self, GroupId, IpPermissions=(), **kwargs):
+        self._revoke(self._get_group(GroupId), "IpPermissions", IpPermissions)
+
+    def handle_RevokeSecurityGroupEgress(self, GroupId, IpPermissions=(), **kwargs):
+        self._revoke(self._get_group(GroupId), "IpPermissionsEgress", IpPermissions)
+
+    def handle_CreateTags(self, Resources, Tags, **kwargs):
+        for resource_id in Resources:
+            for collection in (self.vpcs, self.subnets, self.security_groups):
+                if resource_id in collection:
+                    tags = dict((t["Key"], t["Value"]) for t in collection[resource_id].get("Tags", []))
+                    tags.update((t["Key"], t["Value"]) for t in Tags)
+                    collection[resource_id]["Tags"] = [{"Key": k, "Value": v} for (k, v) in sorted(tags.items())]
+
+
+class IAM(Service):
+
+    """ Inline policies are accepted but never returned, so roles always
+    look up to date. """
+
+    name = "iam"
+    endpoint = "iam"
+
+    def __init__(self, backend):
+        super(IAM, self).__init__(backend)
+        self.roles = collections.OrderedDict()
+
+    def handle_ListRoles(self, **kwargs):
+        return {"Roles": list(self.roles.values()), "IsTruncated": False}
+
+    def handle_CreateRole(self, RoleName, AssumeRolePolicyDocument, Path="/", **kwargs):
+        if RoleName in self.roles:
+            raise FakeError("EntityAlreadyExists", "Role with name {} already exists.".format(RoleName), status=409)
+        role = {
+            "RoleName": RoleName,
+            "RoleId": self.backend.new_id("AROA"),
+            "Path": Path,
+            "Arn": "arn:aws:iam::{}:role{}{}".format(OWNER_ID, Path, RoleName),
+            "CreateDate": "2015-01-01T00:00:00Z",
+            "AssumeRolePolicyDocument": quote(AssumeRolePolicyDocument),
+        }
+        self.roles[RoleName] = role
+        return {"Role": role}
+
+    def handle_ListRolePolicies(self, RoleName, **kwargs):
+        return {"PolicyNames": [], "IsTruncated": False}
+
+    def handle_GetAccountAuthorizationDetails(self, **kwargs):
+        roles = []
+        for role in self.roles.values():
+            role = dict(role)
+            role["RolePolicyList"] = []
+            role["InstanceProfileList"] = []
+            roles.append(role)
+        return {"RoleDetailList": roles, "IsTruncated": False}
+
+
+class Route53(Service):
+
+    name = "route53"
+    endpoint = "route53"
+
+    def __init__(self, backend):
+        super(Route53, self).__init__(backend)
+        self.zones = collections.OrderedDict()
+        self.records = {}
+
+    def _get_records(self, zone_id):
+        zone_id = zone_id.split("/")[-1]
+        if zone_id not in self.records:
+            raise FakeError("NoSuchHostedZone", "No hosted zone found with ID: {}".format(zone_id), status=404)
+        return self.records[zone_id]
+
+    def handle_ListHostedZones(self, **kwargs):
+        return {"HostedZones": list(self.zones.values()), "IsTruncated": False, "MaxItems": "100"}
+
+    def handle_CreateHostedZone(self, Name, CallerReference, HostedZoneConfig=None, **kwargs):
+        zone_id = self.backend.new_id("Z").upper()
+        zone = {
+            "Id": "/hostedzone/{}".format(zone_id),
+            "Name": Name,
+            "CallerReference": CallerReference,
+            "Config": HostedZoneConfig or {},
+            "ResourceRecordSetCount": 2,
+        }
+        self.zones[zone_id] = zone
+        self.records[zone_id] = collections.OrderedDict()
+        for record in (
+            {"Name": Name, "Type": "NS", "TTL": 172800, "ResourceRecords": [{"Value": "ns-1.example.net."}]},
+            {"Name": Name, "Type": "SOA", "TTL": 900, "ResourceRecords": [{"Value": "ns-1.example.net. admin. 1 7200 900 1209600 86400"}]},
+        ):
+            self.records[zone_id][(record["Name"], record["Type"], None)] = record
+        return {
+            "HostedZone": zone,
+            "ChangeInfo": self._change_info(),
+            "DelegationSet": {"NameServers": ["ns-1.example.net."]},
+        }
+
+    def handle_ListResourceRecordSets(self, HostedZoneId, **kwargs):
+        return {
+            "ResourceRecordSets": list(self._get_records(HostedZoneId).values()),
+            "IsTruncated": False,
+            "MaxItems": "100",
+        }
+
+    def handle_ChangeResourceRecordSets(self, HostedZoneId, ChangeBatch, **kwargs):
+        records = self._get_records(HostedZoneId)
+        for change in ChangeBatch["Changes"]:
+            record = change["ResourceRecordSet"]
+            key = (record["Name"], record["Type"], record.get("SetIdentifier", None))
+            if change["Action"] == "DELETE":
+                records.pop(key, None)
+            else:
+                records[key] = record
+        return {"ChangeInfo": self._change_info()}
+
+    def _change_info(self):
+        return {
+            "Id": "/change/{}".format(self.backend.new_id("C").upper()),
+            "Status": "INSYNC",
+            "SubmittedAt": "2015-01-01T00:00:00Z",
+        }
+
+
+class Backend(object):
+
+    """ A very small, in memory, simulation of the parts of EC2, IAM and
+    Route53 that touchdown uses for VPCs, subnets, security groups, roles and
+    hosted zones.
+
+    It answers the requests sent to a ``LatencyAdapter`` and counts every
+    call made to it.
+    """
+
+    services = [EC2, IAM, Route53]
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.counter = 0
+        self.calls = collections.Counter()
+        self.services = [klass(self) for klass in self.services]
+
+    def new_id(self, prefix):
+        with self.lock:
+            self.counter += 1
+            return "{}{:08x}".format(prefix, self.counter)
+
+    def install(self, adapter):
+        adapter.backend = self
+
+    def respond(self, request):
+        """ Returns the status and body of the response to ``request`` """
+        for service in self.services:
+            if service.matches(request):
+                operation_name, status, body = service.handle(request)
+                operation_name = "{}:{}".format(service.name, operation_name)
+                break
+        else:
+            operation_name, status, body = "unknown", 404, b""
+
+        with self.lock:
+            self.calls[operation_name] += 1
+
+        return status, body
+
+
+class LatencyAdapter(HTTPAdapter):
+
+    """ Sends every request to a ``Backend`` instead of AWS, waiting before
+    answering each one to simulate the round trip. """
+
+    def __init__(self, latency=0):
+        super(LatencyAdapter, self).__init__()
+        self.latency = latency
+        self.backend = None
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.latency:
+            time.sleep(self.latency)
+
+        status, body = self.backend.respond(request)
+        response = self.build_response(request, HTTPResponse(
+            status=status,
+            body=six.BytesIO(force_bytes(body)),
+            headers={"Content-Type": "text/xml"},
+            preload_content=False,
+        ))
+        response.content  # noqa
+        return response
+
+
+@contextlib.contextmanager
+def installed(adapter):
+    """ Sends the requests of every botocore client created in this block
+    through ``adapter`` """
+    original = endpoint.Endpoint
+
+    class BackendEndpoint(original):
+
+        def __init__(self, *args, **kwargs):
+            original.__init__(self, *args, **kwargs)
+            self.http_session.mount('https://', adapter)
+
+    endpoint.Endpoint = BackendEndpoint
+    try:
+        yield
+    finally:
+        endpoint.Endpoint = original
@@ -0,0 +1,143 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import os
+import platform
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from touchdown.core.runner import Runner
+
+from .backend import Backend, LatencyAdapter, installed
+from . import workspaces
+
+
+class SilentInterface(object):
+
+    def progress(self, iterable, label=None, length=None, eta=None):
+        return contextlib.closing(_Progress(iterable))
+
+    def render_plan(self, plan):
+        pass
+
+    def confirm_plan(self, plan):
+        return True
+
+
+class _Progress(object):
+
+    def __init__(self, iterable):
+        self.iterable = iterable
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        pass
+
+
+class Benchmark(object):
+
+    """ Plans and applies a synthetic workspace against a simulated AWS,
+    measuring each phase.
+
+    The phases are ``build`` (constructing the workspace), ``plan`` (against
+    an empty account), ``apply`` and ``replan`` (planning again once
+    everything exists, which should find nothing to do).
+    """
+
+    def __init__(self, vpcs=1, subnets=1, rules=1, records=0, roles=0, latency=0, parallel=1, trace_memory=False):
+        self.parameters = dict(
+            vpcs=vpcs,
+            subnets=subnets,
+            rules=rules,
+            records=records,
+            roles=roles,
+            latency=latency,
+            parallel=parallel,
+        )
+        self.latency = latency
+        self.parallel = parallel
+        self.trace_memory = trace_memory and tracemalloc is not None
+        self.backend = Backend()
+        self.phases = []
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        phase = {"name": name}
+        self.backend.calls.clear()
+        if self.trace_memory:
+            tracemalloc.start()
+        times = os.times()
+        start = time.time()
+
+        yield phase
+
+        phase["wall"] = time.time() - start
+        end = os.times()
+        phase["cpu"] = (end[0] - times[0]) + (end[1] - times[1])
+        phase["peak_memory"] = None
+        if self.trace_memory:
+            phase["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        phase["api_calls"] = dict(self.backend.calls)
+        phase["api_call_count"] = sum(self.backend.calls.values())
+        self.phases.append(phase)
+
+    def count_changes(self, plan):
+        return sum(len(changes) for (resource, changes) in plan)
+
+    def run(self):
+        adapter = LatencyAdapter(self.latency)
+        self.backend.install(adapter)
+
+        ui = SilentInterface()
+
+        with installed(adapter):
+            with self.measure("build") as phase:
+                workspace = workspaces.generate(
+                    vpcs=self.parameters["vpcs"],
+                    subnets=self.parameters["subnets"],
+                    rules=self.parameters["rules"],
+                    records=self.parameters["records"],
+                    roles=self.parameters["roles"],
+                )
+                workspace.validate()
+                phase["resources"] = len(Runner("apply", workspace, ui).goal.get_plan_order())
+
+            runner = Runner("apply", workspace, ui, parallel=self.parallel)
+            with self.measure("plan") as phase:
+                phase["changes"] = self.count_changes(list(runner.plan()))
+
+            with self.measure("apply") as phase:
+                runner.goal.apply(ui)
+
+            runner = Runner("apply", workspace, ui, parallel=self.parallel)
+            with self.measure("replan") as phase:
+                phase["changes"] = self.count_changes(list(runner.plan()))
+
+        return self.report()
+
+    def report(self):
+        return {
+            "parameters": self.parameters,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "phases": self.phases,
+        }
@@ -0,0 +1,78 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from touchdown.core import errors
+from touchdown.core.workspace import Workspace
+
+
+# Each rule gets its own port, starting at FIRST_PORT. Security group rules
+# can't use ports above 32768.
+FIRST_PORT = 1024
+MAX_RULES = 32768 - FIRST_PORT
+
+
+ASSUME_ROLE_POLICY = {
+    "Statement": [{
+        "Effect": "Allow",
+        "Principal": {"Service": "ec2.amazonaws.com"},
+        "Action": "sts:AssumeRole",
+    }],
+}
+
+
+def generate(vpcs=1, subnets=1, rules=1, records=0, roles=0):
+    """ Returns a workspace with ``vpcs`` VPCs. Each has ``subnets`` subnets
+    and a security group with ``rules`` ingress rules. If ``records`` is set
+    then a hosted zone with that many A records is added, along with
+    ``roles`` IAM roles. """
+    if vpcs > 256 or subnets > 256:
+        raise errors.Error("There can be at most 256 VPCs and 256 subnets per VPC")
+    if rules > MAX_RULES:
+        raise errors.Error("There can be at most {} rules per security group".format(MAX_RULES))
+
+    workspace = Workspace()
+    aws = workspace.add_aws(access_key_id='dummy', secret_access_key='dummy', region='eu-west-1')
+
+    for i in range(vpcs):
+        vpc = aws.add_vpc(name="vpc-{}".format(i), cidr_block="10.{}.0.0/16".format(i))
+        for j in range(subnets):
+            vpc.add_subnet(
+                name="subnet-{}-{}".format(i, j),
+                cidr_block="10.{}.{}.0/24".format(i, j),
+            )
+        vpc.add_security_group(
+            name="sg-{}".format(i),
+            description="Benchmark security group",
+            ingress=[{
+                "protocol": "tcp",
+                "port": FIRST_PORT + k,
+                "network": "10.0.0.0/8",
+            } for k in range(rules)],
+        )
+
+    if records:
+        aws.add_hosted_zone(
+            name="example.com",
+            records=[{
+                "name": "host{}.example.com".format(k),
+                "type": "A",
+                "ttl": 300,
+                "values": ["10.{}.{}.{}".format(k // 65536 % 256, k // 256 % 256, k % 256)],
+            } for k in range(records)],
+        )
+
+    for k in range(roles):
+        aws.add_role(name="role-{}".format(k), assume_role_policy=ASSUME_ROLE_POLICY)
+
+    return workspace
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import six
+
 
 class Action(object):
 
@@ -23,5 +25,15 @@ class Action(object):
     def get_plan(self, resource):
         return self.runner.get_plan(resource)
 
+    @property
+    def summary(self):
+        """ The first line of ``description`` """
+        description = self.description
+        if isinstance(description, six.string_types):
+            return description
+        for line in description:
+            return line
+        return self.__class__.__name__
+
     def __str__(self):
         return self.description
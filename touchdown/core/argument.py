@@ -99,7 +99,7 @@ class IPAddress(String):
         try:
             return netaddr.IPAddress(value)
         except (netaddr.core.AddrFormatError, ValueError):
-            raise errors.InvalidParameter("{} is not a valid IP Address")
+            raise errors.InvalidParameter("{} is not a valid IP Address".format(value))
 
 
 class IPNetwork(String):
@@ -110,9 +110,9 @@ class IPNetwork(String):
         try:
             value = netaddr.IPNetwork(value)
         except (netaddr.core.AddrFormatError, ValueError):
-            raise errors.InvalidParameter("{} is not a valid IP Address")
+            raise errors.InvalidParameter("{} is not a valid network".format(value))
         if value != value.cidr:
-            raise errors.InvalidParameter("{} looks wrong - did you mean {}?".format(value, value.cdr))
+            raise errors.InvalidParameter("{} looks wrong - did you mean {}?".format(value, value.cidr))
         return value
 
 
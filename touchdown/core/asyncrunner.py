@@ -0,0 +1,220 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import functools
+import logging
+
+from . import dependencies, errors, goals
+
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLimiter(object):
+
+    """ The asyncio equivalent of ``workers.Limiter``. Give the same limiter
+    to every ``AsyncRunner`` on a loop to limit them all together.
+
+    No more than ``total`` resources are worked on at once. Keys are tuples
+    whose first item is looked up in ``limits``, and no more than that many
+    resources with the same key are worked on at once.
+    """
+
+    def __init__(self, total=None, limits=None):
+        self.size = total
+        self.limits = limits or {}
+        self.total = None
+        self.semaphores = {}
+
+    # Semaphores are created lazily so that they belong to the loop that is
+    # running the goals
+
+    def get_semaphore(self, key):
+        if key[0] not in self.limits:
+            return None
+        if key not in self.semaphores:
+            self.semaphores[key] = asyncio.Semaphore(self.limits[key[0]])
+        return self.semaphores[key]
+
+    def get_total(self):
+        if self.size and not self.total:
+            self.total = asyncio.Semaphore(self.size)
+        return self.total
+
+
+class AsyncRunner(object):
+
+    """ A ``Runner`` for embedding touchdown in an asyncio application.
+
+    ``plan`` and ``apply`` are coroutines. Plans and actions still make
+    blocking botocore calls, so they are run in ``executor`` (the loop's
+    default executor if ``None``). No more than ``parallel`` resources are
+    worked on at once. The ``Goal.service_limits`` apply per account, so
+    runners on the same loop should be given the same ``AsyncLimiter`` (with
+    an overall ``total`` if needed); otherwise each runner has its own.
+    Actions that can be polled (like waiters) are awaited without tying up a
+    thread. Changes are traced and timed like any other run, so ``goal.eta``
+    is kept up to date during an apply if there is a ``history``. Runners
+    given the same ``goals.Shared`` share botocore sessions and clients.
+
+    This needs Python 3.5 or later.
+    """
+
+    def __init__(self, goal, workspace, ui, parallel=10, state=None, history=None, shared=None, executor=None, limiter=None):
+        try:
+            self.goal = goals.Goal.goals[goal](workspace, parallel=parallel, state=state, history=history, shared=shared)
+        except KeyError:
+            raise errors.Error("No such goal '{}'".format(goal))
+
+        self.workspace = workspace
+        self.ui = ui
+        self.parallel = parallel
+        self.executor = executor
+        self.semaphore = None
+        self.limiter = limiter or AsyncLimiter(limits=self.goal.service_limits)
+
+    def call(self, func, *args):
+        """ Calls ``func`` in the executor and returns a future for its
+        result """
+        loop = asyncio.get_event_loop()
+        return loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    def get_semaphore(self):
+        if not self.semaphore:
+            self.semaphore = asyncio.Semaphore(self.parallel)
+        return self.semaphore
+
+    async def limit(self, resource, callback):
+        # Finding the key can mean creating a session, which may block
+        key = await self.call(self.goal.get_limit_key, resource)
+        semaphores = [self.limiter.get_semaphore(key), self.get_semaphore(), self.limiter.get_total()]
+        acquired = []
+        try:
+            for semaphore in semaphores:
+                if semaphore:
+                    await semaphore.acquire()
+                    acquired.append(semaphore)
+            await callback(resource)
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+    async def visit(self, order, callback):
+        """ Awaits ``callback`` for every resource in ``order``, starting each
+        one as soon as its dependencies are done. If one fails nothing that
+        depends on it is started, and the first failure is raised once
+        everything else has finished. """
+        ready = dependencies.ReadyQueue(order)
+        pending = {}
+        failures = []
+
+        while True:
+            resource = ready.pop()
+            while resource is not None:
+                pending[asyncio.ensure_future(self.limit(resource, callback))] = resource
+                resource = ready.pop()
+
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(list(pending), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                resource = pending.pop(task)
+                ready.finish(resource, completed=not task.exception())
+                if task.exception():
+                    logger.debug("Failed to process {}, not scheduling its dependents".format(resource))
+                    failures.append(task.exception())
+
+        if failures:
+            raise failures[0]
+
+    async def plan_resource(self, resource):
+        await self.call(self.goal.get_changes, resource)
+
+    async def plan(self):
+        """ Returns a list of ``(resource, changes)`` for every resource that
+        needs changing """
+        self.goal.start_plan()
+        await self.visit(self.goal.get_plan_order(), self.plan_resource)
+
+        if self.goal.state:
+            await self.call(self.goal.state.save)
+
+        plan = []
+        for resource in self.goal.get_execution_order().all():
+            changes = self.goal.get_changes(resource)
+            if changes:
+                plan.append((resource, changes))
+        return plan
+
+    def wait_for(self, wait):
+        """ Returns a future for a poller ``Wait`` """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def finish(wait):
+            if future.done():
+                return
+            if wait.exc_info:
+                future.set_exception(wait.exc_info[1])
+            else:
+                future.set_result(wait.result)
+
+        wait.add_done_callback(lambda wait: loop.call_soon_threadsafe(finish, wait))
+        return future
+
+    async def apply_change(self, resource, change):
+        submit = getattr(change, "submit", None)
+        if not submit:
+            await self.call(self.goal.apply_change, resource, change)
+            return
+
+        # The change is spread over several threads and interleaved with
+        # other coroutines, so its span can't go on any one thread's stack
+        with self.goal.applying(resource, change, detached=True):
+            wait = await self.call(submit)
+            try:
+                await self.wait_for(wait)
+            except asyncio.CancelledError:
+                wait.cancel()
+                raise
+            await self.call(change.finish)
+
+    async def apply_resource(self, resource):
+        for change in self.goal.get_changes(resource):
+            await self.apply_change(resource, change)
+        self.goal.complete_resource(resource)
+
+    async def apply(self):
+        """ Plans and then applies the changes, if ``ui.confirm_plan``
+        accepts them. Raises ``NothingChanged`` if there is nothing to do. """
+        plan = await self.plan()
+
+        if not len(plan):
+            raise errors.NothingChanged()
+
+        if not self.ui.confirm_plan(plan):
+            return
+
+        await self.call(self.goal.start_apply)
+        try:
+            await self.visit(self.goal.get_execution_order(), self.apply_resource)
+        finally:
+            self.goal.eta = None
+            if self.goal.state:
+                await self.call(self.goal.state.save)
+            if self.goal.history:
+                await self.call(self.goal.history.save)
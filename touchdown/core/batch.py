@@ -0,0 +1,207 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+import time
+
+from . import errors, goals
+from .runner import Runner
+from .workers import Limiter, run_all
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def load_targets(path):
+    """ Reads a list of targets from a JSON or (if PyYAML is installed) YAML
+    file. Each target is a dict with a unique ``name``, and any other keys are
+    up to the Touchdownfile. The list can also be under a ``targets`` key. """
+    with open(path) as fp:
+        if path.endswith((".yml", ".yaml")):
+            if yaml is None:
+                raise errors.Error("PyYAML must be installed to read {}".format(path))
+            targets = yaml.safe_load(fp)
+        else:
+            targets = json.load(fp)
+
+    if isinstance(targets, dict):
+        targets = targets.get("targets")
+    if not isinstance(targets, list):
+        raise errors.Error("{} should contain a list of targets".format(path))
+
+    names = set()
+    for target in targets:
+        if not isinstance(target, dict) or not target.get("name"):
+            raise errors.Error("Every target in {} needs a name".format(path))
+        if target["name"] in names:
+            raise errors.Error("There is more than one target called {}".format(target["name"]))
+        names.add(target["name"])
+
+    return targets
+
+
+class QuietInterface(object):
+
+    """ Progress bars for several workspaces at once would be unreadable, so
+    the goals of a batch don't show any """
+
+    def progress(self, iterable, label=None, length=None, eta=None):
+        return _Progress(iterable)
+
+
+class _Progress(object):
+
+    def __init__(self, iterable):
+        self.iterable = iterable
+
+    def __enter__(self):
+        return self.iterable
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class Result(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.status = "pending"
+        self.changes = 0
+        self.duration = 0
+        self.error = None
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "status": self.status,
+            "changes": self.changes,
+            "duration": self.duration,
+            "error": self.error,
+        }
+
+
+class BatchRunner(object):
+
+    """ Runs a goal against several workspaces in one process.
+
+    The workspaces share botocore sessions, clients and service models (see
+    ``goals.Shared``), so targets that use the same account don't each
+    authenticate and load models again. Up to ``workers`` workspaces are
+    planned or applied at once, each changing up to ``parallel`` resources at
+    a time. A ``workers.Limiter`` shared by every goal makes sure that no
+    more than ``max_parallel`` resources are worked on in total, and that
+    ``Goal.service_limits`` are respected across every workspace using the
+    same account.
+
+    ``workspaces`` is a list of ``(name, workspace)``. A workspace that fails
+    doesn't stop the others, the failure is recorded in ``report``.
+    """
+
+    def __init__(self, goal, workspaces, ui, parallel=1, workers=1, max_parallel=None, history=None):
+        self.ui = ui
+        self.workers = workers
+        self.history = history
+        self.shared = goals.Shared()
+
+        limiter = None
+        if workers > 1 or max_parallel:
+            limiter = Limiter(
+                total=max_parallel,
+                limits=goals.Goal.service_limits,
+            )
+
+        self.runners = []
+        self.results = []
+        for name, workspace in workspaces:
+            self.runners.append(Runner(
+                goal,
+                workspace,
+                QuietInterface(),
+                parallel=parallel,
+                history=history,
+                shared=self.shared,
+                limiter=limiter,
+            ))
+            self.results.append(Result(name))
+
+        self.plans = [None] * len(self.runners)
+
+    def run_targets(self, callback, results):
+        def wrap(i):
+            def run():
+                result = self.results[i]
+                start = time.time()
+                try:
+                    callback(i)
+                except Exception as e:
+                    logger.debug("{} failed".format(result.name), exc_info=True)
+                    result.status = "failed"
+                    result.error = str(e)
+                finally:
+                    result.duration += time.time() - start
+            return run
+
+        run_all([wrap(i) for i in results], self.workers)
+
+    def plan_target(self, i):
+        self.plans[i] = list(self.runners[i].plan())
+        result = self.results[i]
+        result.changes = sum(len(changes) for (resource, changes) in self.plans[i])
+        result.status = "planned" if result.changes else "unchanged"
+
+    def plan(self):
+        """ Plans every workspace and returns a single plan, with each
+        resource labelled with the name of its workspace """
+        self.run_targets(self.plan_target, range(len(self.runners)))
+
+        plan = []
+        for result, changes in zip(self.results, self.plans):
+            for resource, actions in changes or []:
+                plan.append(("{}: {}".format(result.name, resource), actions))
+        return plan
+
+    def apply_target(self, i):
+        self.runners[i].goal.apply(QuietInterface())
+        self.results[i].status = "applied"
+
+    def apply(self):
+        plan = self.plan()
+
+        if not len(plan):
+            if any(r.status == "failed" for r in self.results):
+                return self.report()
+            raise errors.NothingChanged()
+
+        if not self.ui.confirm_plan(plan):
+            return self.report()
+
+        pending = [i for (i, result) in enumerate(self.results) if result.status == "planned"]
+        try:
+            self.run_targets(self.apply_target, pending)
+        finally:
+            if self.history:
+                self.history.save()
+
+        return self.report()
+
+    def report(self):
+        """ Returns a summary of what happened to each workspace """
+        return [result.as_dict() for result in self.results]
@@ -0,0 +1,67 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class CidrIndex(object):
+
+    """ An index of networks for finding overlaps without comparing every
+    pair of ``netaddr.IPNetwork`` objects.
+
+    Each network is stored as the range of integers from its first to its
+    last address. Two CIDR blocks are either disjoint or one contains the
+    other, so every overlap can be found in one sweep over the ranges in
+    order, and the blocks containing a network can be found with one lookup
+    per prefix length.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.by_prefix = {}
+        self.prefixes = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, network, value):
+        key = (network.version, network.prefixlen, network.first)
+        self.entries.append((network.version, network.first, -network.last, value))
+        self.by_prefix.setdefault(key, []).append(value)
+        self.prefixes.add((network.version, network.prefixlen))
+
+    def get(self, network):
+        """ Returns the values that were added with exactly ``network`` """
+        return self.by_prefix.get((network.version, network.prefixlen, network.first), [])
+
+    def containing(self, network):
+        """ Yields the values of every network that contains ``network``,
+        including ones that are equal to it """
+        width = 32 if network.version == 4 else 128
+        for version, prefixlen in sorted(self.prefixes):
+            if version != network.version or prefixlen > network.prefixlen:
+                continue
+            mask = ((1 << prefixlen) - 1) << (width - prefixlen)
+            for value in self.by_prefix.get((version, prefixlen, network.first & mask), []):
+                yield value
+
+    def overlaps(self):
+        """ Yields ``(outer, inner)`` for every pair of overlapping networks,
+        where ``outer`` contains ``inner`` """
+        enclosing = []
+        for version, first, last, value in sorted(self.entries, key=lambda e: e[:3]):
+            last = -last
+            while enclosing and (enclosing[-1][0] != version or enclosing[-1][1] < first):
+                enclosing.pop()
+            for outer in enclosing:
+                yield outer[2], value
+            enclosing.append((version, last, value))
@@ -0,0 +1,126 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+
+from .utils import force_bytes
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_key(*parts):
+    """ Returns a key for credentials that were asked for with ``parts`` """
+    return hashlib.sha1(force_bytes(json.dumps(parts, sort_keys=True))).hexdigest()
+
+
+class CredentialCache(object):
+
+    """ Remembers temporary credentials (like those from assuming a role) so
+    that they can be reused until they are about to expire, rather than asking
+    for new ones every run.
+
+    Entries are stored as JSON lines in a file that only the current user can
+    read. If the file can be read by anyone else it is ignored. Without a
+    ``path`` credentials are only shared within this process.
+    """
+
+    def __init__(self, path=None):
+        self.path = None
+        self.entries = {}
+        self.lock = threading.Lock()
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        with self.lock:
+            self.path = path
+            self.entries = {}
+        self.load()
+
+    def close(self):
+        with self.lock:
+            self.path = None
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        mode = os.stat(self.path).st_mode
+        if mode & (stat.S_IRWXG | stat.S_IRWXO):
+            logger.warning("Ignoring {} as other users can read it".format(self.path))
+            return
+
+        now = time.time()
+        with open(self.path) as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.debug("Ignoring malformed credential cache entry")
+                    continue
+                if entry["expiration"] > now:
+                    self.entries[entry["key"]] = entry
+
+    def save(self):
+        # Several roles can be assumed at once, so the whole write happens
+        # under the lock. Failing to save only means assuming the role again
+        # next time, so it isn't an error.
+        with self.lock:
+            if not self.path:
+                return
+            now = time.time()
+            lines = [json.dumps(e, sort_keys=True) for e in self.entries.values() if e["expiration"] > now]
+
+            try:
+                directory = os.path.dirname(self.path)
+                if directory and not os.path.isdir(directory):
+                    os.makedirs(directory, 0o700)
+                fd, tmp = tempfile.mkstemp(dir=directory or ".")
+                with os.fdopen(fd, "w") as fp:
+                    for line in lines:
+                        fp.write(line + "\n")
+                os.rename(tmp, self.path)
+            except (IOError, OSError) as e:
+                logger.warning("Unable to save credentials to {}: {}".format(self.path, e))
+
+    def get(self, key, margin=0):
+        """ Returns the credentials stored for ``key`` if they are valid for
+        at least another ``margin`` seconds, otherwise ``None`` """
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and entry["expiration"] - margin > time.time():
+            return entry["credentials"]
+
+    def set(self, key, credentials, expiration):
+        """ Stores ``credentials``, which expire at the unix time
+        ``expiration`` """
+        with self.lock:
+            self.entries[key] = {
+                "key": key,
+                "credentials": credentials,
+                "expiration": expiration,
+            }
+        self.save()
+
+
+credential_cache = CredentialCache()
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+
 from . import errors
 
 
@@ -24,65 +26,131 @@ class DependencyMap(object):
     If ``tips_first`` is False then the most dependended upon nodes will be
     visited first. This is the default, and is used when creating and apply
     changes - a VPC needs to exist before you can create a subnet in it.
+
+    Scheduling is done with Kahn's algorithm. Each node keeps a count of the
+    nodes it is still waiting for, and a reverse index means completing a node
+    only touches the nodes that were waiting on it.
     """
 
     def __init__(self, node, tips_first=False):
         self.node = node
         self.tips_first = tips_first
         self.map = {}
+        self.reverse = {}
+        self.waiting = {}
+        self.ready = collections.OrderedDict()
         self._prepare()
 
+    def _add_node(self, node):
+        if node not in self.map:
+            self.map[node] = set()
+            self.reverse[node] = set()
+
     def _add_dependency(self, node, dep):
         if self.tips_first:
-            self.map.setdefault(dep, set()).add(node)
-        else:
-            self.map.setdefault(node, set()).add(dep)
+            node, dep = dep, node
+        self._add_node(node)
+        self._add_node(dep)
+        self.map[node].add(dep)
+        self.reverse[dep].add(node)
 
     def _prepare(self):
-        queue = [self.node]
-        visiting = set()
-        visited = set()
+        queue = collections.deque([self.node])
+        seen = set(queue)
 
         while queue:
-            node = queue.pop(0)
-            visiting.add(node)
-
-            self.map.setdefault(node, set())
+            node = queue.popleft()
+            self._add_node(node)
 
             for dep in node.dependencies:
-                if dep in visiting:
+                if dep == node:
                     raise errors.CycleError(
                         'Circular reference between %s and %s' % (node, dep)
                     )
                 self._add_dependency(node, dep)
-                if dep not in visited and dep not in queue:
+                if dep not in seen:
+                    seen.add(dep)
                     queue.append(dep)
 
-            visiting.remove(node)
-            visited.add(node)
+        for node, deps in self.map.items():
+            self.waiting[node] = len(deps)
+            if not deps:
+                self.ready[node] = True
+
+    def __len__(self):
+        return len(self.map)
 
     def items(self):
         return self.map.items()
 
     def get_ready(self):
         """ Yields resources that are ready to be applied """
-        for node, deps in self.map.items():
-            if not deps:
-                yield node
+        for node in list(self.ready):
+            yield node
 
     def complete(self, node):
-        """ Marks a node as complete - it's dependents may proceed """
-        del self.map[node]
-        for deps in self.map.values():
-            deps.difference_update((node,))
+        """ Marks a node as complete - it's dependents may proceed. Returns
+        the nodes that are now ready. """
+        del self.waiting[node]
+        self.ready.pop(node, None)
+        ready = []
+        for dependent in self.reverse[node]:
+            self.waiting[dependent] -= 1
+            if not self.waiting[dependent]:
+                self.ready[dependent] = True
+                ready.append(dependent)
+        return ready
 
     def all(self):
         """ Visits all remaining nodes in order immediately """
-        while self.map:
-            ready = list(self.get_ready())
-            if not ready:
-                return
-
-            for node in ready:
-                yield node
-                self.complete(node)
+        while self.ready:
+            node = next(iter(self.ready))
+            yield node
+            self.complete(node)
+
+
+class ReadyQueue(object):
+
+    """ The nodes of a ``DependencyMap`` that are ready but haven't been
+    started yet, for schedulers that run several nodes at once.
+
+    If ``key`` is set then it is called for each node and the result is looked
+    up in ``limits``. No more than that many nodes with the same key are
+    started at once. A node that is held back waits in a queue for its key
+    until a node with the same key finishes, so nodes are never rescanned and
+    visiting the whole map is O(V + E).
+    """
+
+    def __init__(self, dependency_map, limits=None, key=None):
+        self.dependency_map = dependency_map
+        self.limits = limits or {}
+        self.key = key
+        self.queue = collections.deque(dependency_map.get_ready())
+        self.held = {}
+        self.keys = {}
+        self.running = collections.Counter()
+
+    def pop(self):
+        """ Returns the next node that can be started, or ``None`` """
+        while self.queue:
+            node = self.queue.popleft()
+            if node not in self.keys:
+                self.keys[node] = self.key(node) if self.key else None
+            key = self.keys[node]
+            if key in self.limits and self.running[key] >= self.limits[key]:
+                self.held.setdefault(key, collections.deque()).append(node)
+                continue
+            self.running[key] += 1
+            return node
+        return None
+
+    def finish(self, node, completed=True):
+        """ Records that ``node`` has stopped running. If it ``completed``
+        then the nodes that depend on it may now be ready. """
+        key = self.keys[node]
+        self.running[key] -= 1
+        held = self.held.get(key)
+        if held:
+            self.queue.appendleft(held.popleft())
+        if completed:
+            self.queue.extend(self.dependency_map.complete(node))
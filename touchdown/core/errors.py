@@ -33,6 +33,10 @@ class NonConformingPolicy(Error):
     pass
 
 
+class Timeout(Error):
+    pass
+
+
 class CycleError(Error):
     """ The graph has a cycle so there is no way to apply changes to the cluster
     sanely """
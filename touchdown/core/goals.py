@@ -12,9 +12,38 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+import threading
+import time
+
 import six
 
-from . import dependencies, plan
+from . import dependencies, history, plan, serializers, workers
+from .tracing import tracer
+
+
+class Shared(object):
+
+    """ Objects that are shared by every goal that is given the same
+    ``Shared``, such as botocore sessions and their clients. Unlike the caches
+    returned by ``Goal.get_cache`` these last for the life of the goal. """
+
+    def __init__(self):
+        self.objects = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, factory):
+        # Each key has its own lock so that slow factories (like assuming a
+        # role) for different keys can run at the same time
+        with self.lock:
+            if key not in self.locks:
+                self.locks[key] = threading.Lock()
+            lock = self.locks[key]
+        with lock:
+            if key not in self.objects:
+                self.objects[key] = factory()
+            return self.objects[key]
 
 
 class GoalType(type):
@@ -31,10 +60,28 @@ class Goal(six.with_metaclass(GoalType)):
     goals = {}
     execute_in_reverse = False
 
-    def __init__(self, workspace):
+    # Some services have low, account wide, rate limits. When running in
+    # parallel don't let more than this many resources talk to them at once.
+    service_limits = {
+        "cloudfront": 2,
+        "iam": 2,
+        "route53": 2,
+    }
+
+    def __init__(self, workspace, parallel=1, state=None, history=None, shared=None, limiter=None):
         self.workspace = workspace
+        self.parallel = parallel
+        self.state = state
+        self.history = history
+        self.shared = shared or Shared()
+        self.limiter = limiter
+        self.eta = None
         self.resources = {}
         self.changes = {}
+        self.caches = {}
+        self.caching = True
+        self.render_cache = serializers.RenderCache()
+        self.lock = threading.RLock()
 
     def get_plan_order(self):
         return dependencies.DependencyMap(self.workspace, tips_first=False)
@@ -43,22 +90,88 @@ class Goal(six.with_metaclass(GoalType)):
         raise NotImplementedError(self.get_planner)
 
     def get_plan(self, resource):
-        if resource not in self.resources:
-            klass = self.get_plan_class(resource)
-            self.resources[resource] = klass(self, resource)
+        with self.lock:
+            if resource not in self.resources:
+                klass = self.get_plan_class(resource)
+                self.resources[resource] = klass(self, resource)
+        self.render_cache.observe(resource)
         return self.resources[resource]
 
     def get_changes(self, resource):
         if not resource in self.changes:
-            self.changes[resource] = list(self.get_plan(resource).get_actions())
+            with tracer.span("plan", str(resource), resource=resource):
+                self.changes[resource] = list(self.get_plan(resource).get_actions())
         return self.changes[resource]
 
-    def plan(self, ui):
+    def get_cache(self, key, factory):
+        """ Returns an object that is shared by every plan while planning.
+
+        Caches are dropped as soon as changes start being applied (their
+        contents would be stale), after which this returns ``None``.
+        """
+        with self.lock:
+            if not self.caching:
+                return None
+            if key not in self.caches:
+                self.caches[key] = factory()
+            return self.caches[key]
+
+    def get_shared(self, key, factory):
+        """ Returns an object that is shared with every goal using the same
+        ``Shared`` """
+        return self.shared.get(key, factory)
+
+    def get_service_name(self, resource):
+        return getattr(self.get_plan(resource), "service_name", None)
+
+    def get_limit_key(self, resource):
+        # Goals that share a session are talking to the same account, so
+        # they are subject to the same account wide rate limits
+        plan = self.get_plan(resource)
+        service_name = getattr(plan, "service_name", None)
+        if service_name not in self.service_limits:
+            return service_name, None
+        return service_name, getattr(plan, "session", None)
+
+    def limit(self, callback):
+        if not self.limiter:
+            return callback
+
+        def limited(resource):
+            with self.limiter.limit(self.get_limit_key(resource)):
+                callback(resource)
+        return limited
+
+    def visit(self, ui, label, order, callback, **kwargs):
+        callback = self.limit(callback)
+        if self.parallel <= 1:
+            resolved = list(order.all())
+            with ui.progress(resolved, label=label, **kwargs) as resolved:
+                for resource in resolved:
+                    callback(resource)
+            return
+
+        executor = workers.Executor(
+            order,
+            self.parallel,
+            limits=self.service_limits,
+            key=self.get_service_name,
+        )
+        completed = executor.run(callback)
+        with ui.progress(completed, label=label, length=len(order), **kwargs) as completed:
+            for resource in completed:
+                pass
+
+    def start_plan(self):
+        """ Forgets the changes and caches of any previous plan """
         self.changes = {}
-        resolved = list(self.get_plan_order().all())
-        with ui.progress(resolved, label="Creating change plan") as resolved:
-            for resource in resolved:
-                self.get_changes(resource)
+        self.caches = {}
+        self.caching = True
+        self.render_cache = serializers.RenderCache()
+
+    def plan(self, ui):
+        self.start_plan()
+        self.visit(ui, "Creating change plan", self.get_plan_order(), self.get_changes)
 
     def is_stale(self):
         return len(self.changes) != 0
@@ -66,14 +179,69 @@ class Goal(six.with_metaclass(GoalType)):
     def get_execution_order(self):
         return dependencies.DependencyMap(self.workspace, tips_first=self.execute_in_reverse)
 
+    @contextlib.contextmanager
+    def applying(self, resource, change, detached=False):
+        """ Does the bookkeeping for applying ``change``, which happens in
+        the block. ``detached`` is passed on to ``tracer.span``. """
+        # Any cached state is invalid once a change has been made. Actions
+        # that refresh the remote state (like waiters) will replace it.
+        if self.state:
+            self.state.invalidate(resource)
+
+        start = time.time()
+        with tracer.span("action", change.summary, resource=resource, detached=detached, action=change.__class__.__name__):
+            yield
+        if self.history:
+            self.history.record(resource, change, time.time() - start)
+
+    def apply_change(self, resource, change):
+        with self.applying(resource, change):
+            change.run()
+
+    def complete_resource(self, resource):
+        """ Called once every change to ``resource`` has been applied """
+        if self.eta:
+            self.eta.complete(resource)
+
+    def apply_resource(self, resource):
+        for change in self.get_changes(resource):
+            # if not ui.confirm_action(change):
+            #     continue
+            self.apply_change(resource, change)
+        self.complete_resource(resource)
+
+    def get_schedule(self):
+        """ Returns a ``Schedule`` for applying the current plan, using the
+        durations of previous runs """
+        estimates = self.history or history.History()
+        durations = {}
+        for resource in self.get_execution_order().all():
+            durations[resource] = estimates.estimate_changes(resource, self.get_changes(resource))
+        return history.Schedule(
+            self.get_execution_order,
+            durations,
+            limits=self.service_limits if self.parallel > 1 else None,
+            key=self.get_service_name,
+        )
+
+    def start_apply(self):
+        """ Drops the caches used while planning, as applying changes will
+        make them stale, and starts estimating how long the apply will take
+        if there is a history """
+        self.caches = {}
+        self.caching = False
+        if self.history:
+            self.eta = history.Eta(self.get_schedule(), self.parallel)
+
     def apply(self, ui):
-        plan = list(self.get_execution_order().all())
-        with ui.progress(plan, label="Apply changes") as plan:
-            for resource in plan:
-                for change in self.get_changes(resource):
-                    # if not ui.confirm_action(change):
-                    #     continue
-                    change.run()
+        self.start_apply()
+        kwargs = {}
+        if self.eta:
+            kwargs["eta"] = self.eta
+        try:
+            self.visit(ui, "Apply changes", self.get_execution_order(), self.apply_resource, **kwargs)
+        finally:
+            self.eta = None
 
 
 class Describe(Goal):
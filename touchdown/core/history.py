@@ -0,0 +1,219 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from .dependencies import ReadyQueue
+
+
+logger = logging.getLogger(__name__)
+
+
+# How long to assume an action takes if it has never been seen before
+DEFAULT_DURATION = 5.0
+
+# How much weight the latest run is given when updating an average
+WEIGHT = 0.3
+
+
+def get_action_name(action):
+    """ Returns a name for an action that is stable between runs. Generic
+    actions and waiters are told apart by what they call. """
+    name = action.__class__.__name__
+    detail = getattr(action, "waiter", None) or getattr(getattr(action, "func", None), "__name__", None)
+    if detail:
+        name = "{}.{}".format(name, detail)
+    return name
+
+
+class History(object):
+
+    """ Remembers how long each kind of action took in previous runs.
+
+    Durations are kept per resource type and action as a moving average, so
+    that estimates follow changes in how long AWS takes. Entries are stored as
+    JSON lines, like the state cache. If ``path`` is ``None`` nothing is
+    loaded or saved and every estimate is ``DEFAULT_DURATION``.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        with open(self.path) as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.debug("Ignoring malformed history entry")
+                    continue
+                self.entries[(entry["resource"], entry["action"])] = entry
+
+    def save(self):
+        if not self.path:
+            return
+
+        with self.lock:
+            lines = [json.dumps(entry, sort_keys=True) for entry in self.entries.values()]
+
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as fp:
+            for line in lines:
+                fp.write(line + "\n")
+        os.rename(tmp, self.path)
+
+    def record(self, resource, action, duration):
+        key = (resource.resource_name, get_action_name(action))
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                entry = self.entries[key] = {
+                    "resource": key[0],
+                    "action": key[1],
+                    "count": 0,
+                    "duration": duration,
+                }
+            entry["count"] += 1
+            entry["duration"] += (duration - entry["duration"]) * WEIGHT
+
+    def estimate(self, resource, action):
+        """ Returns how long ``action`` is expected to take. Actions that have
+        never been seen for this type of resource fall back to the average for
+        that action on any resource. """
+        name = get_action_name(action)
+        with self.lock:
+            entry = self.entries.get((resource.resource_name, name))
+            if entry:
+                return entry["duration"]
+            similar = [e["duration"] for e in self.entries.values() if e["action"] == name]
+        if similar:
+            return sum(similar) / len(similar)
+        return DEFAULT_DURATION
+
+    def estimate_changes(self, resource, changes):
+        return sum(self.estimate(resource, change) for change in changes)
+
+
+class Schedule(object):
+
+    """ Predicts how long applying a plan will take.
+
+    ``get_order`` is called to get a fresh ``DependencyMap`` each time the
+    graph is walked, and ``durations`` is the expected time for each node.
+    ``limits`` and ``key`` are the per service limits used by
+    ``workers.Executor``.
+    """
+
+    def __init__(self, get_order, durations, limits=None, key=None):
+        self.get_order = get_order
+        self.durations = durations
+        self.limits = limits or {}
+        self.key = key
+
+    @property
+    def total(self):
+        """ The time it would take to apply every change one at a time """
+        return sum(self.durations.values())
+
+    def critical_path(self):
+        """ Returns the longest chain of dependent nodes as a list of ``(node,
+        duration)``. However many workers there are, an apply can't finish
+        any faster than this. """
+        order = self.get_order()
+        finish = {}
+        previous = {}
+        for node in order.all():
+            start = 0
+            for dep in order.map[node]:
+                if finish[dep] > start:
+                    start = finish[dep]
+                    previous[node] = dep
+            finish[node] = start + self.durations.get(node, 0)
+
+        if not finish:
+            return []
+
+        node = max(finish, key=lambda n: finish[n])
+        path = []
+        while node is not None:
+            path.insert(0, (node, self.durations.get(node, 0)))
+            node = previous.get(node)
+        return path
+
+    def simulate(self, parallel=1):
+        """ Returns how long an apply would take with ``parallel`` workers,
+        scheduling nodes in the same way as ``workers.Executor`` """
+        ready = ReadyQueue(self.get_order(), self.limits, self.key)
+        counter = itertools.count()
+        running = []
+        now = 0
+
+        while True:
+            while len(running) < parallel:
+                node = ready.pop()
+                if node is None:
+                    break
+                heapq.heappush(running, (now + self.durations.get(node, 0), next(counter), node))
+
+            if not running:
+                return now
+
+            now, _, node = heapq.heappop(running)
+            ready.finish(node)
+
+
+class Eta(object):
+
+    """ Estimates the time left in an apply that is in progress.
+
+    Before anything has finished this is the simulated time for the whole
+    apply. After that it is based on how quickly the expected work has
+    actually been getting done, so a run that is slower than usual is
+    reflected in the estimate.
+    """
+
+    def __init__(self, schedule, parallel=1):
+        self.durations = schedule.durations
+        self.expected = schedule.simulate(parallel)
+        self.total = schedule.total
+        self.done = 0
+        self.lock = threading.Lock()
+        self.start = time.time()
+
+    def complete(self, node):
+        with self.lock:
+            self.done += self.durations.get(node, 0)
+
+    def remaining(self):
+        with self.lock:
+            done = self.done
+        elapsed = time.time() - self.start
+        if not done or not self.total:
+            return max(0, self.expected - elapsed)
+        return elapsed * (self.total - done) / done
+
+    def format(self):
+        return "ETA {}".format(time.strftime("%H:%M:%S", time.gmtime(self.remaining())))
@@ -12,19 +12,55 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import os
+import time
+
 import click
 
+from touchdown.core.batch import BatchRunner, load_targets
+from touchdown.core.credentials import credential_cache
+from touchdown.core.history import History
+from touchdown.core.profiling import profiler
 from touchdown.core.runner import Runner
+from touchdown.core.state import StateCache
+from touchdown.core.tracing import tracer
 from touchdown.core.workspace import Workspace
 from touchdown.core import errors
 
 
+# Where the state cache lives. Like the Touchdownfile this is in the current
+# directory.
+STATE_FILE = ".touchdown-state"
+
+# Where the durations of previous applies are kept
+HISTORY_FILE = ".touchdown-history"
+
+# Where credentials for assumed roles are kept between runs. This is outside
+# of the project so that they can't be committed by mistake.
+CREDENTIALS_FILE = os.path.join("~", ".touchdown", "credentials")
+
+
+def format_duration(seconds):
+    return time.strftime("%H:%M:%S", time.gmtime(seconds))
+
+
 class ConsoleInterface(object):
 
     def __init__(self, interactive=True):
         self.interactive = interactive
 
-    def progress(self, iterable, label=None, length=None):
+    def progress(self, iterable, label=None, length=None, eta=None):
+        if eta:
+            # Use the estimate from previous runs rather than click's, which
+            # assumes every resource takes as long as every other
+            return click.progressbar(
+                iterable,
+                label=label,
+                length=length,
+                show_eta=False,
+                item_show_func=lambda item: eta.format(),
+            )
         return click.progressbar(iterable, label=label, length=length)
 
     def render_plan(self, plan):
@@ -49,21 +85,130 @@ class ConsoleInterface(object):
         return click.confirm("Do you want to continue?")
 
 
-@click.group()
-@click.option('--debug/--no-debug', default=False, envvar='DEBUG')
-@click.pass_context
-def main(ctx, debug):
-    g = {"workspace": Workspace()}
+def state_options(f):
+    f = click.option('--state-ttl', default=300, type=click.IntRange(min=0), help='Seconds before a cached state entry is too old to use')(f)
+    f = click.option('--state-cache/--no-state-cache', default=False, help='Cache the state of remote resources between runs')(f)
+    return f
+
+
+def get_state(state_cache, state_ttl, probable=False):
+    if state_cache or probable:
+        return StateCache(STATE_FILE, ttl=state_ttl, probable=probable)
+
+
+def batch_options(f):
+    f = click.option('--report', type=click.File('w'), help='Write a JSON report of every target to this file')(f)
+    f = click.option('--max-parallel', type=click.IntRange(min=1), help='Most resources to change at once across all targets')(f)
+    f = click.option('--target-workers', default=1, type=click.IntRange(min=1), help='Number of targets to work on at the same time')(f)
+    f = click.option('--targets', type=click.Path(exists=True, dir_okay=False), help='Run against every target in this YAML or JSON file')(f)
+    return f
+
+
+def load_workspace(target=None):
+    """ Runs the Touchdownfile and returns its workspace. When running
+    against several targets ``target`` is the dict for the current one. """
+    g = {"workspace": Workspace(), "target": target}
     with open("Touchdownfile") as f:
         code = compile(f.read(), "Touchdownfile", "exec")
         exec(code, g)
-    ctx.obj = g['workspace']
+
+    try:
+        g['workspace'].validate()
+    except errors.Error as e:
+        raise click.ClickException(str(e))
+    return g['workspace']
+
+
+def get_workspace(ctx):
+    if ctx.obj is None:
+        ctx.obj = load_workspace()
+    return ctx.obj
+
+
+def get_batch(goal, targets, parallel, target_workers, max_parallel, state_cache=False, history=None):
+    if state_cache:
+        raise click.ClickException("--state-cache can't be used with --targets")
+    try:
+        targets = load_targets(targets)
+    except errors.Error as e:
+        raise click.ClickException(str(e))
+    return BatchRunner(
+        goal,
+        [(target["name"], load_workspace(target)) for target in targets],
+        ConsoleInterface(),
+        parallel=parallel,
+        workers=target_workers,
+        max_parallel=max_parallel,
+        history=history,
+    )
+
+
+def report_batch(report, output=None):
+    if output:
+        json.dump(report, output, indent=4, sort_keys=True)
+
+    click.echo()
+    for result in report:
+        click.echo("{}: {} ({} changes in {})".format(
+            result["name"],
+            result["status"],
+            result["changes"],
+            format_duration(result["duration"]),
+        ))
+        if result["error"]:
+            click.echo("    {}".format(result["error"]))
+
+    failed = [result["name"] for result in report if result["status"] == "failed"]
+    if failed:
+        raise click.ClickException("{} of {} targets failed".format(len(failed), len(report)))
+
+
+def report_profile():
+    profiler.stop()
+    click.echo("Startup profile:", err=True)
+    for line in profiler.report():
+        click.echo(line, err=True)
+
+
+@click.group()
+@click.option('--debug/--no-debug', default=False, envvar='DEBUG')
+@click.option('--profile-startup', is_flag=True, help='Report how long imports and service models take to load')
+@click.option('--trace', type=click.Path(dir_okay=False, writable=True), help='Write a Chrome trace of every action and API call to this file')
+@click.option('--credential-cache/--no-credential-cache', 'use_credential_cache', default=True, help='Reuse credentials for assumed roles between runs')
+@click.pass_context
+def main(ctx, debug, profile_startup, trace, use_credential_cache):
+    if profile_startup:
+        profiler.start()
+        ctx.call_on_close(report_profile)
+
+    if trace:
+        tracer.start(trace)
+        ctx.call_on_close(tracer.stop)
+
+    if use_credential_cache:
+        credential_cache.open(os.path.expanduser(CREDENTIALS_FILE))
+
+    # The Touchdownfile is run by the command, as it may need to be run once
+    # for each of several targets
+    ctx.obj = None
 
 
 @main.command()
+@click.option('--parallel', default=1, type=click.IntRange(min=1), help='Number of resources to change at the same time')
+@state_options
+@batch_options
 @click.pass_context
-def apply(ctx):
-    r = Runner("apply", ctx.obj, ConsoleInterface())
+def apply(ctx, parallel, state_cache, state_ttl, targets, target_workers, max_parallel, report):
+    if targets:
+        batch = get_batch("apply", targets, parallel, target_workers, max_parallel, state_cache, History(HISTORY_FILE))
+        try:
+            report_batch(batch.apply(), report)
+        except errors.Error as e:
+            raise click.ClickException(str(e))
+        return
+
+    state = get_state(state_cache, state_ttl)
+    r = Runner("apply", get_workspace(ctx), ConsoleInterface(), parallel=parallel, state=state, history=History(HISTORY_FILE))
     try:
         r.apply()
     except errors.Error as e:
@@ -71,9 +216,12 @@ def apply(ctx):
 
 
 @main.command()
+@click.option('--parallel', default=1, type=click.IntRange(min=1), help='Number of resources to change at the same time')
+@state_options
 @click.pass_context
-def destroy(ctx):
-    r = Runner("destroy", ctx.obj, ConsoleInterface())
+def destroy(ctx, parallel, state_cache, state_ttl):
+    state = get_state(state_cache, state_ttl)
+    r = Runner("destroy", get_workspace(ctx), ConsoleInterface(), parallel=parallel, state=state, history=History(HISTORY_FILE))
     try:
         r.apply()
     except errors.Error as e:
@@ -81,16 +229,57 @@ def destroy(ctx):
 
 
 @main.command()
+@click.option('--parallel', default=1, type=click.IntRange(min=1), help='Number of resources to examine at the same time')
+@click.option('--probable', is_flag=True, help='Use cached state wherever possible, however old')
+@state_options
+@batch_options
 @click.pass_context
-def plan(ctx):
-    r = Runner("apply", ctx.obj, ConsoleInterface())
+def plan(ctx, parallel, probable, state_cache, state_ttl, targets, target_workers, max_parallel, report):
+    if targets:
+        batch = get_batch("apply", targets, parallel, target_workers, max_parallel, state_cache or probable)
+        batch.ui.render_plan(batch.plan())
+        report_batch(batch.report(), report)
+        return
+
+    state = get_state(state_cache, state_ttl, probable)
+    r = Runner("apply", get_workspace(ctx), ConsoleInterface(), parallel=parallel, state=state)
+    if probable:
+        click.echo("This plan is based on cached state and may not be accurate")
+        click.echo()
     r.ui.render_plan(r.plan())
 
 
+@main.command("critical-path")
+@click.option('--parallel', default=1, type=click.IntRange(min=1), help='Number of resources that will be changed at the same time')
+@state_options
+@click.pass_context
+def critical_path(ctx, parallel, state_cache, state_ttl):
+    state = get_state(state_cache, state_ttl)
+    r = Runner("apply", get_workspace(ctx), ConsoleInterface(), parallel=parallel, state=state, history=History(HISTORY_FILE))
+    list(r.plan())
+    schedule = r.goal.get_schedule()
+
+    click.echo("Critical path:")
+    path = schedule.critical_path()
+    for resource, duration in path:
+        if duration:
+            click.echo("  {}  {}".format(format_duration(duration), resource))
+    click.echo()
+
+    click.echo("Expected time to apply:")
+    for workers in sorted(set((1, 2, 4, 8, 16, parallel))):
+        click.echo("  {:>2} workers: {}{}".format(
+            workers,
+            format_duration(schedule.simulate(workers)),
+            " (--parallel {})".format(parallel) if workers == parallel else "",
+        ))
+    click.echo("  Lower bound: {}".format(format_duration(sum(d for (r, d) in path))))
+
+
 @main.command()
 @click.pass_context
 def dot(ctx):
-    r = Runner("apply", ctx.obj, ConsoleInterface())
+    r = Runner("apply", get_workspace(ctx), ConsoleInterface())
     click.echo(r.dot())
 
 
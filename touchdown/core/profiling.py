@@ -0,0 +1,95 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import sys
+import threading
+import time
+
+from six.moves import builtins
+
+
+class Profiler(object):
+
+    """ Records how long modules take to import and service models take to
+    load.
+
+    Imports are timed by wrapping ``__import__``, so only modules imported
+    after ``start`` is called are seen. Each entry records how deeply it was
+    nested inside other timed entries so that the report reads as a tree.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.enabled = False
+        self.depth = 0
+        self.lock = threading.RLock()
+        self._import = None
+
+    def start(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop(self):
+        if not self.enabled:
+            return
+        builtins.__import__ = self._import
+        self.enabled = False
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module = name
+        if level > 0 and globals:
+            module = ".".join(filter(None, (globals.get("__package__"), name)))
+        # ``from package import module`` imports the submodules in fromlist
+        # without calling ``__import__`` again, so they are timed here.
+        names = [module] + [".".join((module, f)) for f in fromlist or () if f != "*"]
+        if all(n in sys.modules for n in names):
+            return self._import(name, globals, locals, fromlist, level)
+        with self.timed("import", module):
+            return self._import(name, globals, locals, fromlist, level)
+
+    @contextlib.contextmanager
+    def timed(self, category, name):
+        if not self.enabled:
+            yield
+            return
+
+        with self.lock:
+            entry = [category, name, self.depth, 0]
+            self.entries.append(entry)
+            self.depth += 1
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            with self.lock:
+                entry[3] = time.time() - start
+                self.depth -= 1
+
+    def report(self, threshold=0.001):
+        """ Yields a line for every entry that took longer than
+        ``threshold`` seconds """
+        with self.lock:
+            entries = list(self.entries)
+        for category, name, depth, elapsed in entries:
+            if elapsed < threshold:
+                continue
+            yield "{:>8.1f}ms  {}{} {}".format(elapsed * 1000, "  " * depth, category, name)
+
+
+profiler = Profiler()
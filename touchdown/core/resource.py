@@ -14,33 +14,72 @@
 
 import logging
 import six
+import threading
 
 from . import argument, errors
 
 logger = logging.getLogger(__name__)
 
 
+# Stored in place of a value for fields that haven't been set
+NOT_SET = object()
+
+
 class Field(object):
 
-    def __init__(self, name, argument):
+    def __init__(self, name, arg, index=None):
         self.name = name
-        self.argument = argument
+        self.argument = arg
+        self.index = index
         self.__doc__ = self.argument.__doc__
 
+        # Look these up once rather than every time a resource is rendered
+        self.has_field = hasattr(arg, "field")
+        self.aws_field = getattr(arg, "field", None)
+        self.aws_create = getattr(arg, "aws_create", True)
+        self.aws_update = getattr(arg, "aws_update", True)
+        self.update = getattr(arg, "update", True)
+        self.clean_name = "clean_{}".format(name)
+
+        # Only defaults that are worked out from the instance are worth
+        # remembering.
+        self.dynamic_default = callable(arg.default) or \
+            type(arg).get_default is not argument.Argument.get_default
+
     def present(self, instance):
-        return self.name in instance._values
+        return instance._values[self.index] is not NOT_SET
+
+    def get_raw_value(self, instance):
+        """ Returns the value that was set, without applying any default """
+        retval = instance._values[self.index]
+        if retval is NOT_SET:
+            return None
+        return retval
 
     def get_value(self, instance):
-        retval = instance._values.get(self.name, None)
-        if not retval:
-            return self.argument.get_default(instance)
+        retval = instance._values[self.index]
+        if retval is NOT_SET or not retval:
+            return self.get_default(instance)
         return retval
 
+    def get_default(self, instance):
+        """ Returns the default for this field. Computed defaults are kept
+        until a field is set on the instance, as they may depend on it. """
+        if not self.dynamic_default:
+            return self.argument.default
+        defaults = instance._defaults
+        if defaults is None:
+            defaults = instance._defaults = {}
+        if self.index not in defaults:
+            defaults.setdefault(self.index, self.argument.get_default(instance))
+        return defaults[self.index]
+
     def __set__(self, instance, value):
         value = self.argument.clean(instance, value)
-        if hasattr(instance, "clean_{}".format(self.name)):
-            value = getattr(instance, "clean_{}".format(self.name))(value)
-        instance._values[self.name] = value
+        if hasattr(instance, self.clean_name):
+            value = getattr(instance, self.clean_name)(value)
+        instance._values[self.index] = value
+        instance._defaults = None
 
     def __get__(self, instance, owner):
         if instance is None:
@@ -54,16 +93,20 @@ class Meta(object):
         self.plans = {}
         self.fields = {}
         self.field_order = []
+        self.field_items = ()
+        self.argument_items = ()
 
     def iter_fields_in_order(self):
-        for name in self.field_order:
-            yield self.fields[name]
+        for name, field in self.field_items:
+            yield field
 
 
 class ResourceType(type):
 
     __all_resources__ = {}
     __lazy_lookups__ = {}
+    __lazy_factories__ = {}
+    __lazy_lock__ = threading.RLock()
 
     def __new__(meta_cls, class_name, bases, new_attrs):
         meta = new_attrs['meta'] = Meta()
@@ -86,10 +129,9 @@ class ResourceType(type):
         # Replace all Argument instances with Field instances. The Field type
         # handles the "clean" stage of input processing and the storage of
         # data passed in.
-        for name, value in new_attrs.items():
+        for name, value in list(new_attrs.items()):
             if isinstance(value, argument.Argument):
-                field = new_attrs[name] = Field(name, value)
-                meta.fields[name] = field
+                meta.fields[name] = Field(name, value)
                 meta.field_order.append(name)
                 value.name = name
 
@@ -100,6 +142,18 @@ class ResourceType(type):
                 field_order.append(field)
         meta.field_order = field_order
 
+        # Values are stored in a list rather than a dict, so every class needs
+        # its own Field instances that know where in the list to look.
+        for index, name in enumerate(meta.field_order):
+            field = Field(name, meta.fields[name].argument, index)
+            meta.fields[name] = new_attrs[name] = field
+
+        meta.field_items = tuple((name, meta.fields[name]) for name in meta.field_order)
+        meta.argument_items = tuple((name, field.argument) for (name, field) in meta.field_items)
+
+        # Resources are created in large numbers so they don't get a __dict__.
+        new_attrs.setdefault('__slots__', ())
+
         # Actuall build a class
         cls = type.__new__(meta_cls, class_name, bases, new_attrs)
 
@@ -120,16 +174,39 @@ class ResourceType(type):
     def add_callback(cls, name, callback, *args, **kwargs):
         cls.__lazy_lookups__.setdefault(name, []).append((callback, args, kwargs))
 
+    @classmethod
+    def add_lazy_factory(cls, resource_name, module):
+        """ Record that importing ``module`` provides ``add_<resource_name>``
+        factory methods. The module isn't imported until one is used. """
+        cls.__lazy_factories__.setdefault(resource_name, []).append(module)
+
+    @classmethod
+    def load_factory(cls, resource_name):
+        """ Imports the modules that provide ``add_<resource_name>``. They
+        are only forgotten once imported, so a failed import is retried (and
+        its error raised again) next time. """
+        with cls.__lazy_lock__:
+            for module in cls.__lazy_factories__.get(resource_name, []):
+                __import__(module)
+            cls.__lazy_factories__.pop(resource_name, None)
+
 
 class Resource(six.with_metaclass(ResourceType)):
 
+    __slots__ = ("_values", "_defaults", "parent", "dependencies")
+
     dot_ignore = False
     default_plan = None
 
+    # Fields that say where this resource and its children live (such as an
+    # account's region). They are part of the key used by the state cache.
+    state_scope = ()
+
     policies = argument.List(argument.String())
 
     def __init__(self, parent, **kwargs):
-        self._values = {}
+        self._values = [NOT_SET] * len(self.meta.field_order)
+        self._defaults = None
         self.parent = parent
         self.dependencies = set()
         for key in kwargs.keys():
@@ -141,11 +218,11 @@ class Resource(six.with_metaclass(ResourceType)):
 
     @property
     def fields(self):
-        return list((field.name, field) for field in self.meta.iter_fields_in_order())
+        return self.meta.field_items
 
     @property
     def arguments(self):
-        return list((name, field.argument) for (name, field) in self.fields)
+        return self.meta.argument_items
 
     @property
     def workspace(self):
@@ -156,6 +233,16 @@ class Resource(six.with_metaclass(ResourceType)):
         if self.workspace != dependency:
             self.dependencies.add(dependency)
 
+    def __getattr__(self, name):
+        # Factories like ``add_vpc`` only exist once the module that defines
+        # the resource has been imported, so import it on first use.
+        if name.startswith("add_"):
+            ResourceType.load_factory(name[4:])
+            # Another thread may have done the import while we waited
+            if hasattr(self.__class__, name):
+                return getattr(self, name)
+        raise AttributeError("'{}' object has no attribute '{}'".format(self.__class__.__name__, name))
+
     def __str__(self):
         if hasattr(self, "name"):
             return "{} '{}'".format(self.resource_name, self.name)
@@ -22,9 +22,16 @@ logger = logging.getLogger(__name__)
 
 class Runner(object):
 
-    def __init__(self, goal, workspace, ui):
+    def __init__(self, goal, workspace, ui, parallel=1, state=None, history=None, shared=None, limiter=None):
         try:
-            self.goal = goals.Goal.goals[goal](workspace)
+            self.goal = goals.Goal.goals[goal](
+                workspace,
+                parallel=parallel,
+                state=state,
+                history=history,
+                shared=shared,
+                limiter=limiter,
+            )
         except KeyError:
             raise errors.Error("No such goal '{}'".format(goal))
 
@@ -48,6 +55,9 @@ class Runner(object):
     def plan(self):
         self.goal.plan(self.ui)
 
+        if self.goal.state:
+            self.goal.state.save()
+
         for resource in self.goal.get_execution_order().all():
             changes = self.goal.get_changes(resource)
             if changes:
@@ -62,4 +72,10 @@ class Runner(object):
         if not self.ui.confirm_plan(plan):
             return
 
-        self.goal.apply(self.ui)
+        try:
+            self.goal.apply(self.ui)
+        finally:
+            if self.goal.state:
+                self.goal.state.save()
+            if self.goal.history:
+                self.goal.history.save()
@@ -12,8 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import itertools
 import json
+import threading
 
 from touchdown.core.utils import force_str
 
@@ -32,6 +34,59 @@ class RequiredFieldNotPresent(Exception):
     pass
 
 
+class RenderCache(object):
+
+    """ Remembers what serializers rendered to during a run.
+
+    A render can look at the ``object`` of any plan (to find the id of a
+    resource, for example) so the resources whose plans are fetched while
+    rendering are recorded. When one of their objects changes everything is
+    forgotten.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.observed = set()
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def render(self, serializer, runner, object):
+        try:
+            key = (serializer.cache_key(), object)
+            hash(key)
+        except TypeError:
+            return serializer.render_uncached(runner, object)
+
+        with self.lock:
+            if key in self.results:
+                return copy.copy(self.results[key])
+            generation = self.generation
+
+        self.local.depth = getattr(self.local, "depth", 0) + 1
+        try:
+            result = serializer.render_uncached(runner, object)
+        finally:
+            self.local.depth -= 1
+
+        with self.lock:
+            if generation == self.generation:
+                self.results[key] = result
+        return copy.copy(result)
+
+    def observe(self, resource):
+        if getattr(self.local, "depth", 0):
+            with self.lock:
+                self.observed.add(resource)
+
+    def invalidate(self, resource):
+        with self.lock:
+            if resource in self.observed:
+                self.results = {}
+                self.observed = set()
+                self.generation += 1
+
+
 class Serializer(object):
 
     def render(self, runner, object):
@@ -41,6 +96,25 @@ class Serializer(object):
         return frozenset()
 
 
+class Memoized(object):
+
+    """ Mixin for serializers that are expensive to render. If the runner has
+    a ``RenderCache`` the result is reused until the state it was rendered
+    from changes. """
+
+    def cache_key(self):
+        return self
+
+    def render(self, runner, object):
+        cache = getattr(runner, "render_cache", None)
+        if isinstance(cache, RenderCache):
+            return cache.render(self, runner, object)
+        return self.render_uncached(runner, object)
+
+    def render_uncached(self, runner, object):
+        raise NotImplementedError(self.render_uncached)
+
+
 class Identity(Serializer):
 
     def render(self, runner, object):
@@ -94,12 +168,12 @@ class Const(Serializer):
         return frozenset()
 
 
-class Identifier(Serializer):
+class Identifier(Memoized, Serializer):
 
     def __init__(self, inner=Identity()):
         self.inner = inner
 
-    def render(self, runner, object):
+    def render_uncached(self, runner, object):
         resource = self.inner.render(runner, object)
         if not resource:
             raise FieldNotPresent()
@@ -112,13 +186,13 @@ class Identifier(Serializer):
         return self.inner.dependencies(object)
 
 
-class Property(Serializer):
+class Property(Memoized, Serializer):
 
     def __init__(self, property, inner=Identity()):
         self.property = property
         self.inner = inner
 
-    def render(self, runner, object):
+    def render_uncached(self, runner, object):
         return runner.get_plan(self.inner.render(runner, object)).object.get(self.property, "dummy")
 
     def dependencies(self, object):
@@ -263,43 +337,86 @@ class Dict(Serializer):
         return frozenset(itertools.chain(*tuple(c.dependencies(object) for c in self.kwargs.values())))
 
 
-class Resource(Dict):
+class Resource(Memoized, Dict):
 
     """ Automatically generate a Dict definition by inspect the 'field'
     paramters of a resource """
 
+    # Which fields to render only depends on the class of the resource, the
+    # mode and the keys passed to the constructor. Work it out once and share
+    # it between every instance.
+    _compiled = {}
+
     def __init__(self, mode="create", **kwargs):
         self.mode = mode
         super(Resource, self).__init__(**kwargs)
 
-    def render(self, runner, object):
+    def compile(self, cls):
+        """ Returns a tuple of (key, field, serializer) for every field of
+        ``cls`` that should be rendered and a tuple of (key, serializer) for
+        everything else. Later fields take precedence, so they are first. """
+        key = (cls, self.mode, frozenset(self.kwargs))
+        compiled = self._compiled.get(key, None)
+        if compiled is not None:
+            return compiled
+
+        fields = []
+        for field in cls.meta.iter_fields_in_order():
+            if not field.has_field:
+                continue
+            if field.aws_field in self.kwargs:
+                continue
+            if self.mode == "create" and not field.aws_create:
+                continue
+            if self.mode == "update" and not field.aws_update:
+                continue
+            fields.insert(0, (field.aws_field, field, field.argument.serializer))
+
+        extra = tuple(getattr(cls, "extra_serializers", {}).items())
+
+        compiled = self._compiled[key] = (tuple(fields), extra)
+        return compiled
+
+    def cache_key(self):
+        # Serializers like ``Resource()`` are often built on the fly, so
+        # without any explicit keys they are all equivalent.
+        if not self.kwargs:
+            return (self.__class__, self.mode)
+        return self
+
+    def render_uncached(self, runner, object):
         if hasattr(object, "get_serializer"):
             return object.get_serializer(runner).render(runner, object)
 
-        kwargs = dict(self.kwargs)
+        fields, extra = self.compile(object.__class__)
 
-        for name, serializer in getattr(object, "extra_serializers", {}).items():
-            kwargs[name] = serializer
+        result = {}
+        seen = set()
 
-        for argument_name, field in object.fields:
-            arg = field.argument
-            if field.get_value(object) is None:
+        for key, field, serializer in fields:
+            if key in seen:
                 continue
-            if not hasattr(arg, "field"):
+            value = field.get_value(object)
+            if value is None:
                 continue
-            if arg.field in self.kwargs:
+            seen.add(key)
+            try:
+                result[key] = serializer.render(runner, value)
+            except FieldNotPresent:
                 continue
-            if self.mode == "create" and not getattr(arg, "aws_create", True):
+
+        for key, serializer in itertools.chain(extra, self.kwargs.items()):
+            if key in seen:
                 continue
-            if self.mode == "update" and not getattr(arg, "aws_update", True):
+            seen.add(key)
+            try:
+                result[key] = serializer.render(runner, object)
+            except FieldNotPresent:
                 continue
 
-            kwargs[arg.field] = Context(
-                Argument(argument_name),
-                arg.serializer
-            )
-
-        return self._render(kwargs, runner, object)
+        if not len(result):
+            raise FieldNotPresent()
+        return result
 
     def dependencies(self, object):
         raise NotImplementedError(self.dependencies, object)
@@ -0,0 +1,153 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import six
+
+from . import resource
+from .utils import force_bytes
+
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(value):
+    # Resources that are referenced by a field are identified by name only.
+    # Encoding them in full would recurse forever (a security group lists its
+    # rules and each rule has the security group as its parent).
+    if isinstance(value, resource.Resource):
+        return str(value)
+    elif isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    elif isinstance(value, dict):
+        return dict((str(k), _encode(v)) for (k, v) in value.items())
+    elif isinstance(value, (bool, float, six.integer_types, type(None))):
+        return value
+    return str(value)
+
+
+def get_fingerprint(resource):
+    """ Returns a hash of the values that were set on a resource """
+    values = {}
+    for name, field in resource.fields:
+        if field.present(resource):
+            values[name] = _encode(field.get_raw_value(resource))
+
+    cls = resource.__class__
+    return hashlib.sha1(force_bytes(json.dumps({
+        "class": ".".join((cls.__module__, cls.__name__)),
+        "values": values,
+    }, sort_keys=True))).hexdigest()
+
+
+def get_scope(resource):
+    """ Returns a hash of the fields that say where a resource lives, so that
+    resources with the same name in different accounts or regions don't
+    share a key """
+    values = [_encode(getattr(resource, name, None)) for name in resource.state_scope]
+    return hashlib.sha1(force_bytes(json.dumps(values))).hexdigest()
+
+
+def get_key(resource):
+    """ Returns a key for a resource that is stable between runs """
+    parts = []
+    while resource and resource.parent:
+        part = str(resource)
+        if not hasattr(resource, "name"):
+            part = "{}#{}".format(part, get_fingerprint(resource)[:8])
+        if resource.state_scope:
+            part = "{}@{}".format(part, get_scope(resource)[:8])
+        parts.insert(0, part)
+        resource = resource.parent
+    return "/".join(parts)
+
+
+class StateCache(object):
+
+    """ A persistent cache of the last known remote state of each resource.
+
+    Entries are stored as JSON lines. An entry is only returned if it is
+    younger than ``ttl`` seconds and the resource hasn't been changed in the
+    Touchdownfile since the entry was recorded. If ``probable`` is set then
+    every entry is returned regardless - this gives a quick idea of what a
+    plan will look like without talking to any APIs.
+    """
+
+    def __init__(self, path, ttl=300, probable=False):
+        self.path = path
+        self.ttl = ttl
+        self.probable = probable
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as fp:
+            for line in fp:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.debug("Ignoring malformed state cache entry")
+                    continue
+                self.entries[entry["key"]] = entry
+
+    def save(self):
+        with self.lock:
+            lines = [json.dumps(entry, sort_keys=True, default=str) for entry in self.entries.values()]
+
+        tmp = self.path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as fp:
+            for line in lines:
+                fp.write(line + "\n")
+        os.rename(tmp, self.path)
+
+    def get(self, resource):
+        """ Returns the cached state of ``resource`` or ``None`` """
+        with self.lock:
+            entry = self.entries.get(get_key(resource), None)
+
+        if not entry:
+            return None
+
+        if not self.probable:
+            if entry["fingerprint"] != get_fingerprint(resource):
+                return None
+            if time.time() - entry["time"] > self.ttl:
+                return None
+
+        return entry["object"]
+
+    def set(self, resource, object):
+        entry = {
+            "key": get_key(resource),
+            "fingerprint": get_fingerprint(resource),
+            "time": time.time(),
+            "object": object or {},
+        }
+        with self.lock:
+            self.entries[entry["key"]] = entry
+
+    def invalidate(self, resource):
+        with self.lock:
+            self.entries.pop(get_key(resource), None)
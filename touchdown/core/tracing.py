@@ -0,0 +1,227 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+# Error codes that AWS services use to say a request was rate limited
+THROTTLE_CODES = frozenset((
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestLimitExceeded",
+    "RequestThrottled",
+    "TooManyRequestsException",
+    "PriorRequestNotComplete",
+))
+
+# Counters that are rolled up from API calls into the spans around them
+COUNTERS = ("api_calls", "retries", "throttles", "bytes_sent", "bytes_received")
+
+
+def _length(body):
+    # Streamed bodies (like S3 uploads) can't be measured without reading them
+    if not body or hasattr(body, "read"):
+        return 0
+    return len(body)
+
+
+class Span(object):
+
+    def __init__(self, category, name, args):
+        self.category = category
+        self.name = name
+        self.args = args
+        self.start = time.time()
+
+
+class Tracer(object):
+
+    """ Writes a timeline of everything that happens during a run to a file.
+
+    Planning and applying each resource, every action, waiter and describe,
+    and every botocore API call are recorded as complete ("X") events in the
+    Chrome trace event format, so the file can be loaded into
+    ``chrome://tracing`` to see a flame chart of the run. Files ending in
+    ``.jsonl`` get one bare event per line instead.
+
+    API calls count their retries, throttles and bytes transferred, and those
+    counters are added to every span that was open when the call was made.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.output = None
+        self.json_lines = False
+        self.count = 0
+        self.epoch = 0
+
+    def start(self, path):
+        if self.enabled:
+            return
+        self.output = open(path, "w")
+        self.json_lines = path.endswith(".jsonl")
+        if not self.json_lines:
+            self.output.write("[\n")
+        self.count = 0
+        self.epoch = time.time()
+        self.enabled = True
+
+    def stop(self):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.enabled = False
+            if not self.json_lines:
+                self.output.write("\n]\n")
+            self.output.close()
+            self.output = None
+
+    def instrument(self, session):
+        """ Hooks the tracer into every client created by a botocore
+        session """
+        session.register("before-call", self.before_call)
+        session.register("needs-retry", self.needs_retry)
+        session.register("after-call", self.after_call)
+
+    @property
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def push(self, category, name, resource=None, **args):
+        stack = self.stack
+        if resource is None and stack:
+            resource = stack[-1].args.get("resource")
+        if resource is not None:
+            args["resource"] = str(resource)
+        span = Span(category, name, args)
+        stack.append(span)
+        return span
+
+    def pop(self, span):
+        stack = self.stack
+        while stack:
+            if stack.pop() is span:
+                break
+        self.write(span)
+
+    @contextlib.contextmanager
+    def span(self, category, name, resource=None, detached=False, **args):
+        """ Records how long the block takes. A ``detached`` span isn't put
+        on this thread's stack, for work (like a coroutine) that may be
+        interleaved with other work on the same thread or move between
+        threads. API calls aren't added to detached spans. """
+        if not self.enabled:
+            yield
+            return
+
+        if detached:
+            if resource is not None:
+                args["resource"] = str(resource)
+            span = Span(category, name, args)
+        else:
+            span = self.push(category, name, resource, **args)
+        try:
+            yield
+        except Exception as e:
+            span.args["error"] = str(e)
+            raise
+        finally:
+            if detached:
+                self.write(span)
+            else:
+                self.pop(span)
+
+    def write(self, span):
+        now = time.time()
+        event = {
+            "name": span.name,
+            "cat": span.category,
+            "ph": "X",
+            "ts": int((span.start - self.epoch) * 1000000),
+            "dur": int((now - span.start) * 1000000),
+            "pid": os.getpid(),
+            "tid": threading.current_thread().ident,
+            "args": span.args,
+        }
+        line = json.dumps(event, sort_keys=True, default=str)
+        with self.lock:
+            if not self.enabled:
+                return
+            if self.count and not self.json_lines:
+                self.output.write(",\n")
+            self.output.write(line)
+            if self.json_lines:
+                self.output.write("\n")
+            self.count += 1
+
+    def before_call(self, model, params, **kwargs):
+        if not self.enabled:
+            return
+        stack = self.stack
+        # A call that raised inside botocore never reaches ``after-call``
+        if stack and stack[-1].category == "api":
+            self.pop(stack[-1])
+        self.push(
+            "api",
+            "{}.{}".format(model.metadata["endpointPrefix"], model.name),
+            attempts=0,
+            retries=0,
+            throttles=0,
+            bytes_sent=0,
+            bytes_received=0,
+        )
+
+    def needs_retry(self, response, attempts, caught_exception=None, **kwargs):
+        if not self.enabled:
+            return
+        stack = self.stack
+        if not stack or stack[-1].category != "api":
+            return
+        args = stack[-1].args
+        args["attempts"] = attempts
+        args["retries"] = attempts - 1
+        if response:
+            http_response, parsed = response
+            args["bytes_sent"] += _length(getattr(http_response.request, "body", None))
+            args["bytes_received"] += len(http_response.content or b"")
+            if parsed.get("Error", {}).get("Code") in THROTTLE_CODES:
+                args["throttles"] += 1
+        elif caught_exception is not None:
+            args["error"] = str(caught_exception)
+
+    def after_call(self, http_response, parsed, model, **kwargs):
+        if not self.enabled:
+            return
+        stack = self.stack
+        if not stack or stack[-1].category != "api":
+            return
+        span = stack[-1]
+        span.args["status"] = http_response.status_code
+        span.args["api_calls"] = 1
+        for parent in stack[:-1]:
+            for counter in COUNTERS:
+                parent.args[counter] = parent.args.get(counter, 0) + span.args.get(counter, 0)
+        self.pop(span)
+
+
+tracer = Tracer()
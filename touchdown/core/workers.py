@@ -0,0 +1,176 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import logging
+import sys
+import threading
+
+import six
+from six.moves import queue
+
+from . import dependencies
+
+
+logger = logging.getLogger(__name__)
+
+
+class Executor(object):
+
+    """ Visits the nodes of a ``DependencyMap`` using a pool of threads.
+
+    Every node that the map reports as ready is dispatched to a worker. As
+    each node finishes it is marked as complete, which may make more nodes
+    ready. If a node fails then nothing that depends on it is scheduled, but
+    unrelated nodes are allowed to finish. The first failure is re-raised once
+    the pool has drained.
+
+    If ``key`` is set then it is called for each node and the result is looked
+    up in ``limits``. No more than that many nodes with the same key will be
+    running at once - a ready node is held back until a slot frees up rather
+    than tying up a worker.
+    """
+
+    def __init__(self, dependency_map, workers=1, limits=None, key=None):
+        self.dependency_map = dependency_map
+        self.workers = max(1, workers)
+        self.limits = limits or {}
+        self.key = key
+
+    def _worker(self, jobs, results, callback):
+        while True:
+            node = jobs.get()
+            if node is None:
+                return
+            try:
+                callback(node)
+            except Exception:
+                results.put((node, sys.exc_info()))
+            else:
+                results.put((node, None))
+
+    def run(self, callback):
+        """ Calls ``callback`` for every node and yields each node as it
+        completes successfully """
+        jobs = queue.Queue()
+        results = queue.Queue()
+
+        threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, args=(jobs, results, callback))
+            t.daemon = True
+            t.start()
+            threads.append(t)
+
+        ready = dependencies.ReadyQueue(self.dependency_map, self.limits, self.key)
+        pending = 0
+        failures = []
+
+        try:
+            while True:
+                node = ready.pop()
+                while node is not None:
+                    jobs.put(node)
+                    pending += 1
+                    node = ready.pop()
+
+                if not pending:
+                    break
+
+                node, exc_info = results.get()
+                pending -= 1
+                ready.finish(node, completed=not exc_info)
+
+                if exc_info:
+                    logger.debug("Failed to process {}, not scheduling its dependents".format(node))
+                    failures.append(exc_info)
+                    continue
+
+                yield node
+        finally:
+            for t in threads:
+                jobs.put(None)
+
+        if failures:
+            six.reraise(*failures[0])
+
+
+class Limiter(object):
+
+    """ Limits how much work can happen at once across several ``Executor``
+    instances, such as the goals of a batch of workspaces.
+
+    No more than ``total`` nodes are processed at once. Keys are tuples whose
+    first item is looked up in ``limits``, and no more than that many nodes
+    with the same key are processed at once.
+    """
+
+    def __init__(self, total=None, limits=None):
+        self.total = threading.BoundedSemaphore(total) if total else None
+        self.limits = limits or {}
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def get_semaphore(self, key):
+        if key[0] not in self.limits:
+            return None
+        with self.lock:
+            if key not in self.semaphores:
+                self.semaphores[key] = threading.BoundedSemaphore(self.limits[key[0]])
+            return self.semaphores[key]
+
+    @contextlib.contextmanager
+    def limit(self, key):
+        semaphores = [s for s in (self.get_semaphore(key), self.total) if s]
+        for semaphore in semaphores:
+            semaphore.acquire()
+        try:
+            yield
+        finally:
+            for semaphore in reversed(semaphores):
+                semaphore.release()
+
+
+def run_all(callables, workers=1):
+    """ Calls every callable using up to ``workers`` threads and waits for
+    them all to finish. The first failure is re-raised once they have. """
+    jobs = queue.Queue()
+    for callable in callables:
+        jobs.put(callable)
+
+    failures = []
+
+    def worker():
+        while True:
+            try:
+                callable = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                callable()
+            except Exception:
+                failures.append(sys.exc_info())
+
+    threads = []
+    for i in range(min(workers, jobs.qsize())):
+        t = threading.Thread(target=worker)
+        t.daemon = True
+        t.start()
+        threads.append(t)
+
+    for t in threads:
+        t.join()
+
+    if failures:
+        six.reraise(*failures[0])
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from . import dependencies
 from .resource import Resource
 
 
@@ -19,6 +20,25 @@ class Workspace(Resource):
 
     resource_name = "workspace"
 
+    # Checks that need to see every resource of a type at once (for example,
+    # that no two subnets in a VPC overlap), keyed by resource_name.
+    validators = {}
+
+    @classmethod
+    def add_validator(cls, resource_name, validator):
+        cls.validators.setdefault(resource_name, []).append(validator)
+
+    def validate(self):
+        """ Calls every validator with all the resources of its type. Raises
+        ``InvalidParameter`` if the workspace is invalid. """
+        resources = {}
+        for resource in dependencies.DependencyMap(self).map:
+            resources.setdefault(resource.resource_name, []).append(resource)
+
+        for resource_name, validators in self.validators.items():
+            for validator in validators:
+                validator(resources.get(resource_name, []))
+
     def __init__(self):
         super(Workspace, self).__init__(None)
 
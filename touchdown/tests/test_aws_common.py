@@ -12,12 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
+import time
 import unittest
 import mock
 
-from touchdown.core import serializers
+from touchdown.core import errors, serializers
 
-from touchdown.aws.common import GenericAction
+from touchdown.aws.common import DescribeCache, GenericAction, Poller, Wait, Waiter
 from touchdown.aws.elasticache import CacheCluster
 
 
@@ -36,3 +38,142 @@ class TestGenericAction(unittest.TestCase):
         api.assert_called_with(
             CacheClusterId='freddy',
         )
+
+
+class TestDescribeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.can_paginate.return_value = False
+        self.client.describe_subnets.return_value = {
+            "Subnets": [
+                {"SubnetId": "subnet-1", "VpcId": "vpc-1", "Tags": [{"Key": "Name", "Value": "a"}]},
+                {"SubnetId": "subnet-2", "VpcId": "vpc-1", "Tags": [{"Key": "Name", "Value": "b"}]},
+                {"SubnetId": "subnet-3", "VpcId": "vpc-2", "Tags": [{"Key": "Name", "Value": "a"}]},
+            ]
+        }
+        self.cache = DescribeCache(self.client)
+
+    def describe(self, *filters):
+        return self.cache.describe("describe_subnets", "Subnets", {
+            "Filters": [{"Name": k, "Values": [v]} for (k, v) in filters],
+        })
+
+    def test_filter(self):
+        result = self.describe(("tag:Name", "a"), ("vpc-id", "vpc-2"))
+        self.assertEqual([o["SubnetId"] for o in result], ["subnet-3"])
+
+    def test_no_match(self):
+        self.assertEqual(self.describe(("subnet-id", "subnet-4")), [])
+
+    def test_single_api_call(self):
+        self.describe(("subnet-id", "subnet-1"))
+        self.describe(("subnet-id", "subnet-2"))
+        self.assertEqual(self.client.describe_subnets.call_count, 1)
+        self.client.describe_subnets.assert_called_with()
+
+    def test_unsupported_filter(self):
+        self.assertEqual(self.describe(("state", "available")), None)
+        self.assertEqual(self.describe(("tag:Name", "a*")), None)
+        self.assertEqual(self.cache.describe("describe_subnets", "Subnets", {"SubnetIds": ["subnet-1"]}), None)
+        self.assertEqual(self.client.describe_subnets.call_count, 0)
+
+
+class TestPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.poller = Poller()
+
+    def test_wait(self):
+        check = mock.Mock(side_effect=[False, False, "done"])
+        result = self.poller.wait(check, "test", initial_delay=0.01)
+        self.assertEqual(result, "done")
+        self.assertEqual(check.call_count, 3)
+
+    def test_many_waits(self):
+        checks = [mock.Mock(side_effect=[False, i]) for i in range(1, 11)]
+        waits = [self.poller.submit(c, "test", initial_delay=0.01) for c in checks]
+        self.assertEqual([w.wait() for w in waits], list(range(1, 11)))
+
+    def test_timeout(self):
+        check = mock.Mock(return_value=False)
+        self.assertRaises(errors.Timeout, self.poller.wait, check, "test", timeout=0.05, initial_delay=0.01)
+
+    def test_exception(self):
+        check = mock.Mock(side_effect=errors.Error("broken"))
+        self.assertRaises(errors.Error, self.poller.wait, check, "test")
+
+    def test_backoff(self):
+        wait = self.poller.submit(mock.Mock(return_value=True), "test", initial_delay=1, max_delay=4)
+        delays = [wait.next_delay() for i in range(4)]
+        self.assertTrue(0.5 <= delays[0] <= 1)
+        self.assertTrue(1 <= delays[1] <= 2)
+        self.assertTrue(2 <= delays[3] <= 4)
+
+    def test_cancel(self):
+        check = mock.Mock(return_value=False)
+        wait = self.poller.submit(check, "test", initial_delay=0.01)
+        wait.cancel()
+        self.assertRaises(errors.Error, wait.wait)
+
+    def test_failing_callback(self):
+        wait = self.poller.submit(mock.Mock(side_effect=[False, "done"]), "test", initial_delay=0.01)
+        wait.add_done_callback(mock.Mock(side_effect=RuntimeError("loop closed")))
+        self.assertEqual(wait.wait(), "done")
+        self.assertEqual(self.poller.wait(mock.Mock(return_value="again"), "test"), "again")
+
+    def test_restarts_thread(self):
+        poll = self.poller._poll
+        calls = []
+
+        def crash_once():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("broken")
+            poll()
+
+        with mock.patch.object(self.poller, "_poll", side_effect=crash_once):
+            wait = self.poller.submit(mock.Mock(return_value="done"), "test")
+            self.assertEqual(wait.wait(), "done")
+        self.assertEqual(len(calls), 2)
+
+    def test_callback_called_once(self):
+        for i in range(50):
+            calls = []
+            done = threading.Event()
+
+            def callback(wait):
+                calls.append(wait)
+                done.set()
+
+            wait = self.poller.submit(mock.Mock(return_value=True), "test")
+            wait.add_done_callback(callback)
+            done.wait(5)
+            time.sleep(0.001)
+            self.assertEqual(len(calls), 1)
+
+
+class TestWaiter(unittest.TestCase):
+
+    def test_run_uses_poller(self):
+        plan = mock.Mock()
+        plan.get_describe_filters.return_value = {"VpcIds": ["vpc-1"]}
+        config = plan.client.get_waiter.return_value.config
+        config.operation = "DescribeVpcs"
+        config.delay = 15
+        config.max_attempts = 40
+        acceptor = mock.Mock(state="success")
+        acceptor.matcher_func.side_effect = [False, True]
+        config.acceptors = [acceptor]
+        plan.client.describe_vpcs.return_value = {}
+
+        with mock.patch("touchdown.aws.common.poller", Poller()) as poller:
+            with mock.patch.object(poller, "submit", wraps=poller.submit) as submit:
+                waiter = Waiter(plan, "Waiting for vpc", "vpc_available")
+                with mock.patch.object(Wait, "next_delay", return_value=0.01):
+                    waiter.run()
+
+        self.assertEqual(plan.client.describe_vpcs.call_count, 2)
+        self.assertEqual(submit.call_args[1]["max_delay"], 60)
+        plan.client.get_waiter.return_value.wait.assert_not_called()
+        plan.refresh_object.assert_called_with()
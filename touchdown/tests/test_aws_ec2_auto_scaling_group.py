@@ -0,0 +1,188 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import mock
+
+from touchdown.aws.ec2.auto_scaling_group import ReplaceInstances
+from touchdown.core import errors
+
+from . import aws
+
+
+class FakeGroup(object):
+
+    """ An auto scaling group that starts and stops instances instantly """
+
+    def __init__(self, instances):
+        self.desired_capacity = len(instances)
+        self.instances = [self.instance(i, "old") for i in instances]
+        self.counter = 0
+        self.calls = []
+        self.max_capacity = self.desired_capacity
+
+    def instance(self, instance_id, launch_configuration):
+        return {
+            "InstanceId": instance_id,
+            "LaunchConfigurationName": launch_configuration,
+            "LifecycleState": "InService",
+            "HealthStatus": "Healthy",
+        }
+
+    def converge(self):
+        while len(self.instances) < self.desired_capacity:
+            self.counter += 1
+            self.instances.append(self.instance("i-new{}".format(self.counter), "new"))
+        while len(self.instances) > self.desired_capacity:
+            self.instances.pop(0)
+        self.max_capacity = max(self.max_capacity, len(self.instances))
+
+    def describe_object(self):
+        return {
+            "DesiredCapacity": self.desired_capacity,
+            "Instances": [dict(i) for i in self.instances],
+        }
+
+    def update_auto_scaling_group(self, DesiredCapacity, **kwargs):
+        self.calls.append(("scale", DesiredCapacity))
+        self.desired_capacity = DesiredCapacity
+        self.converge()
+
+    def terminate_instance_in_auto_scaling_group(self, InstanceId, **kwargs):
+        self.calls.append(("terminate", InstanceId))
+        self.instances = [i for i in self.instances if i["InstanceId"] != InstanceId]
+
+    def wait(self):
+        self.converge()
+
+
+class TestReplaceInstances(aws.TestCase):
+
+    def setUp(self):
+        super(TestReplaceInstances, self).setUp()
+        self.asg = self.aws.add_auto_scaling_group(
+            name="app",
+            launch_configuration=self.aws.add_launch_configuration(
+                name="new",
+                image="ami-cba130bc",
+                instance_type="t2.micro",
+            ),
+            min_size=1,
+            max_size=4,
+            desired_capacity=4,
+        )
+        self.plan = self.runner.goal.get_plan(self.asg)
+
+    def replace(self, instances, check=None, **kwargs):
+        for k, v in kwargs.items():
+            setattr(self.asg, k, v)
+
+        group = FakeGroup(instances)
+        self.plan._object = group.describe_object()
+        self.plan._object["LaunchConfigurationName"] = "new"
+
+        client = mock.Mock()
+        client.update_auto_scaling_group.side_effect = group.update_auto_scaling_group
+        client.terminate_instance_in_auto_scaling_group.side_effect = group.terminate_instance_in_auto_scaling_group
+
+        def describe_object():
+            # Replacement instances have started by the time anyone looks
+            group.wait()
+            return group.describe_object()
+
+        with mock.patch.object(type(self.plan), "client", client):
+            with mock.patch.object(self.plan, "describe_object", check or describe_object):
+                changes = [c for c in self.plan.update_object() if isinstance(c, ReplaceInstances)]
+                for change in changes:
+                    change.run()
+
+        return group, changes
+
+    def test_one_action_for_all_instances(self):
+        group, changes = self.replace(["i-1", "i-2", "i-3", "i-4"])
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(list(changes[0].description)[1:], ["i-1", "i-2", "i-3", "i-4"])
+
+    def test_default_batch_size(self):
+        group, changes = self.replace(["i-1", "i-2", "i-3"])
+        self.assertEqual(group.calls, [
+            ("scale", 4),
+            ("terminate", "i-1"),
+            ("scale", 3),
+            ("scale", 4),
+            ("terminate", "i-3"),
+            ("scale", 3),
+        ])
+        self.assertEqual(set(i["LaunchConfigurationName"] for i in group.instances), set(["new"]))
+
+    def test_skips_instances_that_have_gone(self):
+        # Scaling back down after the first batch terminates i-2, because it
+        # has the oldest launch configuration, so it doesn't need replacing
+        group, changes = self.replace(["i-1", "i-2", "i-3"])
+        self.assertNotIn(("terminate", "i-2"), group.calls)
+
+    def test_batch_size(self):
+        group, changes = self.replace(["i-1", "i-2", "i-3", "i-4", "i-5", "i-6"], replacement_batch_size=2)
+        self.assertEqual(len([c for c in group.calls if c[0] == "terminate"]), 4)
+        self.assertEqual(group.max_capacity, 8)
+        self.assertEqual(set(i["LaunchConfigurationName"] for i in group.instances), set(["new"]))
+
+    def test_batch_percentage(self):
+        group, changes = self.replace(["i-1", "i-2", "i-3", "i-4"], replacement_batch_size="50%")
+        self.assertEqual(changes[0].batch_size, 2)
+        self.assertEqual(group.max_capacity, 6)
+
+    def test_max_unavailable(self):
+        group, changes = self.replace(
+            ["i-1", "i-2", "i-3", "i-4"],
+            replacement_batch_size=2,
+            replacement_max_unavailable=1,
+        )
+        self.assertEqual(group.calls[0], ("scale", 5))
+        self.assertEqual(group.max_capacity, 5)
+
+    def test_max_unavailable_covers_batch(self):
+        group, changes = self.replace(
+            ["i-1", "i-2"],
+            replacement_batch_size=2,
+            replacement_max_unavailable=2,
+        )
+        self.assertEqual(group.calls, [("terminate", "i-1"), ("terminate", "i-2")])
+
+    def test_singleton(self):
+        group, changes = self.replace(["i-1"], replacement_policy="singleton")
+        self.assertEqual(group.calls, [("terminate", "i-1")])
+        self.assertEqual([i["LaunchConfigurationName"] for i in group.instances], ["new"])
+
+    def test_unhealthy(self):
+        def describe_object():
+            return {"DesiredCapacity": 1, "Instances": [{
+                "InstanceId": "i-1",
+                "LaunchConfigurationName": "old",
+                "LifecycleState": "InService",
+                "HealthStatus": "Unhealthy",
+            }]}
+
+        with mock.patch("touchdown.aws.ec2.auto_scaling_group.poller") as poller:
+            poller.wait.side_effect = errors.Timeout("Timed out")
+            self.assertRaises(errors.Error, self.replace, ["i-1"], check=describe_object)
+
+    def test_invalid_batch_size(self):
+        self.assertRaises(errors.InvalidParameter, setattr, self.asg, "replacement_batch_size", "0")
+        self.assertRaises(errors.InvalidParameter, setattr, self.asg, "replacement_batch_size", "150%")
+        self.assertRaises(errors.InvalidParameter, setattr, self.asg, "replacement_batch_size", "lots")
+
+    def test_invalid_max_unavailable(self):
+        self.assertRaises(errors.InvalidParameter, setattr, self.asg, "replacement_max_unavailable", -1)
+        self.asg.replacement_max_unavailable = 0
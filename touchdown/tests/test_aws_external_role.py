@@ -0,0 +1,113 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import datetime
+import time
+
+import mock
+from dateutil.tz import tzutc
+
+from touchdown.core import errors, goals
+from touchdown.core.credentials import CredentialCache
+
+from .aws import TestCase
+
+
+class TestExternalRole(TestCase):
+
+    def setUp(self):
+        super(TestExternalRole, self).setUp()
+        self.role = self.aws.add_external_role(
+            name="deploy",
+            arn="arn:aws:iam::111111111111:role/deploy",
+        )
+
+        self.cache = CredentialCache()
+        patcher = mock.patch("touchdown.aws.external_account.credential_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.sts = mock.Mock()
+        self.sts.assume_role.side_effect = self.assume_role
+        self.expires_in = 3600
+        self.calls = 0
+
+    def assume_role(self, **kwargs):
+        self.calls += 1
+        expiration = datetime.datetime.now(tzutc()) + datetime.timedelta(seconds=self.expires_in)
+        return {
+            "Credentials": {
+                "AccessKeyId": "AKID{}".format(self.calls),
+                "SecretAccessKey": "secret",
+                "SessionToken": "token",
+                "Expiration": expiration.replace(microsecond=0),
+            }
+        }
+
+    def get_plan(self, goal=None):
+        goal = goal or goals.Apply(self.workspace)
+        plan = goal.get_plan(self.role)
+        plan._client = self.sts
+        return plan
+
+    def test_session_uses_assumed_role(self):
+        credentials = self.get_plan().session.get_credentials()
+        self.assertEqual(credentials.access_key, "AKID1")
+        self.assertEqual(credentials.token, "token")
+
+    def test_credentials_reused(self):
+        self.get_plan().session.get_credentials()
+        credentials = self.get_plan().session.get_credentials()
+        self.assertEqual(credentials.access_key, "AKID1")
+        self.assertEqual(self.sts.assume_role.call_count, 1)
+
+    def use_mfa(self):
+        self.role.mfa_device = "arn:aws:iam::222222222222:mfa/fred"
+        self.role.mfa_token = "123456"
+
+    def test_mfa_token_not_in_key(self):
+        self.use_mfa()
+        key = self.get_plan().get_credential_key()
+        self.role.mfa_token = "654321"
+        self.assertEqual(self.get_plan().get_credential_key(), key)
+
+    def test_shared_session(self):
+        shared = goals.Shared()
+        a = self.get_plan(goals.Apply(self.workspace, shared=shared))
+        b = self.get_plan(goals.Apply(self.workspace, shared=shared))
+        self.assertIs(a.session, b.session)
+
+    def test_refreshed_before_expiry(self):
+        self.expires_in = 60
+        session = self.get_plan().session
+        self.expires_in = 3600
+        self.assertEqual(session.get_credentials().access_key, "AKID2")
+        self.assertEqual(self.sts.assume_role.call_count, 2)
+
+    def test_mfa_not_renewed(self):
+        self.use_mfa()
+        self.expires_in = 60
+        credentials = self.get_plan().session.get_credentials()
+        self.assertEqual(credentials.access_key, "AKID1")
+        self.assertEqual(self.sts.assume_role.call_count, 1)
+
+    def test_mfa_expired(self):
+        self.use_mfa()
+        plan = self.get_plan()
+        credentials = plan.session.get_credentials()
+        credentials._expiry_time = datetime.datetime.now(tzutc()) - datetime.timedelta(seconds=1)
+        self.cache.entries[plan.get_credential_key()]["expiration"] = time.time() - 1
+        self.assertRaises(errors.Error, getattr, credentials, "access_key")
+        self.assertEqual(self.sts.assume_role.call_count, 1)
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+
 from touchdown.core import errors
 
 from . import aws
@@ -37,15 +39,52 @@ class TestRole(aws.TestBasicUsage):
         )
 
     def test_no_change(self):
-        self.responses.add_fixture("POST", self.base_url, self.fixture_found, expires=1)
-        self.responses.add_fixture("POST", self.base_url, "aws_role_policies_0")
+        self.responses.add_fixture("POST", self.base_url, "aws_role_details", expires=1)
         self.runner.dot()
         self.assertRaises(errors.NothingChanged, self.runner.apply)
         self.assertEqual(self.plan.resource_id, self.expected_resource_id)
+        self.assertEqual(len(self.responses.calls), 1)
+
+    def test_create(self):
+        self.responses.add_fixture("POST", self.base_url, "aws_role_details_404", expires=1)
+        self.responses.add_fixture("POST", self.base_url, self.fixture_create, expires=1)
+        self.responses.add_fixture("POST", self.base_url, self.fixture_found)
+        self.runner.dot()
+        self.runner.apply()
+        self.assertEqual(self.plan.resource_id, self.expected_resource_id)
 
     def test_delete_role_policy(self):
-        self.responses.add_fixture("POST", self.base_url, self.fixture_found, expires=1)
+        self.responses.add_fixture("POST", self.base_url, "aws_role_details_policies", expires=1)
         self.responses.add_fixture("POST", self.base_url, "aws_role_policies_1")
         self.runner.dot()
         self.runner.apply()
         self.assertEqual(self.plan.resource_id, self.expected_resource_id)
+
+    def test_put_changed_policy(self):
+        self.resource.policies = {
+            "S3Access": json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [{"Effect": "Allow", "Action": ["s3:GetObject"], "Resource": ["*"]}],
+            }),
+        }
+        self.responses.add_fixture("POST", self.base_url, "aws_role_details_policies", expires=1)
+        changes = self.runner.goal.get_changes(self.resource)
+        self.assertEqual([c.summary for c in changes], ["Put policy S3Access"])
+
+    def test_unchanged_policy_is_not_fetched(self):
+        self.resource.policies = {
+            "S3Access": json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [{"Effect": "Allow", "Action": ["s3:*"], "Resource": ["*"]}],
+            }),
+        }
+        self.responses.add_fixture("POST", self.base_url, "aws_role_details_policies", expires=1)
+        self.assertEqual(self.runner.goal.get_changes(self.resource), [])
+        self.assertEqual(len(self.responses.calls), 1)
+
+    def test_policies_without_prefetch(self):
+        self.runner.goal.caching = False
+        self.responses.add_fixture("POST", self.base_url, self.fixture_found, expires=1)
+        self.responses.add_fixture("POST", self.base_url, "aws_role_policies_1", expires=1)
+        changes = self.runner.goal.get_changes(self.resource)
+        self.assertEqual([c.summary for c in changes], ["Delete policy S3Access"])
@@ -163,3 +163,45 @@ class TestHostedZone(aws.TestCase):
         self.responses.add_fixture("GET", "https://route53.amazonaws.com/2013-04-01/hostedzone", self.fixture_found)
         self.runner.apply()
         self.assertEqual(self.plan.resource_id, self.expected_resource_id)
+
+    def test_zones_listed_once(self):
+        self.resource = self.aws.add_hosted_zone(name='example.com')
+        self.aws.add_hosted_zone(name='example.org')
+        self.plan = self.runner.goal.get_plan(self.resource)
+
+        self.responses.add_fixture(
+            "GET",
+            "https://route53.amazonaws.com/2013-04-01/hostedzone/Z111111QQQQQQQ/rrset",
+            "aws_hosted_zone_rrset_0",
+        )
+        self.responses.add_fixture("GET", "https://route53.amazonaws.com/2013-04-01/hostedzone", self.fixture_found)
+        list(self.runner.plan())
+
+        listings = [r for (r, _) in self.responses.calls if r.url == "https://route53.amazonaws.com/2013-04-01/hostedzone"]
+        self.assertEqual(len(listings), 1)
+        self.assertEqual(self.plan.resource_id, '/hostedzone/Z111111QQQQQQQ')
+
+    def test_changes_batched(self):
+        self.resource = self.aws.add_hosted_zone(
+            name='example.com',
+            records=[{
+                "name": "www{}.example.com".format(i),
+                "type": "A",
+                "ttl": 900,
+                "values": ['127.0.0.1'],
+            } for i in range(5)]
+        )
+        self.plan = self.runner.goal.get_plan(self.resource)
+        self.plan.max_changes = 2
+
+        self.responses.add_fixture(
+            "GET",
+            "https://route53.amazonaws.com/2013-04-01/hostedzone/Z111111QQQQQQQ/rrset",
+            "aws_hosted_zone_rrset_1",
+        )
+        self.responses.add_fixture("GET", "https://route53.amazonaws.com/2013-04-01/hostedzone", self.fixture_found)
+
+        # 5 upserts and the deletion of the existing A record
+        changes = dict(self.runner.plan())[self.resource]
+        self.assertEqual(len(changes), 3)
+        self.assertEqual(sum(len(c._description) - 1 for c in changes), 6)
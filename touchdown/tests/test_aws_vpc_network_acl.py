@@ -0,0 +1,127 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import mock
+
+from touchdown.aws.vpc.network_acl import number_entries
+
+from . import aws
+
+
+class TestNumberEntries(unittest.TestCase):
+
+    def test_initial(self):
+        self.assertEqual(number_entries(["a", "b", "c"], []), {0: 100, 1: 200, 2: 300})
+
+    def test_unchanged(self):
+        remote = [(100, "a"), (200, "b")]
+        self.assertEqual(number_entries(["a", "b"], remote), {0: 100, 1: 200})
+
+    def test_insert_at_top(self):
+        remote = [(100, "a"), (200, "b")]
+        self.assertEqual(number_entries(["z", "a", "b"], remote), {0: 50, 1: 100, 2: 200})
+
+    def test_insert_in_middle(self):
+        remote = [(100, "a"), (200, "b")]
+        self.assertEqual(number_entries(["a", "z", "b"], remote), {0: 100, 1: 150, 2: 200})
+
+    def test_change_reuses_number(self):
+        remote = [(100, "a"), (200, "b"), (300, "c")]
+        self.assertEqual(number_entries(["a", "z", "c"], remote), {0: 100, 1: 200, 2: 300})
+
+    def test_no_room(self):
+        # Rules numbered one apart leave no room, so the rules after the new
+        # one are moved (replacing the entries that were there) instead
+        remote = [(1, "a"), (2, "b"), (3, "c")]
+        self.assertEqual(number_entries(["z", "a", "b", "c"], remote), {0: 1, 1: 2, 2: 3, 3: 103})
+
+
+class TestNetworkACLEntries(aws.TestCase):
+
+    def setUp(self):
+        super(TestNetworkACLEntries, self).setUp()
+        self.vpc = self.aws.add_vpc(name='test-vpc', cidr_block='10.0.0.0/16')
+        self.acl = self.vpc.add_network_acl(
+            name='test',
+            inbound=[
+                {"network": "10.0.0.0/8", "port": 22},
+                {"network": "0.0.0.0/0", "port": 80},
+                {"network": "0.0.0.0/0", "port": 443},
+            ],
+            outbound=[
+                {"network": "0.0.0.0/0", "protocol": "all"},
+            ],
+        )
+        self.plan = self.runner.goal.get_plan(self.acl)
+
+    def entry(self, number, cidr, port=None, egress=False, protocol="6"):
+        entry = {
+            "RuleNumber": number,
+            "Egress": egress,
+            "Protocol": protocol,
+            "RuleAction": "allow",
+            "CidrBlock": cidr,
+        }
+        if port:
+            entry["PortRange"] = {"From": port, "To": port}
+        return entry
+
+    def get_actions(self, *entries):
+        self.plan._object = {
+            "NetworkAclId": "acl-1",
+            "Entries": list(entries) + [
+                {"RuleNumber": 32767, "Egress": False, "Protocol": "-1", "RuleAction": "deny", "CidrBlock": "0.0.0.0/0"},
+            ],
+        }
+        return list(self.plan.update_object())
+
+    def test_no_changes(self):
+        actions = self.get_actions(
+            self.entry(100, "10.0.0.0/8", 22),
+            self.entry(200, "0.0.0.0/0", 80),
+            self.entry(300, "0.0.0.0/0", 443),
+            self.entry(100, "0.0.0.0/0", egress=True, protocol="-1"),
+        )
+        self.assertEqual(actions, [])
+
+    def test_changes(self):
+        actions = self.get_actions(
+            self.entry(200, "0.0.0.0/0", 80),
+            self.entry(300, "0.0.0.0/0", 8443),
+            self.entry(400, "0.0.0.0/0", 8080),
+            self.entry(100, "0.0.0.0/0", egress=True, protocol="-1"),
+        )
+        self.assertEqual(len(actions), 1)
+        action = actions[0]
+        self.assertEqual([n for (n, key) in action.creates], [100])
+        self.assertEqual([n for (n, key) in action.replaces], [300])
+        self.assertEqual(action.deletes, [(False, 400)])
+
+        client = mock.Mock()
+        with mock.patch.object(type(self.plan), "client", client):
+            action.run()
+
+        client.create_network_acl_entry.assert_called_once_with(
+            NetworkAclId="acl-1",
+            RuleNumber=100,
+            Egress=False,
+            Protocol="6",
+            RuleAction="allow",
+            CidrBlock="10.0.0.0/8",
+            PortRange={"From": 22, "To": 22},
+        )
+        self.assertEqual(client.replace_network_acl_entry.call_args[1]["PortRange"], {"From": 443, "To": 443})
+        client.delete_network_acl_entry.assert_called_once_with(NetworkAclId="acl-1", Egress=False, RuleNumber=400)
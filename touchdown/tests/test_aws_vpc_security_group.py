@@ -0,0 +1,96 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from touchdown.aws.vpc.security_group import get_permissions
+
+from . import aws
+
+
+class TestSecurityGroupRules(aws.TestCase):
+
+    def setUp(self):
+        super(TestSecurityGroupRules, self).setUp()
+        self.vpc = self.aws.add_vpc(name='test-vpc', cidr_block='10.0.0.0/16')
+        self.other = self.vpc.add_security_group(name='other', description='other')
+        self.group = self.vpc.add_security_group(
+            name='test',
+            description='test',
+            ingress=[
+                {"protocol": "tcp", "port": 22, "network": "10.0.0.0/8"},
+                {"protocol": "tcp", "port": 80, "network": "0.0.0.0/0"},
+                {"protocol": "tcp", "port": 443, "network": "0.0.0.0/0"},
+                {"protocol": "tcp", "port": 5432, "security_group": self.other},
+            ],
+        )
+        self.plan = self.runner.goal.get_plan(self.group)
+        self.runner.goal.get_plan(self.other)._object = {"GroupId": "sg-other", "OwnerId": "123"}
+
+    def get_actions(self, remote):
+        self.plan._object = dict(remote, GroupId="sg-test", OwnerId="123")
+        actions = list(self.plan.update_object())
+        return [(action.func.__name__, action.serializer.render(self.runner.goal, self.group)) for action in actions]
+
+    def test_get_permissions(self):
+        permissions = dict(get_permissions([{
+            "IpProtocol": "6",
+            "FromPort": 80,
+            "ToPort": 80,
+            "IpRanges": [{"CidrIp": "10.0.0.0/8"}, {"CidrIp": "0.0.0.0/0"}],
+            "UserIdGroupPairs": [{"GroupId": "sg-1", "UserId": "123"}],
+        }]))
+        self.assertEqual(sorted(permissions.keys()), [
+            ("tcp", 80, 80, ("cidr", "0.0.0.0/0")),
+            ("tcp", 80, 80, ("cidr", "10.0.0.0/8")),
+            ("tcp", 80, 80, ("group", "sg-1")),
+        ])
+
+    def test_no_changes(self):
+        actions = self.get_actions({
+            "IpPermissions": [
+                {"IpProtocol": "tcp", "FromPort": 22, "ToPort": 22, "IpRanges": [{"CidrIp": "10.0.0.0/8"}]},
+                {"IpProtocol": "tcp", "FromPort": 80, "ToPort": 80, "IpRanges": [{"CidrIp": "0.0.0.0/0"}]},
+                {"IpProtocol": "tcp", "FromPort": 443, "ToPort": 443, "IpRanges": [{"CidrIp": "0.0.0.0/0"}]},
+                {"IpProtocol": "tcp", "FromPort": 5432, "ToPort": 5432, "UserIdGroupPairs": [{"GroupId": "sg-other", "UserId": "123"}]},
+            ],
+            "IpPermissionsEgress": [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}],
+        })
+        self.assertEqual(actions, [])
+
+    def test_batched_changes(self):
+        actions = self.get_actions({
+            "IpPermissions": [
+                {"IpProtocol": "tcp", "FromPort": 22, "ToPort": 22, "IpRanges": [{"CidrIp": "10.0.0.0/8"}, {"CidrIp": "1.2.3.4/32"}]},
+                {"IpProtocol": "tcp", "FromPort": 8080, "ToPort": 8080, "IpRanges": [{"CidrIp": "0.0.0.0/0"}]},
+            ],
+            "IpPermissionsEgress": [],
+        })
+        self.assertEqual([name for (name, params) in actions], [
+            "revoke_security_group_ingress",
+            "authorize_security_group_ingress",
+            "authorize_security_group_egress",
+        ])
+
+        revoke = actions[0][1]
+        self.assertEqual(revoke["GroupId"], "sg-test")
+        self.assertEqual(revoke["IpPermissions"], [
+            {"IpProtocol": "tcp", "FromPort": 22, "ToPort": 22, "IpRanges": [{"CidrIp": "1.2.3.4/32"}]},
+            {"IpProtocol": "tcp", "FromPort": 8080, "ToPort": 8080, "IpRanges": [{"CidrIp": "0.0.0.0/0"}]},
+        ])
+
+        authorize = actions[1][1]["IpPermissions"]
+        self.assertEqual([p["FromPort"] for p in authorize], [80, 443, 5432])
+        self.assertEqual(authorize[2]["UserIdGroupPairs"], [{"GroupId": "sg-other", "UserId": "123"}])
+
+        egress = actions[2][1]["IpPermissions"]
+        self.assertEqual(egress, [{"IpProtocol": "-1", "IpRanges": [{"CidrIp": "0.0.0.0/0"}]}])
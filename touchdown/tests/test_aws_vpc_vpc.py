@@ -12,6 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import shutil
+import tempfile
+
+from touchdown.core.main import ConsoleInterface
+from touchdown.core.runner import Runner
+from touchdown.core.state import StateCache
+
 from . import aws
 
 
@@ -23,3 +31,29 @@ class TestVpc(aws.TestBasicUsage):
             name='test-vpc',
             cidr_block='192.168.0.1/25',
         )
+
+    def test_plan_prefetches(self):
+        self.aws.add_vpc(name='test-vpc-2', cidr_block='192.168.1.0/24')
+        self.responses.add_fixture("POST", self.base_url, self.fixture_found)
+        list(self.runner.plan())
+        self.assertEqual(len(self.responses.calls), 1)
+        self.assertEqual(self.plan.resource_id, self.expected_resource_id)
+
+    def test_state_cache(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        path = os.path.join(path, "state")
+
+        self.responses.add_fixture("POST", self.base_url, self.fixture_found)
+        runner = Runner("apply", self.workspace, ConsoleInterface(interactive=False), state=StateCache(path))
+        self.assertEqual(list(runner.plan()), [])
+        self.assertEqual(len(self.responses.calls), 1)
+
+        runner = Runner("apply", self.workspace, ConsoleInterface(interactive=False), state=StateCache(path))
+        self.assertEqual(list(runner.plan()), [])
+        self.assertEqual(len(self.responses.calls), 1)
+        self.assertEqual(runner.goal.get_plan(self.resource).resource_id, self.expected_resource_id)
+
+    def test_clients_shared(self):
+        vpc = self.aws.add_vpc(name='test-vpc-2', cidr_block='192.168.1.0/24')
+        self.assertTrue(self.plan.client is self.runner.goal.get_plan(vpc).client)
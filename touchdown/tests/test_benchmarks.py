@@ -0,0 +1,46 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from touchdown.benchmarks import workspaces
+from touchdown.benchmarks.suite import Benchmark
+from touchdown.core import errors
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def run_benchmark(self, **kwargs):
+        report = Benchmark(**kwargs).run()
+        return dict((phase["name"], phase) for phase in report["phases"])
+
+    def test_replan_finds_nothing_to_do(self):
+        phases = self.run_benchmark(vpcs=2, subnets=2, rules=3, records=5, roles=2)
+        self.assertEqual(list(phases.keys()), ["build", "plan", "apply", "replan"])
+        self.assertTrue(phases["plan"]["changes"] > 0)
+        self.assertEqual(phases["replan"]["changes"], 0)
+        self.assertEqual(phases["apply"]["api_calls"]["ec2:CreateVpc"], 2)
+        self.assertEqual(phases["apply"]["api_calls"]["ec2:CreateSubnet"], 4)
+        self.assertEqual(phases["apply"]["api_calls"]["iam:CreateRole"], 2)
+        self.assertEqual(
+            phases["apply"]["api_call_count"],
+            sum(phases["apply"]["api_calls"].values()),
+        )
+
+    def test_parallel(self):
+        phases = self.run_benchmark(vpcs=2, subnets=2, rules=2, parallel=4)
+        self.assertEqual(phases["replan"]["changes"], 0)
+
+    def test_too_many_subnets(self):
+        self.assertRaises(errors.Error, workspaces.generate, subnets=257)
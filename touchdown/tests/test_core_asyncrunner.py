@@ -0,0 +1,159 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import collections
+import threading
+import time
+import unittest
+
+import mock
+from botocore.exceptions import ClientError
+
+from touchdown.aws.common import Waiter
+from touchdown.benchmarks import workspaces
+from touchdown.benchmarks.backend import Backend, FakeError, LatencyAdapter, installed
+from touchdown.benchmarks.suite import SilentInterface
+from touchdown.core import errors, goals
+from touchdown.core.history import Eta, History
+from touchdown.core.runner import Runner
+from touchdown.core.tracing import tracer
+
+try:
+    import asyncio
+    from touchdown.core.asyncrunner import AsyncLimiter, AsyncRunner
+except (ImportError, SyntaxError):
+    AsyncRunner = None
+
+
+@unittest.skipIf(AsyncRunner is None, "AsyncRunner needs Python 3.5")
+class TestAsyncRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = Backend()
+        adapter = LatencyAdapter()
+        self.backend.install(adapter)
+
+        self._installed = installed(adapter)
+        self._installed.__enter__()
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.workspace = workspaces.generate(vpcs=2, subnets=2, rules=2, records=2, roles=2)
+        self.ui = SilentInterface()
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        self._installed.__exit__(None, None, None)
+
+    def summarize(self, plan):
+        return [(resource, [c.summary for c in changes]) for (resource, changes) in plan]
+
+    def test_plan(self):
+        runner = AsyncRunner("apply", self.workspace, self.ui)
+        plan = self.loop.run_until_complete(runner.plan())
+        expected = Runner("apply", self.workspace, self.ui).plan()
+        self.assertEqual(self.summarize(plan), self.summarize(expected))
+        self.assertEqual(self.backend.calls["ec2:CreateVpc"], 0)
+
+    def test_apply(self):
+        runner = AsyncRunner("apply", self.workspace, self.ui, parallel=4)
+        with mock.patch.object(Waiter, "run") as run:
+            self.loop.run_until_complete(runner.apply())
+        self.assertEqual(run.call_count, 0)
+        self.assertEqual(self.backend.calls["ec2:CreateVpc"], 2)
+        self.assertEqual(self.backend.calls["iam:CreateRole"], 2)
+
+        runner = AsyncRunner("apply", self.workspace, self.ui)
+        self.assertRaises(errors.NothingChanged, self.loop.run_until_complete, runner.apply())
+
+    def test_apply_bookkeeping(self):
+        history = History()
+        runner = AsyncRunner("apply", self.workspace, self.ui, history=history)
+        completed = []
+        spans = []
+
+        def span(category, name, detached=False, **kwargs):
+            spans.append((category, detached))
+            return real_span(category, name, detached=detached, **kwargs)
+
+        real_span = tracer.span
+        with mock.patch.object(tracer, "span", span):
+            with mock.patch.object(Eta, "complete", lambda eta, resource: completed.append(resource)):
+                self.loop.run_until_complete(runner.apply())
+
+        self.assertIn(("action", True), spans)
+        self.assertEqual(set(completed), set(runner.goal.get_execution_order().all()))
+        self.assertEqual(runner.goal.eta, None)
+        self.assertTrue(any(name.startswith("Waiter") for (resource, name) in history.entries))
+
+    def test_failure_stops_dependents(self):
+        runner = AsyncRunner("apply", self.workspace, self.ui)
+        with mock.patch.object(self.backend.services[0], "handle_CreateVpc") as create_vpc:
+            create_vpc.side_effect = FakeError("VpcLimitExceeded", "Out of VPCs")
+            self.assertRaises(ClientError, self.loop.run_until_complete, runner.apply())
+        self.assertEqual(self.backend.calls["ec2:CreateSubnet"], 0)
+        self.assertEqual(self.backend.calls["iam:CreateRole"], 2)
+
+    def test_service_limits(self):
+        runner = AsyncRunner("apply", self.workspace, self.ui)
+        lock = threading.Lock()
+        running = collections.Counter()
+        peak = collections.Counter()
+
+        def get_changes(resource):
+            service = runner.goal.get_service_name(resource)
+            with lock:
+                running[service] += 1
+                peak[service] = max(peak[service], running[service])
+            time.sleep(0.01)
+            with lock:
+                running[service] -= 1
+
+        with mock.patch.object(runner.goal, "get_changes", get_changes):
+            self.loop.run_until_complete(runner.visit(runner.goal.get_plan_order(), runner.plan_resource))
+        self.assertEqual(peak["iam"], runner.goal.service_limits["iam"])
+        self.assertTrue(peak["ec2"] > peak["iam"])
+
+    def test_shared_limiter(self):
+        shared = goals.Shared()
+        limiter = AsyncLimiter(total=4, limits=goals.Goal.service_limits)
+        runners = [
+            AsyncRunner("apply", workspaces.generate(vpcs=2, subnets=2, rules=2, records=2, roles=4), self.ui, shared=shared, limiter=limiter)
+            for i in range(3)
+        ]
+        lock = threading.Lock()
+        running = collections.Counter()
+        peak = collections.Counter()
+
+        def get_changes(resource):
+            service = runners[0].goal.get_service_name(resource)
+            with lock:
+                running[service] += 1
+                running["total"] += 1
+                peak[service] = max(peak[service], running[service])
+                peak["total"] = max(peak["total"], running["total"])
+            time.sleep(0.01)
+            with lock:
+                running[service] -= 1
+                running["total"] -= 1
+
+        for runner in runners:
+            runner.goal.get_changes = get_changes
+        self.loop.run_until_complete(asyncio.gather(*[
+            runner.visit(runner.goal.get_plan_order(), runner.plan_resource) for runner in runners
+        ]))
+        self.assertEqual(peak["iam"], 2)
+        self.assertEqual(peak["total"], 4)
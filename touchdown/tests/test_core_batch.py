@@ -0,0 +1,138 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from touchdown.benchmarks.backend import Backend, FakeError, LatencyAdapter, installed
+from touchdown.benchmarks.suite import SilentInterface
+from touchdown.core import errors
+from touchdown.core.batch import BatchRunner, load_targets
+from touchdown.core.workspace import Workspace
+
+
+class TestLoadTargets(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, data, filename="targets.json"):
+        path = os.path.join(self.dir, filename)
+        with open(path, "w") as fp:
+            fp.write(data if isinstance(data, str) else json.dumps(data))
+        return path
+
+    def test_list(self):
+        path = self.write([{"name": "a", "region": "eu-west-1"}, {"name": "b"}])
+        self.assertEqual([t["name"] for t in load_targets(path)], ["a", "b"])
+
+    def test_targets_key(self):
+        path = self.write({"targets": [{"name": "a"}]})
+        self.assertEqual(load_targets(path), [{"name": "a"}])
+
+    def test_needs_name(self):
+        path = self.write([{"region": "eu-west-1"}])
+        self.assertRaises(errors.Error, load_targets, path)
+
+    def test_duplicate_name(self):
+        path = self.write([{"name": "a"}, {"name": "a"}])
+        self.assertRaises(errors.Error, load_targets, path)
+
+    def test_not_a_list(self):
+        path = self.write({"name": "a"})
+        self.assertRaises(errors.Error, load_targets, path)
+
+    def test_yaml_needs_pyyaml(self):
+        path = self.write("- name: a\n", "targets.yml")
+        with mock.patch("touchdown.core.batch.yaml", None):
+            self.assertRaises(errors.Error, load_targets, path)
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = Backend()
+        adapter = LatencyAdapter()
+        self.backend.install(adapter)
+
+        self._installed = installed(adapter)
+        self._installed.__enter__()
+
+    def tearDown(self):
+        self._installed.__exit__(None, None, None)
+
+    def get_workspace(self, target):
+        workspace = Workspace()
+        aws = workspace.add_aws(access_key_id='dummy', secret_access_key='dummy', region='eu-west-1')
+        vpc = aws.add_vpc(name="vpc-{}".format(target), cidr_block="10.{}.0.0/16".format(target))
+        vpc.add_subnet(name="subnet-{}".format(target), cidr_block="10.{}.0.0/24".format(target))
+        aws.add_role(name="role-{}".format(target), assume_role_policy={
+            "Statement": [{
+                "Effect": "Allow",
+                "Principal": {"Service": ["ec2.amazonaws.com"]},
+                "Action": ["sts:AssumeRole"],
+            }],
+        })
+        return workspace
+
+    def get_batch(self, targets=3, **kwargs):
+        workspaces = [("target-{}".format(i), self.get_workspace(i)) for i in range(targets)]
+        return BatchRunner("apply", workspaces, SilentInterface(), **kwargs)
+
+    def test_apply(self):
+        batch = self.get_batch(workers=3, max_parallel=4)
+        report = batch.apply()
+        self.assertEqual([r["status"] for r in report], ["applied"] * 3)
+        self.assertEqual(self.backend.calls["ec2:CreateVpc"], 3)
+        self.assertEqual(self.backend.calls["iam:CreateRole"], 3)
+        self.assertRaises(errors.NothingChanged, self.get_batch().apply)
+
+    def test_shares_sessions(self):
+        batch = self.get_batch(workers=3)
+        batch.plan()
+        keys = [k for k in batch.shared.objects if k[0] == "aws-account"]
+        self.assertEqual(len(keys), 1)
+        # Describe caches are dropped after planning, so each target still
+        # makes its own prefetch
+        self.assertEqual(self.backend.calls["iam:GetAccountAuthorizationDetails"], 3)
+
+    def test_plan_labels_resources(self):
+        plan = self.get_batch(targets=2).plan()
+        labels = set(label.split(":")[0] for (label, changes) in plan)
+        self.assertEqual(labels, set(["target-0", "target-1"]))
+
+    def test_failure_is_reported(self):
+        batch = self.get_batch(workers=2)
+        ec2 = self.backend.services[0]
+        create_vpc = ec2.handle_CreateVpc
+
+        def handle_CreateVpc(CidrBlock, **kwargs):
+            if CidrBlock.startswith("10.1."):
+                raise FakeError("VpcLimitExceeded", "Out of VPCs")
+            return create_vpc(CidrBlock, **kwargs)
+
+        with mock.patch.object(ec2, "handle_CreateVpc", handle_CreateVpc):
+            report = batch.apply()
+
+        self.assertEqual([r["status"] for r in report], ["applied", "failed", "applied"])
+        self.assertIn("Out of VPCs", report[1]["error"])
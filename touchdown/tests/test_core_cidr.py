@@ -0,0 +1,129 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import mock
+import netaddr
+
+from touchdown.core import errors, workspace
+from touchdown.core.cidr import CidrIndex
+
+
+class TestCidrIndex(unittest.TestCase):
+
+    def index(self, *networks):
+        index = CidrIndex()
+        for network in networks:
+            index.add(netaddr.IPNetwork(network), network)
+        return index
+
+    def test_overlaps(self):
+        index = self.index("10.0.0.0/16", "10.0.1.0/24", "10.1.0.0/24", "10.0.1.128/25", "10.2.0.0/24")
+        self.assertEqual(sorted(index.overlaps()), [
+            ("10.0.0.0/16", "10.0.1.0/24"),
+            ("10.0.0.0/16", "10.0.1.128/25"),
+            ("10.0.1.0/24", "10.0.1.128/25"),
+        ])
+
+    def test_no_overlaps(self):
+        index = self.index(*["10.0.{}.0/24".format(i) for i in range(256)])
+        self.assertEqual(list(index.overlaps()), [])
+
+    def test_versions_dont_overlap(self):
+        index = self.index("0.0.0.0/0", "::/96")
+        self.assertEqual(list(index.overlaps()), [])
+
+    def test_containing(self):
+        index = self.index("0.0.0.0/0", "10.0.0.0/8", "10.0.0.0/16", "10.1.0.0/16", "10.0.0.0/24")
+        self.assertEqual(
+            list(index.containing(netaddr.IPNetwork("10.0.0.0/16"))),
+            ["0.0.0.0/0", "10.0.0.0/8", "10.0.0.0/16"],
+        )
+        self.assertEqual(index.get(netaddr.IPNetwork("10.1.0.0/16")), ["10.1.0.0/16"])
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = workspace.Workspace()
+        self.aws = self.workspace.add_aws(region="eu-west-1")
+        self.vpc = self.aws.add_vpc(name="vpc", cidr_block="10.0.0.0/16")
+
+    def test_subnets_overlap(self):
+        self.vpc.add_subnet(name="a", cidr_block="10.0.0.0/23")
+        self.vpc.add_subnet(name="b", cidr_block="10.0.1.0/24")
+        self.assertRaises(errors.InvalidParameter, self.workspace.validate)
+
+    def test_subnets_in_different_vpcs(self):
+        other = self.aws.add_vpc(name="other", cidr_block="10.0.0.0/16")
+        self.vpc.add_subnet(name="a", cidr_block="10.0.0.0/24")
+        other.add_subnet(name="b", cidr_block="10.0.0.0/24")
+        self.workspace.validate()
+
+    def test_duplicate_route(self):
+        self.vpc.add_route_table(name="rt", routes=[
+            {"destination_cidr": "192.168.0.0/24"},
+            {"destination_cidr": "192.168.0.0/24"},
+        ])
+        self.assertRaises(errors.InvalidParameter, self.workspace.validate)
+
+    def test_route_inside_vpc(self):
+        self.vpc.add_route_table(name="rt", routes=[{"destination_cidr": "10.0.1.0/24"}])
+        self.assertRaises(errors.InvalidParameter, self.workspace.validate)
+
+    def test_routes(self):
+        self.vpc.add_route_table(name="rt", routes=[
+            {"destination_cidr": "0.0.0.0/0"},
+            {"destination_cidr": "192.168.0.0/24"},
+        ])
+        self.workspace.validate()
+
+    def assertShadowed(self, rules, shadowed=True):
+        self.vpc.add_network_acl(name="acl", inbound=rules)
+        with mock.patch("touchdown.aws.vpc.network_acl.logger") as logger:
+            self.workspace.validate()
+        self.assertEqual(logger.warning.called, shadowed)
+
+    def test_shadowed_rule(self):
+        self.assertShadowed([
+            {"network": "10.0.0.0/8", "port": 80},
+            {"network": "10.1.0.0/16", "port": 80, "action": "deny"},
+        ])
+
+    def test_shadowed_by_all_protocols(self):
+        self.assertShadowed([
+            {"network": "10.0.0.0/8", "protocol": "all", "action": "deny"},
+            {"network": "10.1.0.0/16", "protocol": "udp", "port": 53},
+        ])
+
+    def test_rules_without_ports(self):
+        self.assertShadowed([
+            {"network": "10.0.0.0/8", "protocol": "icmp"},
+            {"network": "10.1.0.0/16", "protocol": "icmp", "action": "deny"},
+        ])
+
+    def test_port_inside_rule_without_ports(self):
+        self.assertShadowed([
+            {"network": "10.0.0.0/8", "protocol": "tcp", "action": "deny"},
+            {"network": "10.1.0.0/16", "protocol": "tcp", "port": 22},
+        ])
+
+    def test_rules(self):
+        self.assertShadowed([
+            {"network": "10.1.0.0/16", "port": 80, "action": "deny"},
+            {"network": "10.0.0.0/8", "port": 80},
+            {"network": "10.0.0.0/8", "port": 443, "action": "deny"},
+            {"network": "10.0.0.0/8", "protocol": "udp", "port": 80, "action": "deny"},
+        ], shadowed=False)
@@ -0,0 +1,103 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+import unittest
+
+import mock
+
+from touchdown.core.credentials import CredentialCache, get_key
+
+
+class TestCredentialCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "credentials")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_get_key(self):
+        self.assertEqual(get_key("sts", {"RoleArn": "a"}), get_key("sts", {"RoleArn": "a"}))
+        self.assertNotEqual(get_key("sts", {"RoleArn": "a"}), get_key("sts", {"RoleArn": "b"}))
+
+    def test_in_memory(self):
+        cache = CredentialCache()
+        cache.set("key", {"token": "a"}, time.time() + 3600)
+        self.assertEqual(cache.get("key"), {"token": "a"})
+        self.assertEqual(cache.get("missing"), None)
+
+    def test_margin(self):
+        cache = CredentialCache()
+        cache.set("key", {"token": "a"}, time.time() + 60)
+        self.assertEqual(cache.get("key"), {"token": "a"})
+        self.assertEqual(cache.get("key", margin=300), None)
+
+    def test_persisted(self):
+        CredentialCache(self.path).set("key", {"token": "a"}, time.time() + 3600)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        self.assertEqual(CredentialCache(self.path).get("key"), {"token": "a"})
+
+    def test_expired_entries_are_dropped(self):
+        cache = CredentialCache(self.path)
+        cache.set("old", {"token": "a"}, time.time() - 1)
+        cache.set("new", {"token": "b"}, time.time() + 3600)
+        with open(self.path) as fp:
+            self.assertEqual(len(fp.readlines()), 1)
+
+    def test_readable_by_others(self):
+        CredentialCache(self.path).set("key", {"token": "a"}, time.time() + 3600)
+        os.chmod(self.path, 0o644)
+        self.assertEqual(CredentialCache(self.path).get("key"), None)
+
+    def test_creates_directory(self):
+        path = os.path.join(self.dir, "touchdown", "credentials")
+        CredentialCache(path).set("key", {"token": "a"}, time.time() + 3600)
+        self.assertEqual(stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode), 0o700)
+        self.assertEqual(CredentialCache(path).get("key"), {"token": "a"})
+
+    def test_save_failure(self):
+        path = os.path.join(self.dir, "credentials")
+        open(path, "w").close()
+        cache = CredentialCache(os.path.join(path, "credentials"))
+        with mock.patch("touchdown.core.credentials.logger") as logger:
+            cache.set("key", {"token": "a"}, time.time() + 3600)
+        self.assertTrue(logger.warning.called)
+        self.assertEqual(cache.get("key"), {"token": "a"})
+
+    def test_concurrent_saves(self):
+        cache = CredentialCache(self.path)
+        threads = [
+            threading.Thread(target=cache.set, args=("key{}".format(i), {"token": i}, time.time() + 3600))
+            for i in range(20)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(CredentialCache(self.path).entries), 20)
+        self.assertEqual(os.listdir(self.dir), ["credentials"])
+
+    def test_close(self):
+        cache = CredentialCache(self.path)
+        cache.close()
+        cache.set("key", {"token": "a"}, time.time() + 3600)
+        self.assertFalse(os.path.exists(self.path))
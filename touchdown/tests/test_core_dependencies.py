@@ -0,0 +1,110 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+from touchdown.core import errors
+from touchdown.core.dependencies import DependencyMap, ReadyQueue
+
+
+class Node(object):
+
+    def __init__(self, name, *dependencies):
+        self.name = name
+        self.dependencies = set(dependencies)
+
+    def __repr__(self):
+        return self.name
+
+
+class TestDependencyMap(unittest.TestCase):
+
+    def setUp(self):
+        self.vpc = Node("vpc")
+        self.route_table = Node("route_table", self.vpc)
+        self.subnet = Node("subnet", self.vpc, self.route_table)
+        self.root = Node("root", self.vpc, self.route_table, self.subnet)
+
+    def test_all(self):
+        order = list(DependencyMap(self.root).all())
+        self.assertEqual(order, [self.vpc, self.route_table, self.subnet, self.root])
+
+    def test_all_tips_first(self):
+        order = list(DependencyMap(self.root, tips_first=True).all())
+        self.assertEqual(order, [self.root, self.subnet, self.route_table, self.vpc])
+
+    def test_get_ready_and_complete(self):
+        dm = DependencyMap(self.root)
+        self.assertEqual(list(dm.get_ready()), [self.vpc])
+        self.assertEqual(dm.complete(self.vpc), [self.route_table])
+        self.assertEqual(list(dm.get_ready()), [self.route_table])
+        self.assertEqual(dm.complete(self.route_table), [self.subnet])
+        self.assertEqual(list(dm.get_ready()), [self.subnet])
+
+    def test_items(self):
+        dm = DependencyMap(self.root)
+        self.assertEqual(len(dm), 4)
+        self.assertEqual(dict(dm.items())[self.subnet], set((self.vpc, self.route_table)))
+
+    def test_self_reference(self):
+        self.vpc.dependencies.add(self.vpc)
+        self.assertRaises(errors.CycleError, DependencyMap, self.root)
+
+    def test_wide_graph(self):
+        records = [Node("record-{}".format(i), self.vpc) for i in range(5000)]
+        root = Node("root", self.vpc, *records)
+        order = list(DependencyMap(root).all())
+        self.assertEqual(len(order), 5002)
+        self.assertEqual(order[0], self.vpc)
+        self.assertEqual(order[-1], root)
+
+
+class TestReadyQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.vpc = Node("vpc")
+        self.records = [Node("record-{}".format(i), self.vpc) for i in range(4)]
+        self.root = Node("root", self.vpc, *self.records)
+
+    def drain(self, ready):
+        nodes = []
+        node = ready.pop()
+        while node is not None:
+            nodes.append(node)
+            node = ready.pop()
+        return nodes
+
+    def test_order(self):
+        ready = ReadyQueue(DependencyMap(self.root))
+        self.assertEqual(self.drain(ready), [self.vpc])
+        ready.finish(self.vpc)
+        self.assertEqual(set(self.drain(ready)), set(self.records))
+
+    def test_failure_holds_dependents(self):
+        ready = ReadyQueue(DependencyMap(self.root))
+        self.drain(ready)
+        ready.finish(self.vpc, completed=False)
+        self.assertEqual(self.drain(ready), [])
+
+    def get_key(self, node):
+        return "record" if node in self.records else None
+
+    def test_limits(self):
+        ready = ReadyQueue(DependencyMap(self.root), limits={"record": 2}, key=self.get_key)
+        self.drain(ready)
+        ready.finish(self.vpc)
+        started = self.drain(ready)
+        self.assertEqual(len(started), 2)
+        ready.finish(started[0])
+        self.assertEqual(len(self.drain(ready)), 1)
@@ -0,0 +1,86 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from touchdown.core import dependencies, workspace
+from touchdown.core.action import Action
+from touchdown.core.history import DEFAULT_DURATION, Eta, History, Schedule
+
+
+class CreateThing(Action):
+
+    def __init__(self):
+        pass
+
+
+class TestHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, "history")
+        self.workspace = workspace.Workspace()
+        self.aws = self.workspace.add_aws(region="eu-west-1")
+        self.vpc = self.aws.add_vpc(name="vpc", cidr_block="10.0.0.0/16")
+        self.subnet = self.vpc.add_subnet(name="subnet", cidr_block="10.0.0.0/24")
+
+    def test_estimate(self):
+        h = History(self.path)
+        self.assertEqual(h.estimate(self.vpc, CreateThing()), DEFAULT_DURATION)
+
+        h.record(self.vpc, CreateThing(), 10)
+        h.record(self.vpc, CreateThing(), 20)
+        self.assertEqual(h.estimate(self.vpc, CreateThing()), 13)
+        # Other resource types fall back to the average for the action
+        self.assertEqual(h.estimate(self.subnet, CreateThing()), 13)
+
+        h.save()
+        self.assertEqual(History(self.path).estimate(self.vpc, CreateThing()), 13)
+
+    def get_schedule(self, durations, **kwargs):
+        return Schedule(
+            lambda: dependencies.DependencyMap(self.workspace),
+            durations,
+            **kwargs
+        )
+
+    def test_critical_path(self):
+        other = self.vpc.add_subnet(name="other", cidr_block="10.0.1.0/24")
+        schedule = self.get_schedule({self.vpc: 10, self.subnet: 5, other: 8})
+        self.assertEqual(schedule.critical_path(), [(self.vpc, 10), (other, 8)])
+        self.assertEqual(schedule.total, 23)
+
+    def test_simulate(self):
+        other = self.vpc.add_subnet(name="other", cidr_block="10.0.1.0/24")
+        schedule = self.get_schedule({self.vpc: 10, self.subnet: 5, other: 8})
+        self.assertEqual(schedule.simulate(1), 23)
+        self.assertEqual(schedule.simulate(2), 18)
+
+        limited = self.get_schedule(
+            {self.vpc: 10, self.subnet: 5, other: 8},
+            limits={"ec2": 1},
+            key=lambda node: "ec2",
+        )
+        self.assertEqual(limited.simulate(2), 23)
+
+    def test_eta(self):
+        eta = Eta(self.get_schedule({self.vpc: 10, self.subnet: 5}))
+        self.assertTrue(14 < eta.remaining() <= 15)
+        eta.complete(self.vpc)
+        self.assertTrue(eta.remaining() < 1)
+        self.assertTrue(eta.format().startswith("ETA 00:00:0"))
@@ -0,0 +1,133 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import mock
+from six.moves import builtins
+
+from touchdown.core import argument, workspace
+from touchdown.core.profiling import Profiler
+from touchdown.core.resource import Resource, ResourceType
+
+
+class TestLazyFactories(unittest.TestCase):
+
+    def setUp(self):
+        self.imported = []
+        self.real_import = builtins.__import__
+
+    def fake_import(self, name, *args, **kwargs):
+        if name != "touchdown.tests.lazy":
+            return self.real_import(name, *args, **kwargs)
+        self.imported.append(name)
+
+        class LazyThing(Resource):
+            resource_name = "lazy_thing"
+            name = argument.String()
+            root = argument.Resource(workspace.Workspace)
+
+    def test_factory_imports_module(self):
+        ResourceType.add_lazy_factory("lazy_thing", "touchdown.tests.lazy")
+        w = workspace.Workspace()
+        with mock.patch.object(builtins, "__import__", self.fake_import):
+            thing = w.add_lazy_thing(name="test")
+            w.add_lazy_thing(name="test2")
+        self.assertEqual(thing.name, "test")
+        self.assertEqual(self.imported, ["touchdown.tests.lazy"])
+
+    def test_import_error(self):
+        ResourceType.add_lazy_factory("broken_thing", "touchdown.tests.broken")
+        w = workspace.Workspace()
+        self.assertRaises(ImportError, getattr, w, "add_broken_thing")
+        self.assertRaises(ImportError, getattr, w, "add_broken_thing")
+        ResourceType.__lazy_factories__.pop("broken_thing")
+
+    def test_unknown_factory(self):
+        w = workspace.Workspace()
+        self.assertRaises(AttributeError, getattr, w, "add_no_such_thing")
+
+
+class TestFieldStorage(unittest.TestCase):
+
+    def test_no_instance_dict(self):
+        w = workspace.Workspace()
+        self.assertFalse(hasattr(w, "__dict__"))
+        self.assertRaises(AttributeError, setattr, w, "not_a_field", 1)
+
+    def test_fields_are_per_class(self):
+        class Base(Resource):
+            resource_name = "base"
+            first = argument.String()
+
+        class Child(Base):
+            resource_name = "child"
+            second = argument.String()
+
+        self.assertFalse(Base.meta.fields["first"] is Child.meta.fields["first"])
+        for cls in (Base, Child):
+            for index, name in enumerate(cls.meta.field_order):
+                self.assertEqual(cls.meta.fields[name].index, index)
+
+        child = Child(None, first="a", second="b")
+        self.assertEqual((child.first, child.second), ("a", "b"))
+        self.assertTrue(Child.meta.fields["first"].present(child))
+        self.assertFalse(Base.meta.fields["policies"].present(Base(None)))
+
+    def test_computed_default_memoized(self):
+        calls = []
+
+        def default(instance):
+            calls.append(instance)
+            return instance.name.upper()
+
+        class Thing(Resource):
+            resource_name = "thing"
+            name = argument.String()
+            label = argument.String(default=default)
+
+        thing = Thing(None, name="a")
+        self.assertEqual(thing.label, "A")
+        self.assertEqual(thing.label, "A")
+        self.assertEqual(len(calls), 1)
+
+        thing.name = "b"
+        self.assertEqual(thing.label, "B")
+        self.assertEqual(len(calls), 2)
+
+    def test_field_tuples_precomputed(self):
+        w = workspace.Workspace()
+        self.assertTrue(w.fields is w.fields)
+        self.assertEqual([name for name, arg in w.arguments], w.meta.field_order)
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_timed(self):
+        p = Profiler()
+        p.start()
+        try:
+            with p.timed("model", "ec2"):
+                with p.timed("model", "iam"):
+                    pass
+        finally:
+            p.stop()
+        self.assertEqual([e[:3] for e in p.entries], [["model", "ec2", 0], ["model", "iam", 1]])
+        self.assertEqual(list(p.report(threshold=-1))[1].split()[1:], ["model", "iam"])
+
+    def test_disabled(self):
+        p = Profiler()
+        with p.timed("model", "ec2"):
+            pass
+        self.assertEqual(p.entries, [])
@@ -67,3 +67,60 @@ class TestSerializing(unittest.TestCase):
         serializer = serializers.List(serializers.Dict(Name=serializers.Argument("name")))
         result = serializer.render(self.runner, [self.resource])
         self.assertEqual(result, [{"Name": "test"}, ])
+
+    def test_resource(self):
+        self.resource.description = "hello"
+        serializer = serializers.Resource()
+        result = serializer.render(self.runner, self.resource)
+        self.assertEqual(result, {"GroupName": "test", "Description": "hello"})
+
+    def test_resource_kwargs_take_precedence(self):
+        serializer = serializers.Resource(GroupName=serializers.Const("other"))
+        result = serializer.render(self.runner, self.resource)
+        self.assertEqual(result, {"GroupName": "other"})
+
+    def test_resource_compiled_once(self):
+        first = serializers.Resource().compile(SecurityGroup)
+        second = serializers.Resource().compile(SecurityGroup)
+        self.assertTrue(first is second)
+        self.assertFalse(first is serializers.Resource(mode="update").compile(SecurityGroup))
+
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.resource = SecurityGroup(None, name="test")
+        self.plan = mock.Mock()
+        self.plan.resource_id = "sg-1"
+        self.runner = mock.Mock()
+        self.runner.render_cache = serializers.RenderCache()
+
+        def get_plan(resource):
+            self.runner.render_cache.observe(resource)
+            return self.plan
+        self.runner.get_plan.side_effect = get_plan
+
+    def test_identifier_cached(self):
+        serializer = serializers.Identifier()
+        self.assertEqual(serializer.render(self.runner, self.resource), "sg-1")
+        self.plan.resource_id = "sg-2"
+        self.assertEqual(serializer.render(self.runner, self.resource), "sg-1")
+        self.assertEqual(self.runner.get_plan.call_count, 1)
+
+    def test_invalidated_when_observed_resource_changes(self):
+        serializer = serializers.Identifier()
+        serializer.render(self.runner, self.resource)
+        self.plan.resource_id = "sg-2"
+        self.runner.render_cache.invalidate(self.resource)
+        self.assertEqual(serializer.render(self.runner, self.resource), "sg-2")
+
+    def test_unrelated_change_keeps_cache(self):
+        serializer = serializers.Identifier()
+        serializer.render(self.runner, self.resource)
+        self.runner.render_cache.invalidate(SecurityGroup(None, name="other"))
+        self.assertEqual(len(self.runner.render_cache.results), 1)
+
+    def test_results_are_copied(self):
+        serializer = serializers.Resource()
+        serializer.render(self.runner, self.resource)["GroupName"] = "changed"
+        self.assertEqual(serializer.render(self.runner, self.resource), {"GroupName": "test"})
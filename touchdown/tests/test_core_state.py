@@ -0,0 +1,87 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from touchdown.core import workspace
+from touchdown.core.state import StateCache, get_key
+
+
+class TestStateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "state")
+        self.workspace = workspace.Workspace()
+        self.aws = self.workspace.add_aws(region='eu-west-1')
+        self.vpc = self.aws.add_vpc(name='test-vpc', cidr_block='10.0.0.0/16')
+        self.subnet = self.vpc.add_subnet(name='test-subnet', cidr_block='10.0.0.0/24')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_key(self):
+        self.assertTrue(get_key(self.subnet).endswith("/vpc 'test-vpc'/subnet 'test-subnet'"))
+
+    def test_key_includes_region(self):
+        other = self.workspace.add_aws(region='us-east-1').add_vpc(name='test-vpc', cidr_block='10.0.0.0/16')
+        self.assertNotEqual(get_key(other), get_key(self.vpc))
+
+    def test_key_includes_role(self):
+        a = self.aws.add_external_role(name='deploy', arn='arn:aws:iam::111111111111:role/deploy')
+        b = self.aws.add_external_role(name='deploy', arn='arn:aws:iam::222222222222:role/deploy')
+        self.assertNotEqual(get_key(a), get_key(b))
+
+    def test_roundtrip(self):
+        state = StateCache(self.path)
+        state.set(self.vpc, {"VpcId": "vpc-1a2b3c4d"})
+        state.save()
+
+        state = StateCache(self.path)
+        self.assertEqual(state.get(self.vpc), {"VpcId": "vpc-1a2b3c4d"})
+        self.assertEqual(state.get(self.subnet), None)
+
+    def test_not_found_is_cached(self):
+        state = StateCache(self.path)
+        state.set(self.vpc, None)
+        self.assertEqual(state.get(self.vpc), {})
+
+    def test_expired(self):
+        state = StateCache(self.path, ttl=60)
+        state.set(self.vpc, {"VpcId": "vpc-1a2b3c4d"})
+        state.entries[get_key(self.vpc)]["time"] = time.time() - 120
+        self.assertEqual(state.get(self.vpc), None)
+
+    def test_changed(self):
+        state = StateCache(self.path)
+        state.set(self.vpc, {"VpcId": "vpc-1a2b3c4d"})
+        self.vpc.tenancy = "dedicated"
+        self.assertEqual(state.get(self.vpc), None)
+
+    def test_probable(self):
+        state = StateCache(self.path, ttl=60, probable=True)
+        state.set(self.vpc, {"VpcId": "vpc-1a2b3c4d"})
+        state.entries[get_key(self.vpc)]["time"] = time.time() - 120
+        self.vpc.tenancy = "dedicated"
+        self.assertEqual(state.get(self.vpc), {"VpcId": "vpc-1a2b3c4d"})
+
+    def test_invalidate(self):
+        state = StateCache(self.path)
+        state.set(self.vpc, {"VpcId": "vpc-1a2b3c4d"})
+        state.invalidate(self.vpc)
+        self.assertEqual(state.get(self.vpc), None)
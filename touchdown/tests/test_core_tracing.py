@@ -0,0 +1,122 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from touchdown.benchmarks.suite import Benchmark
+from touchdown.core.tracing import Tracer, tracer
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def load(self, path):
+        with open(path) as fp:
+            if path.endswith(".jsonl"):
+                return [json.loads(line) for line in fp]
+            return json.load(fp)
+
+    def test_spans(self):
+        path = os.path.join(self.dir, "trace.json")
+        t = Tracer()
+        t.start(path)
+        with t.span("plan", "vpc 'a'", resource="vpc 'a'"):
+            with t.span("describe", "describe"):
+                pass
+        t.stop()
+
+        events = self.load(path)
+        self.assertEqual([e["cat"] for e in events], ["describe", "plan"])
+        self.assertEqual(events[0]["args"]["resource"], "vpc 'a'")
+        self.assertEqual(events[0]["ph"], "X")
+
+    def test_json_lines(self):
+        path = os.path.join(self.dir, "trace.jsonl")
+        t = Tracer()
+        t.start(path)
+        with t.span("plan", "a"):
+            pass
+        with t.span("plan", "b"):
+            pass
+        t.stop()
+        self.assertEqual([e["name"] for e in self.load(path)], ["a", "b"])
+
+    def test_detached(self):
+        path = os.path.join(self.dir, "trace.json")
+        t = Tracer()
+        t.start(path)
+        with t.span("action", "wait", resource="vpc 'a'", detached=True):
+            self.assertEqual(t.stack, [])
+        t.stop()
+        self.assertEqual([e["args"]["resource"] for e in self.load(path)], ["vpc 'a'"])
+
+    def test_disabled(self):
+        t = Tracer()
+        with t.span("plan", "a"):
+            pass
+        self.assertEqual(t.stack, [])
+
+    def test_api_call_counters(self):
+        path = os.path.join(self.dir, "trace.json")
+        t = Tracer()
+        t.start(path)
+
+        model = mock.Mock(metadata={"endpointPrefix": "ec2"})
+        model.name = "DescribeVpcs"
+        throttled = mock.Mock(content=b"<Error/>", request=mock.Mock(body="Action=DescribeVpcs"))
+        ok = mock.Mock(content=b"<Response/>", status_code=200, request=mock.Mock(body="Action=DescribeVpcs"))
+
+        with t.span("action", "Creating vpc", resource="vpc 'a'"):
+            t.before_call(model=model, params={})
+            t.needs_retry(response=(throttled, {"Error": {"Code": "RequestLimitExceeded"}}), attempts=1)
+            t.needs_retry(response=(ok, {}), attempts=2)
+            t.after_call(http_response=ok, parsed={}, model=model)
+        t.stop()
+
+        api, action = self.load(path)
+        self.assertEqual(api["name"], "ec2.DescribeVpcs")
+        self.assertEqual(api["args"]["resource"], "vpc 'a'")
+        self.assertEqual(api["args"]["retries"], 1)
+        self.assertEqual(api["args"]["throttles"], 1)
+        self.assertEqual(api["args"]["bytes_sent"], 38)
+        self.assertEqual(api["args"]["bytes_received"], 19)
+        self.assertEqual(action["args"]["api_calls"], 1)
+        self.assertEqual(action["args"]["throttles"], 1)
+
+    def test_apply(self):
+        path = os.path.join(self.dir, "trace.json")
+        tracer.start(path)
+        try:
+            Benchmark(vpcs=1, subnets=1, rules=1).run()
+        finally:
+            tracer.stop()
+
+        events = self.load(path)
+        categories = set(e["cat"] for e in events)
+        self.assertEqual(categories, set(("plan", "describe", "action", "waiter", "api")))
+        for event in events:
+            if event["cat"] == "action":
+                self.assertTrue("resource" in event["args"])
+        calls = [e for e in events if e["cat"] == "api"]
+        self.assertTrue(all(e["args"]["status"] == 200 for e in calls))
+        self.assertTrue(all(e["args"]["bytes_received"] > 0 for e in calls))
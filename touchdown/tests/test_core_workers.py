@@ -0,0 +1,145 @@
+# Copyright 2015 Isotoma Limited
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+import unittest
+
+from touchdown.core.dependencies import DependencyMap
+from touchdown.core.workers import Executor, Limiter, run_all
+
+
+class Node(object):
+
+    def __init__(self, name, *dependencies):
+        self.name = name
+        self.dependencies = set(dependencies)
+
+    def __repr__(self):
+        return self.name
+
+
+class TestExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.vpc = Node("vpc")
+        self.subnets = [Node("subnet-{}".format(i), self.vpc) for i in range(10)]
+        self.root = Node("root", *self.subnets)
+        self.lock = threading.Lock()
+        self.visited = []
+
+    def visit(self, node):
+        with self.lock:
+            self.visited.append(node)
+
+    def test_dependencies_visited_first(self):
+        executor = Executor(DependencyMap(self.root), workers=4)
+        completed = list(executor.run(self.visit))
+        self.assertEqual(len(completed), 12)
+        self.assertEqual(self.visited[0], self.vpc)
+        self.assertEqual(self.visited[-1], self.root)
+
+    def test_single_worker(self):
+        executor = Executor(DependencyMap(self.root), workers=1)
+        completed = list(executor.run(self.visit))
+        self.assertEqual(completed, self.visited)
+        self.assertEqual(len(completed), 12)
+
+    def test_failure_stops_dependents(self):
+        def visit(node):
+            if node == self.subnets[3]:
+                raise ValueError(node)
+            self.visit(node)
+
+        executor = Executor(DependencyMap(self.root), workers=4)
+        self.assertRaises(ValueError, list, executor.run(visit))
+        self.assertEqual(len(self.visited), 10)
+        self.assertNotIn(self.subnets[3], self.visited)
+        self.assertNotIn(self.root, self.visited)
+
+    def test_limits(self):
+        running = []
+        peak = []
+
+        def visit(node):
+            with self.lock:
+                running.append(node)
+                peak.append(len([n for n in running if n in self.subnets]))
+            self.visit(node)
+            with self.lock:
+                running.remove(node)
+
+        executor = Executor(
+            DependencyMap(self.root),
+            workers=8,
+            limits={"subnet": 2},
+            key=lambda node: node.name.split("-")[0],
+        )
+        completed = list(executor.run(visit))
+        self.assertEqual(len(completed), 12)
+        self.assertTrue(max(peak) <= 2)
+
+
+class TestRunAll(unittest.TestCase):
+
+    def test_run_all(self):
+        called = []
+        run_all([lambda i=i: called.append(i) for i in range(20)], workers=4)
+        self.assertEqual(sorted(called), list(range(20)))
+
+    def test_failure(self):
+        called = []
+
+        def fail():
+            raise ValueError("fail")
+
+        self.assertRaises(ValueError, run_all, [fail] + [lambda: called.append(1)] * 5, workers=2)
+        self.assertEqual(len(called), 5)
+
+    def test_nothing_to_do(self):
+        run_all([], workers=4)
+
+
+class TestLimiter(unittest.TestCase):
+
+    def run_limited(self, limiter, keys):
+        lock = threading.Lock()
+        running = {}
+        peak = {}
+
+        def work(key):
+            with limiter.limit(key):
+                with lock:
+                    running[key] = running.get(key, 0) + 1
+                    running["total"] = running.get("total", 0) + 1
+                    for k in (key, "total"):
+                        peak[k] = max(peak.get(k, 0), running[k])
+                time.sleep(0.01)
+                with lock:
+                    running[key] -= 1
+                    running["total"] -= 1
+
+        run_all([lambda key=key: work(key) for key in keys], workers=len(keys))
+        return peak
+
+    def test_total(self):
+        peak = self.run_limited(Limiter(total=2), [("ec2", None)] * 8)
+        self.assertEqual(peak["total"], 2)
+
+    def test_per_key(self):
+        limiter = Limiter(limits={"iam": 1})
+        peak = self.run_limited(limiter, [("iam", "a")] * 4 + [("iam", "b")] * 4 + [("ec2", None)] * 4)
+        self.assertEqual(peak[("iam", "a")], 1)
+        self.assertEqual(peak[("iam", "b")], 1)
+        self.assertTrue(peak[("ec2", None)] > 1)